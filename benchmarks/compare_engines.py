@@ -0,0 +1,91 @@
+# Checks that the native parsing engine builds the same trees as the antlr
+# engine on a corpus of Modelica files, and compares their parse times.
+#
+#   python benchmarks/compare_engines.py 'models/**/*.mo' [--flat-expressions]
+#
+# Prints a JSON object with a result per file; exits with 1 if any tree differs.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from modelicaTransformer.Parse import makeParser, readSource, runParser  # noqa: E402
+
+
+def treeSignature(tree):
+  """treeSignature lists the nodes of a tree in preorder, with their rule (or
+  token index for terminals), span and number of children
+  """
+  from antlr4 import TerminalNode
+
+  signature = []
+  stack = [tree]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, TerminalNode):
+      signature.append(('token', node.symbol.tokenIndex))
+      continue
+
+    start = node.start.tokenIndex if node.start is not None else None
+    stop = node.stop.tokenIndex if node.stop is not None else None
+    children = node.children or []
+    signature.append((node.getRuleIndex(), start, stop, len(children)))
+    stack.extend(reversed(children))
+  return signature
+
+
+def timedParse(text, engine, options):
+  """timedParse returns the tree and the time spent parsing, after lexing"""
+  parser = makeParser(text, engine=engine, **options)
+  parser.getTokenStream().fill()
+  start = time.perf_counter()
+  tree = runParser(parser)
+  return tree, time.perf_counter() - start
+
+
+def compareFile(path, options):
+  text = readSource(path)
+  antlr_tree, antlr_seconds = timedParse(text, 'antlr', options)
+  native_tree, native_seconds = timedParse(text, 'native', options)
+  return {
+    'source': path,
+    'identical': treeSignature(antlr_tree) == treeSignature(native_tree),
+    'antlr_seconds': round(antlr_seconds, 6),
+    'native_seconds': round(native_seconds, 6),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare the native and antlr parsing engines')
+  parser.add_argument('files', nargs='+', help='files or glob patterns (** is recursive)')
+  parser.add_argument('--flat-expressions', action='store_true')
+  args = parser.parse_args()
+
+  options = {'flat_expressions': args.flat_expressions}
+  paths = []
+  for pattern in args.files:
+    paths.extend(sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern])
+
+  results = [compareFile(path, options) for path in paths]
+  antlr_total = sum(result['antlr_seconds'] for result in results)
+  native_total = sum(result['native_seconds'] for result in results)
+  json.dump({
+    'files': results,
+    'different': [result['source'] for result in results if not result['identical']],
+    'antlr_seconds': round(antlr_total, 6),
+    'native_seconds': round(native_total, 6),
+    'speedup': round(antlr_total / native_total, 2) if native_total else None,
+  }, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+  return 0 if all(result['identical'] for result in results) else 1
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,94 @@
+# Checks that the regex lexer emits the same tokens (and lexer errors) as the
+# generated lexer on a corpus of Modelica files, and compares their lexing times.
+#
+#   python benchmarks/compare_lexers.py 'models/**/*.mo'
+#
+# Prints a JSON object with a result per file; exits with 1 if any token stream differs.
+
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from modelicaTransformer.Parse import load, readSource  # noqa: E402
+
+
+def tokenSignature(tokens):
+  """tokenSignature lists the fields of each token which the parser and the
+  edits depend on
+  """
+  return [
+    (token.type, token.channel, token.start, token.stop, token.line, token.column, token.tokenIndex, token.text)
+    for token in tokens
+  ]
+
+
+def timedLex(text, lexer_class):
+  """timedLex returns all tokens of text, including EOF, the lexer errors and the time spent lexing"""
+  from antlr4 import CommonTokenStream, InputStream
+  from antlr4.error.ErrorListener import ErrorListener
+
+  class Errors(ErrorListener):
+    def __init__(self):
+      self.messages = []
+
+    def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+      self.messages.append((line, column, msg))
+
+  errors = Errors()
+  lexer = lexer_class(InputStream(text))
+  lexer.removeErrorListeners()
+  lexer.addErrorListener(errors)
+  stream = CommonTokenStream(lexer)
+  start = time.perf_counter()
+  stream.fill()
+  return stream.tokens, errors.messages, time.perf_counter() - start
+
+
+def compareFile(path):
+  from modelicaTransformer.Lexer import RegexLexer
+
+  modelicaLexer, _ = load()
+  text = readSource(path)
+  antlr_tokens, antlr_errors, antlr_seconds = timedLex(text, modelicaLexer)
+  regex_tokens, regex_errors, regex_seconds = timedLex(text, RegexLexer)
+  return {
+    'source': path,
+    'tokens': len(antlr_tokens),
+    'identical': tokenSignature(antlr_tokens) == tokenSignature(regex_tokens) and antlr_errors == regex_errors,
+    'antlr_seconds': round(antlr_seconds, 6),
+    'regex_seconds': round(regex_seconds, 6),
+  }
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Compare the regex and antlr lexers')
+  parser.add_argument('files', nargs='+', help='files or glob patterns (** is recursive)')
+  args = parser.parse_args()
+
+  paths = []
+  for pattern in args.files:
+    paths.extend(sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern])
+
+  results = [compareFile(path) for path in paths]
+  antlr_total = sum(result['antlr_seconds'] for result in results)
+  regex_total = sum(result['regex_seconds'] for result in results)
+  json.dump({
+    'files': results,
+    'different': [result['source'] for result in results if not result['identical']],
+    'antlr_seconds': round(antlr_total, 6),
+    'regex_seconds': round(regex_total, 6),
+    'speedup': round(antlr_total / regex_total, 2) if regex_total else None,
+  }, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+
+  return 0 if all(result['identical'] for result in results) else 1
+
+
+if __name__ == '__main__':
+  sys.exit(main())
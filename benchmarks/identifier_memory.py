@@ -0,0 +1,111 @@
+# Measures the memory held by a parsed tree and its selection indexes for
+# each identifier interning mode, on a synthetic library of models sharing
+# their identifiers (the same components, connectors and parameters in every
+# model).
+#
+#   python benchmarks/identifier_memory.py [--models 200] [--components 20] [--lexer regex]
+#
+# Each mode is measured in a fresh interpreter, so process interning starts
+# with an empty table. Prints a JSON object with, per mode, the bytes allocated
+# (tracemalloc) and still held after parsing and selecting, and the number of
+# distinct string objects among the IDENT token texts.
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPO_ROOT)
+
+from modelicaTransformer.Parse import INTERNING  # noqa: E402
+
+COMPONENTS = ['resistor', 'capacitor', 'inductor', 'ground', 'source', 'sensor', 'motor', 'gear', 'inertia', 'damper']
+
+
+def syntheticLibrary(models, components):
+  """syntheticLibrary generates a package of models reusing the same identifiers
+
+  :param models: int, number of models
+  :param components: int, number of components per model
+  :return: string, Modelica source
+  """
+  lines = ['package Synthetic']
+  for i in range(models):
+    lines.append(f'  model Model{i}')
+    lines.append('    parameter Real gain = 1.0 "Gain";')
+    for j in range(components):
+      name = f'{COMPONENTS[j % len(COMPONENTS)]}{j // len(COMPONENTS)}'
+      lines.append(f'    Modelica.Electrical.Analog.Basic.Resistor {name}(R=gain, T_ref=300.15, alpha=0);')
+    lines.append('  equation')
+    for j in range(components - 1):
+      first = f'{COMPONENTS[j % len(COMPONENTS)]}{j // len(COMPONENTS)}'
+      second = f'{COMPONENTS[(j + 1) % len(COMPONENTS)]}{(j + 1) // len(COMPONENTS)}'
+      lines.append(f'    connect({first}.n, {second}.p);')
+    lines.append(f'  end Model{i};')
+  lines.append('end Synthetic;')
+  return '\n'.join(lines) + '\n'
+
+
+MEASURE = '''
+import gc, json, sys, tracemalloc
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import select
+
+text = sys.stdin.read()
+lexer, engine, interning = sys.argv[1:4]
+gc.collect()
+tracemalloc.start()
+tree, parser = parse(text, lexer=lexer, engine=engine, interning=interning)
+# the selections index the declarations and connect clauses by identifier
+select(tree, parser, 'declaration', 'IDENT', 'resistor0')
+select(tree, parser, 'component_reference', 'IDENT', 'resistor0')
+gc.collect()
+current, peak = tracemalloc.get_traced_memory()
+tracemalloc.stop()
+idents = [token.text for token in parser.getTokenStream().tokens if token.type == parser.IDENT]
+print(json.dumps({
+  'held_bytes': current,
+  'peak_bytes': peak,
+  'ident_tokens': len(idents),
+  'distinct_texts': len(set(idents)),
+  'distinct_objects': len({id(text) for text in idents}),
+}))
+'''
+
+
+def measure(text, lexer, engine, interning):
+  env = dict(os.environ)
+  env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+  result = subprocess.run(
+    [sys.executable, '-c', MEASURE, lexer, engine, interning], input=text, env=env, check=True,
+    stdout=subprocess.PIPE, universal_newlines=True)
+  return json.loads(result.stdout)
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure the memory saved by identifier interning')
+  parser.add_argument('--models', type=int, default=200, help='number of models in the library')
+  parser.add_argument('--components', type=int, default=20, help='number of components per model')
+  parser.add_argument('--lexer', default='regex', help='lexer parse option')
+  parser.add_argument('--engine', default='native', help='engine parse option')
+  args = parser.parse_args()
+
+  text = syntheticLibrary(args.models, args.components)
+  results = {mode: measure(text, args.lexer, args.engine, mode) for mode in INTERNING}
+  baseline = results['none']['held_bytes']
+  for result in results.values():
+    result['saved_bytes'] = baseline - result['held_bytes']
+  json.dump({
+    'source_bytes': len(text.encode('utf-8')),
+    'lexer': args.lexer,
+    'engine': args.engine,
+    'modes': results,
+  }, sys.stdout, indent=2)
+  sys.stdout.write('\n')
+  return 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,68 @@
+# Measures what a short-lived worker pays before its first result: the time to
+# import the package and the latency of the first parse in a fresh interpreter.
+#
+#   python benchmarks/startup.py [--runs 10] [--source examples/DCMotor.mo]
+#
+# Prints a JSON object with median and min times in seconds.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+FIRST_PARSE = '''
+import sys, time
+start = time.perf_counter()
+from modelicaTransformer.Parse import parse, readSource
+text = readSource(sys.argv[1])
+parse(text)
+print(time.perf_counter() - start)
+'''
+
+
+def _env():
+  env = dict(os.environ)
+  env['PYTHONPATH'] = os.pathsep.join(filter(None, [REPO_ROOT, env.get('PYTHONPATH')]))
+  return env
+
+
+def timeProcess(args):
+  """timeProcess times a fresh interpreter running args, including startup"""
+  start = time.perf_counter()
+  subprocess.run([sys.executable] + args, check=True, env=_env(), stdout=subprocess.DEVNULL)
+  return time.perf_counter() - start
+
+
+def timeFirstParse(source):
+  """timeFirstParse returns the in-process time from import to finished first parse"""
+  output = subprocess.run(
+    [sys.executable, '-c', FIRST_PARSE, source],
+    check=True, env=_env(), stdout=subprocess.PIPE)
+  return float(output.stdout)
+
+
+def summarize(times):
+  return {'median': round(statistics.median(times), 6), 'min': round(min(times), 6)}
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure import time and first parse latency')
+  parser.add_argument('--runs', type=int, default=10)
+  parser.add_argument('--source', default=os.path.join(REPO_ROOT, 'examples', 'DCMotor.mo'))
+  args = parser.parse_args()
+
+  results = {
+    'python_startup': summarize([timeProcess(['-c', 'pass']) for _ in range(args.runs)]),
+    'import_package': summarize([timeProcess(['-c', 'import modelicaTransformer']) for _ in range(args.runs)]),
+    'first_parse': summarize([timeFirstParse(args.source) for _ in range(args.runs)]),
+  }
+  print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,138 @@
+# Caches the deserialized ATNs of the generated lexer and parser on disk.
+#
+# With the 4.8 runtime, unpickling an ATN costs about as much as
+# deserializing it, so the cache also stores the recognizers' DFAs. Once a
+# process has parsed some files, saveWarmState snapshots its DFAs, and later
+# processes start with the prediction work of earlier runs already done. This
+# cuts the first parse of a short-lived worker by several times.
+
+import contextlib
+import hashlib
+import os
+import pickle
+import sys
+import tempfile
+
+# pickling walks the ATN's state graph recursively, the parser's ATN needs
+# roughly 5000 frames
+_PICKLE_RECURSION_LIMIT = 20000
+
+
+def _cacheKey(data):
+  """_cacheKey returns the key a serialized ATN is cached under
+  The key covers the grammar (through the serialized ATN), the runtime and
+  the interpreter, since the pickle references runtime classes
+
+  :param data: string, serialized ATN
+  :return: string, hex digest
+  """
+  # identify the runtime by its deserializer module rather than through
+  # importlib.metadata, which costs more to import than the cache saves
+  from antlr4.atn import ATNDeserializer as deserializer_module
+  stat = os.stat(deserializer_module.__file__)
+  runtime = f'{deserializer_module.__file__}:{stat.st_mtime_ns}:{stat.st_size}'
+
+  key = hashlib.sha1(data.encode('utf-8', 'surrogatepass'))
+  key.update(f'{runtime}:{sys.version_info[:2]}:{pickle.HIGHEST_PROTOCOL}'.encode('utf-8'))
+  return key.hexdigest()
+
+
+def _path(cache_dir, data):
+  return os.path.join(cache_dir, f'atn-{_cacheKey(data)}.pickle')
+
+
+def _read(path):
+  try:
+    with open(path, 'rb') as f:
+      snapshot = pickle.load(f)
+  except Exception:
+    # missing, corrupt or incompatible cache, rebuild it
+    return None
+
+  if not isinstance(snapshot, dict) or 'atn' not in snapshot:
+    return None
+  return snapshot
+
+
+def _write(path, snapshot):
+  limit = sys.getrecursionlimit()
+  sys.setrecursionlimit(max(limit, _PICKLE_RECURSION_LIMIT))
+  try:
+    data = pickle.dumps(snapshot, protocol=pickle.HIGHEST_PROTOCOL)
+  except RecursionError:
+    return
+  finally:
+    sys.setrecursionlimit(limit)
+
+  # write to a temporary file and rename so concurrent workers never see a
+  # partially written cache
+  try:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.atn-')
+    with os.fdopen(fd, 'wb') as f:
+      f.write(data)
+    os.replace(tmp_path, path)
+  except OSError:
+    pass
+
+
+@contextlib.contextmanager
+def cachedDeserialization(cache_dir):
+  """cachedDeserialization makes ATN deserialization read from and write to
+  the cache in cache_dir while the context is active. Import the generated
+  lexer and parser inside it, then pass the yielded list to restoreDfa.
+  If the cache is missing or invalid the ATN is deserialized as usual
+
+  :param cache_dir: string, directory to keep cached ATNs in
+  :return: list, snapshots loaded from the cache
+  """
+  from antlr4.atn.ATNDeserializer import ATNDeserializer
+
+  original = ATNDeserializer.deserialize
+  snapshots = []
+
+  def deserialize(self, data):
+    path = _path(cache_dir, data)
+    snapshot = _read(path)
+    if snapshot is not None:
+      snapshots.append(snapshot)
+      return snapshot['atn']
+
+    atn = original(self, data)
+    _write(path, {'atn': atn})
+    return atn
+
+  ATNDeserializer.deserialize = deserialize
+  try:
+    yield snapshots
+  finally:
+    ATNDeserializer.deserialize = original
+
+
+def restoreDfa(recognizer, snapshots):
+  """restoreDfa installs the DFA saved with a recognizer's cached ATN, if any
+
+  :param recognizer: class, generated lexer or parser imported under cachedDeserialization
+  :param snapshots: list, snapshots yielded by cachedDeserialization
+  """
+  for snapshot in snapshots:
+    if snapshot['atn'] is recognizer.atn and snapshot.get('decisionsToDFA') is not None:
+      recognizer.decisionsToDFA = snapshot['decisionsToDFA']
+      if snapshot.get('sharedContextCache') is not None:
+        recognizer.sharedContextCache = snapshot['sharedContextCache']
+
+
+def saveWarmState(cache_dir, recognizers):
+  """saveWarmState saves the recognizers' ATNs along with their current DFAs
+  Don't call it while other threads are parsing, the DFAs are updated in place
+
+  :param cache_dir: string, directory to keep cached ATNs in
+  :param recognizers: list, generated lexer and parser classes
+  """
+  for recognizer in recognizers:
+    data = sys.modules[recognizer.__module__].serializedATN()
+    _write(_path(cache_dir, data), {
+      'atn': recognizer.atn,
+      'decisionsToDFA': recognizer.decisionsToDFA,
+      'sharedContextCache': getattr(recognizer, 'sharedContextCache', None)
+    })
@@ -0,0 +1,331 @@
+from collections import OrderedDict, namedtuple
+import hashlib
+import threading
+
+from modelicaTransformer.Parse import ParseError, makeParser, parse, runParser
+
+
+def digest(text):
+  """digest returns the key used to cache parses of text
+
+  :param text: string, Modelica source
+  :return: string, hex digest of text
+  """
+  return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+# stands in for a selected node when a cache selects without a tree of the
+# whole file; start and stop are the node's tokens, at their offsets in the file
+SpanNode = namedtuple('SpanNode', ['start', 'stop'])
+
+
+def optionsKey(options):
+  """optionsKey converts parse options into a hashable key
+
+  :param options: dict, parse options
+  :return: tuple, sorted (name, value) pairs
+  """
+  return tuple(sorted(
+    (name, tuple(value) if isinstance(value, (list, set, frozenset)) else value)
+    for name, value in options.items()))
+
+
+class ParseCache:
+  """ParseCache keeps the most recently parsed trees keyed by the digest of
+  their source text. Trees keep their selector memo tables, so repeated
+  selections on a cached tree are also reused
+  """
+
+  def __init__(self, max_entries=64):
+    """__init__ initializes the cache
+
+    :param max_entries: int, number of trees to keep before evicting the least recently used
+    """
+    self._max_entries = max_entries
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  def parse(self, text, **options):
+    """parse returns the cached tree for text, parsing it on a miss
+
+    :param text: string, Modelica source
+    :param options: options passed to Parse.parse, trees are cached per options
+    :return: tree, parser; as returned by Parse.parse
+    """
+    return self._parse(text, digest(text), options)
+
+  def _parse(self, text, text_key, options):
+    """_parse returns the cached tree for a text key, parsing text on a miss
+
+    :param text: string, Modelica source
+    :param text_key: object, hashable key identifying text
+    :param options: dict, options passed to Parse.parse
+    :return: tree, parser; as returned by Parse.parse
+    """
+    key = (text_key, optionsKey(options))
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry
+
+    # parse outside the lock so other threads aren't blocked on it
+    entry = parse(text, **options)
+    with self._lock:
+      self.misses += 1
+      self._entries[key] = entry
+      self._entries.move_to_end(key)
+      while len(self._entries) > self._max_entries:
+        self._entries.popitem(last=False)
+
+    return entry
+
+  def select(self, text, selectors, **options):
+    """select applies selectors to the cached tree for text
+
+    :param text: string, Modelica source
+    :param selectors: list, Selector objects
+    :param options: options passed to Parse.parse
+    :return: list, the selected nodes of each selector
+    """
+    tree, parser = self.parse(text, **options)
+    return [selector.apply(tree, parser) for selector in selectors]
+
+  def clear(self):
+    """clear drops all cached trees"""
+    with self._lock:
+      self._entries.clear()
+
+  def __len__(self):
+    return len(self._entries)
+
+
+def _mapToken(token, offset_map):
+  """_mapToken copies a token of a chunk with its character offsets in the file
+
+  :param token: object, token of the chunk's source, or None
+  :param offset_map: OffsetMap, of the chunk
+  :return: object, token copy or None
+  """
+  if token is None:
+    return None
+  copy = token.clone()
+  copy.start = offset_map(token.start)
+  copy.stop = offset_map(token.stop)
+  return copy
+
+
+class ClassCache(ParseCache):
+  """ClassCache keeps parsed trees per class chunk (see Chunk.py), keyed by
+  the digest of the chunk's source, usable wherever a ParseCache is. When a
+  class in a large file changes, only its chunk is reparsed and reselected;
+  unchanged chunks reuse their trees and selector memo tables. Classes nested
+  in a changed chunk are parsed again with it.
+
+  Like chunked transforms, files are cached whole (as in a ParseCache) when a
+  selector path isn't satisfiable within one class (see Chunk.inChunks).
+  Selections from chunks are SpanNodes with the selected node's start and
+  stop tokens at their offsets in the file
+  """
+
+  def __init__(self, max_entries=1024):
+    """__init__ initializes the cache
+
+    :param max_entries: int, number of chunk trees to keep before evicting the least recently used
+    """
+    super().__init__(max_entries)
+
+  def select(self, text, selectors, **options):
+    """select applies selectors to the cached trees of the classes of text,
+    parsing the classes which changed
+
+    :param text: string, Modelica source
+    :param selectors: list, Selector objects
+    :param options: options passed to Parse.parse
+    :return: list, the selected nodes (SpanNodes for split files) of each selector
+    """
+    from modelicaTransformer.Chunk import OffsetMap, chunkText, inChunks, splitChunks
+
+    if not inChunks(selectors):
+      return super().select(text, selectors, **options)
+
+    chunks = splitChunks(text)
+    if len(chunks) <= 2:
+      # at most one class
+      return super().select(text, selectors, **options)
+
+    selections = [[] for _ in selectors]
+    errors = []
+    for chunk in chunks:
+      source = chunkText(text, chunk)
+      offset_map = OffsetMap(chunk)
+      try:
+        tree, parser = self._parse(source, digest(source), options)
+      except ParseError as e:
+        # report the errors at their position in the file, not the chunk
+        errors += [offset_map.mapIssue(error, text) for error in e.errors]
+        continue
+
+      for selected, selector in zip(selections, selectors):
+        selected += [
+          SpanNode(_mapToken(node.start, offset_map), _mapToken(node.stop, offset_map))
+          for node in selector.apply(tree, parser)
+        ]
+
+    if errors:
+      raise ParseError(sorted(errors, key=lambda error: error.offset))
+    return selections
+
+
+# Structure cache
+#
+# Generated variants of a model often differ only in their literals, e.g. the
+# same package with other parameter values. Such files have the same sequence
+# of token types and identifiers, so the parser builds the same tree shape for
+# them and path selectors select the same nodes. StructureCache keys
+# selections by a hash of that sequence, and stores the selected nodes as
+# (first, last) indexes into the file's significant (not hidden) tokens. For
+# a file with a known structure only the lexer runs; its selections are
+# SpanNodes holding the file's start and stop tokens, which is all the Edit
+# factories read. Nodes in opaque annotation bodies hold copies of the
+# file's tokens (see Opaque.py), so a node's tokens are found by their
+# character offsets; a selection with a token which isn't the file's isn't
+# cached.
+#
+# Literals which appear in a path's child_value are part of the key, so a
+# selection on a literal's value isn't reused for another value. Selectors
+# without a path may look at anything in the tree, files selected with them
+# are always parsed.
+
+class StructureCache:
+  """StructureCache keeps selections keyed by the structure of the parsed
+  file (see above), usable wherever a ParseCache is. Edits of transformations
+  transformed with it must only use their node's span (start and stop tokens)
+  """
+
+  def __init__(self, max_entries=256):
+    """__init__ initializes the cache
+
+    :param max_entries: int, number of structures to keep before evicting the least recently used
+    """
+    self._max_entries = max_entries
+    self._entries = OrderedDict()
+    self._lock = threading.Lock()
+    self.hits = 0
+    self.misses = 0
+
+  @staticmethod
+  def _structureKey(tokens, literals, options):
+    """_structureKey hashes the token types and identifiers of a file
+
+    :param tokens: list, significant tokens of the file
+    :param literals: set, child values of the selectors' paths
+    :param options: dict, parse options
+    :return: string, hex digest
+    """
+    from modelicaTransformer.Parse import load
+
+    modelicaLexer, _ = load()
+    parts = []
+    for token in tokens:
+      if token.type in (modelicaLexer.STRING, modelicaLexer.UNSIGNED_NUMBER) and not any(
+          token.text in literal for literal in literals):
+        parts.append(str(token.type))
+      else:
+        parts.append(f'{token.type}:{token.text}')
+    parts.append(repr(optionsKey(options)))
+    return hashlib.sha1('\0'.join(parts).encode('utf-8')).hexdigest()
+
+  @staticmethod
+  def _spans(tokens, selections):
+    """_spans finds the ordinals of the selected nodes' start and stop tokens
+
+    :param tokens: list, significant tokens of the file
+    :param selections: list, selected nodes of each selector
+    :return: list, (start, stop) ordinals (stop -1 if the node has none) of
+      each selection, or None if a token isn't one of tokens or a copy of one
+    """
+    ordinals = {token.start: ordinal for ordinal, token in enumerate(tokens)}
+
+    def ordinal(token):
+      index = ordinals.get(token.start)
+      if index is None or tokens[index].stop != token.stop or tokens[index].type != token.type:
+        return None
+      return index
+
+    spans = []
+    for nodes in selections:
+      node_spans = []
+      for node in nodes:
+        start = ordinal(node.start)
+        stop = ordinal(node.stop) if node.stop is not None else -1
+        if start is None or stop is None:
+          return None
+        node_spans.append((start, stop))
+      spans.append(node_spans)
+    return spans
+
+  def select(self, text, selectors, **options):
+    """select returns the selections of selectors in text, from the cache if
+    a file with the same structure was selected from before
+
+    :param text: string, Modelica source
+    :param selectors: list, Selector objects
+    :param options: options passed to Parse.parse
+    :return: list, the selected nodes (or SpanNodes) of each selector
+    """
+    from antlr4 import Token
+
+    paths = [selector.path() for selector in selectors]
+    fingerprints = [selector.fingerprint() for selector in selectors]
+    if any(path is None for path in paths) or any(fingerprint is None for fingerprint in fingerprints):
+      tree, parser = parse(text, **options)
+      return [selector.apply(tree, parser) for selector in selectors]
+
+    literals = {step['child_value'] for path in paths for step in path if step.get('child_value') is not None}
+    parser = makeParser(text, **options)
+    stream = parser.getTokenStream()
+    stream.fill()
+    tokens = [token for token in stream.tokens if token.channel != Token.HIDDEN_CHANNEL]
+    key = self._structureKey(tokens, literals, options)
+    collector = parser._error_collector
+    with self._lock:
+      entry = self._entries.get(key)
+      if entry is not None and all(fingerprint in entry for fingerprint in fingerprints) and (
+          collector is None or not collector.errors):
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return [
+          [SpanNode(tokens[start], tokens[stop] if stop >= 0 else None) for start, stop in entry[fingerprint]]
+          for fingerprint in fingerprints
+        ]
+
+    # the tokens are lexed already, the parser reads them from the stream
+    tree = runParser(parser)
+    selections = [selector.apply(tree, parser) for selector in selectors]
+    spans = None if parser.getNumberOfSyntaxErrors() else self._spans(tokens, selections)
+    with self._lock:
+      self.misses += 1
+      if spans is None:
+        # a recovered tree depends on more than the structure, or a node's
+        # tokens can't be found again
+        return selections
+
+      entry = self._entries.setdefault(key, {})
+      entry.update(zip(fingerprints, spans))
+      self._entries.move_to_end(key)
+      while len(self._entries) > self._max_entries:
+        self._entries.popitem(last=False)
+
+    return selections
+
+  def clear(self):
+    """clear drops all cached structures"""
+    with self._lock:
+      self._entries.clear()
+
+  def __len__(self):
+    return len(self._entries)
@@ -0,0 +1,264 @@
+# Splitting files into independently parseable class chunks
+#
+# Large files are split at class definitions with a token-level scan, so the
+# chunks can be parsed in parallel. Each top-level class is a chunk, unless
+# it's a long class (typically a package) with several nested classes; then
+# each directly nested class is a chunk. Whatever isn't in a class chunk
+# (within clause, the package header, its other elements and end clause) is
+# the shell chunk, made of the remaining segments of the file.
+#
+# Every chunk parses as a stored_definition. A chunk's offsets are mapped
+# back to the file through its segments, so edits land exactly where they
+# would with a single parse. Selections are made per chunk, so they're only
+# the same as the file's if every selector path is satisfiable within one
+# class: inChunks checks that no step selects a node which can contain a
+# class definition (e.g. a package, whose nested classes are in other
+# chunks, or an element, which a chunk's class isn't) and that the first
+# step doesn't depend on the depth below the root. Otherwise, or for
+# selectors without a path, the file is parsed whole.
+
+from bisect import bisect_right
+from collections import namedtuple
+
+# segments is a list of (start, stop) character offsets into the file, stop
+# exclusive
+Chunk = namedtuple('Chunk', ['segments'])
+
+CLASS_KEYWORDS = frozenset([
+  'class', 'model', 'record', 'block', 'connector', 'type', 'package', 'function', 'operator'
+])
+
+# prefixes that are part of the class definition (or allowed before it in a stored_definition)
+_DEFINITION_PREFIXES = frozenset(['final', 'encapsulated', 'partial', 'expandable', 'pure', 'impure'])
+
+# element prefixes which stored_definition doesn't allow, classes with them stay in the shell
+_ELEMENT_PREFIXES = frozenset(['redeclare', 'replaceable', 'inner', 'outer', 'each'])
+
+_OPEN = frozenset(['(', '[', '{'])
+_CLOSE = frozenset([')', ']', '}'])
+
+
+class ChunkError(Exception):
+  """ChunkError is raised when the scan can't find class boundaries"""
+
+
+_Class = namedtuple('_Class', ['start', 'stop', 'depth', 'long', 'chunkable'])
+
+
+def defaultTokens(text):
+  """defaultTokens lexes text for the class scan
+
+  :param text: string, Modelica source
+  :return: list, on-channel tokens
+  """
+  from antlr4 import Token
+
+  from modelicaTransformer.Lexer import RegexLexer
+  from modelicaTransformer.TextStream import TextStream
+
+  lexer = RegexLexer(TextStream(text))
+  lexer.removeErrorListeners()
+  return [token for token in lexer.getAllTokens() if token.channel == Token.DEFAULT_CHANNEL]
+
+
+def scanClasses(tokens):
+  """scanClasses finds the class definitions at depth 0 and 1
+
+  :param tokens: list, on-channel tokens of the file
+  :return: list, _Class with token indexes of the first token and of the terminating ';'
+  """
+  texts = [token.text for token in tokens]
+  count = len(texts)
+  classes = []
+  # open long classes: (name, start index, chunkable)
+  stack = []
+  i = 0
+  while i < count:
+    text = texts[i]
+
+    if text == 'end' and i + 2 < count and texts[i + 2] == ';' and stack and texts[i + 1] == stack[-1][0]:
+      name, start, chunkable = stack.pop()
+      if len(stack) <= 1:
+        classes.append(_Class(start, i + 2, len(stack), True, chunkable))
+      i += 3
+      continue
+
+    if text not in CLASS_KEYWORDS:
+      i += 1
+      continue
+
+    # walk back over prefixes to the start of the definition
+    start = i
+    chunkable = True
+    while start > 0 and (texts[start - 1] in _DEFINITION_PREFIXES or texts[start - 1] in _ELEMENT_PREFIXES):
+      start -= 1
+      if texts[start] in _ELEMENT_PREFIXES:
+        chunkable = False
+
+    # walk forward over the rest of the prefixes (e.g. operator record)
+    j = i
+    while j < count and (texts[j] in CLASS_KEYWORDS or texts[j] in _DEFINITION_PREFIXES):
+      j += 1
+    extends = j < count and texts[j] == 'extends'
+    if extends:
+      j += 1
+    if j + 1 >= count:
+      raise ChunkError('Unexpected end of file in class definition')
+
+    name = texts[j]
+    following = texts[j + 1]
+    if following in ('(', '.') and not extends:
+      # function name(...) argument, not a class
+      i = j + 1
+      continue
+
+    if following == '=':
+      # short class definition, ends at the next ';' outside brackets
+      depth = 0
+      k = j + 1
+      while k < count and not (texts[k] == ';' and depth == 0):
+        if texts[k] in _OPEN:
+          depth += 1
+        elif texts[k] in _CLOSE:
+          depth -= 1
+        k += 1
+      if k == count:
+        raise ChunkError(f'Missing ; after class {name}')
+      if len(stack) <= 1:
+        classes.append(_Class(start, k, len(stack), False, chunkable))
+      i = k + 1
+      continue
+
+    stack.append((name, start, chunkable))
+    i = j + 1
+
+  if stack:
+    raise ChunkError(f'Missing end of class {stack[-1][0]}')
+  return classes
+
+
+def inChunks(selectors):
+  """inChunks checks if selectors select the same nodes in a file's chunks
+  as in the whole file (see above)
+
+  :param selectors: list, Selector objects
+  :return: boolean, false if the file has to be selected from whole
+  """
+  from modelicaTransformer.Parse import load
+  from modelicaTransformer.Reach import ruleReachability
+
+  _, modelicaParser = load()
+  rule_names = list(modelicaParser.ruleNames)
+  reachable = ruleReachability(modelicaParser)
+  class_definition = modelicaParser.RULE_class_definition
+  for selector in selectors:
+    path = selector.path()
+    if path is None:
+      return False
+    first = path[0]
+    if first.get('axis', 'descendant') != 'descendant' or first.get('max_depth') is not None:
+      return False
+    for step in path:
+      if step['rule'] not in rule_names:
+        continue
+      rule = rule_names.index(step['rule'])
+      if rule == class_definition or class_definition in reachable[rule]:
+        return False
+  return True
+
+
+def splitChunks(text, min_nested=2, tokens=None):
+  """splitChunks splits Modelica source into chunks which can be parsed separately
+
+  :param text: string, Modelica source
+  :param min_nested: int, minimum number of nested classes for a top-level class to be split
+  :param tokens: list, (optional) on-channel tokens of text, from defaultTokens
+  :return: list, Chunk; the shell chunk (possibly empty) is first
+  """
+  if tokens is None:
+    tokens = defaultTokens(text)
+  try:
+    classes = scanClasses(tokens)
+  except ChunkError:
+    return [Chunk([(0, len(text))])]
+
+  def span(cls):
+    return tokens[cls.start].start, tokens[cls.stop].stop + 1
+
+  top_level = [cls for cls in classes if cls.depth == 0]
+  spans = []
+  for top in top_level:
+    top_start, top_stop = span(top)
+    nested = [
+      cls for cls in classes
+      if cls.depth == 1 and cls.chunkable and top_start <= span(cls)[0] and span(cls)[1] <= top_stop
+    ]
+    if top.long and len(nested) >= min_nested:
+      spans.extend(span(cls) for cls in nested)
+    else:
+      spans.append((top_start, top_stop))
+
+  spans.sort()
+  shell = []
+  position = 0
+  for start, stop in spans:
+    if start > position:
+      shell.append((position, start))
+    position = stop
+  if position < len(text):
+    shell.append((position, len(text)))
+
+  return [Chunk(shell)] + [Chunk([chunk_span]) for chunk_span in spans]
+
+
+def chunkText(text, chunk):
+  """chunkText returns the source of a chunk
+
+  :param text: string, Modelica source the chunk was split from
+  :param chunk: Chunk
+  :return: string, chunk source
+  """
+  return ''.join(text[start:stop] for start, stop in chunk.segments)
+
+
+class OffsetMap:
+  """OffsetMap maps character offsets in a chunk's source to offsets in the file"""
+
+  def __init__(self, chunk):
+    self._chunk_starts = []
+    self._file_starts = []
+    position = 0
+    for start, stop in chunk.segments:
+      self._chunk_starts.append(position)
+      self._file_starts.append(start)
+      position += stop - start
+
+  def __call__(self, offset):
+    index = max(bisect_right(self._chunk_starts, offset) - 1, 0)
+    return self._file_starts[index] + offset - self._chunk_starts[index]
+
+  def mapIssue(self, issue, text):
+    """mapIssue moves a syntax error found in the chunk's source onto the file
+
+    :param issue: SyntaxIssue, error with an offset in the chunk
+    :param text: string, Modelica source the chunk was split from
+    :return: SyntaxIssue, the error with its offset, line and column in the file
+    """
+    offset = self(issue.offset)
+    line_start = text.rfind('\n', 0, offset) + 1
+    return issue._replace(line=text.count('\n', 0, offset) + 1, column=offset - line_start, offset=offset)
+
+  def mapEdit(self, edit):
+    """mapEdit moves an edit made on the chunk's source onto the file
+
+    :param edit: Edit, edit with offsets in the chunk
+    :return: Edit, the same edit with offsets in the file
+    """
+    if edit.start <= edit.stop:
+      start = self(edit.start)
+    else:
+      # insertion point right after stop, keep it next to the node
+      start = self(edit.stop) + 1
+    edit.stop = self(edit.stop)
+    edit.start = start
+    return edit
@@ -0,0 +1,196 @@
+# Command line entry point which runs the transformations of a spec file
+# (see Spec.py) over a batch of files, e.g.
+#   modelica-transform spec.json 'models/**/*.mo' --output-dir build/ --jobs 4
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import glob
+import json
+import os
+import sys
+import time
+
+from modelicaTransformer.Cache import ParseCache
+from modelicaTransformer.Parse import ERROR_POLICIES, ParseError, readSource, writeSource
+from modelicaTransformer.Spec import SpecError, loadSpec, transformerFromSpec
+from modelicaTransformer.Watch import Watcher
+
+
+def expandSources(patterns):
+  """expandSources expands file paths and glob patterns, keeping the given order
+
+  :param patterns: list, paths or glob patterns (** is recursive)
+  :return: list, unique file paths
+  """
+  sources = []
+  for pattern in patterns:
+    matches = sorted(glob.glob(pattern, recursive=True)) if glob.has_magic(pattern) else [pattern]
+    for match in matches:
+      if match not in sources:
+        sources.append(match)
+  return sources
+
+
+def outputPath(source, output_dir, base_dir):
+  """outputPath returns where the result for source is written
+
+  :param source: string, path to source file
+  :param output_dir: string, output directory, or None to write in place
+  :param base_dir: string, directory the source's path is kept relative to inside output_dir
+  :return: string, path to output file
+  """
+  if output_dir is None:
+    return source
+
+  relative = os.path.relpath(os.path.abspath(source), os.path.abspath(base_dir))
+  if relative.startswith(os.pardir):
+    relative = os.path.basename(source)
+  return os.path.join(output_dir, relative)
+
+
+def runFile(transformer, source, output, cache=None):
+  """runFile transforms one file and reports how it went
+
+  :param transformer: Transformer
+  :param source: string, path to source file
+  :param output: string, path to write result to, or None for a dry run
+  :param cache: ParseCache, (optional) cache to reuse parsed trees from
+  :return: dict, summary for the file
+  """
+  start = time.time()
+  summary = {'source': source, 'output': output}
+  try:
+    text = readSource(source)
+    result = transformer.transform(text, cache)
+    if output is not None:
+      os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+      writeSource(output, result)
+    summary['status'] = 'ok'
+    summary['changed'] = result != text
+  except ParseError as e:
+    # nothing is written for files with syntax errors
+    summary['status'] = 'error'
+    summary['error'] = f'{e.__class__.__name__}: {e}'
+    summary['errors'] = [error._asdict() for error in e.errors]
+  except Exception as e:
+    summary['status'] = 'error'
+    summary['error'] = f'{e.__class__.__name__}: {e}'
+  summary['seconds'] = round(time.time() - start, 6)
+  return summary
+
+
+def runBatch(transformer, sources, outputs, jobs=1):
+  """runBatch transforms files, in worker processes if jobs > 1
+
+  :param transformer: Transformer
+  :param sources: list, paths to source files
+  :param outputs: list, paths to write results to (None entries are dry runs)
+  :param jobs: int, number of worker processes
+  :return: list, per file summaries in the same order as sources
+  """
+  if jobs <= 1 or len(sources) <= 1:
+    return [runFile(transformer, source, output) for source, output in zip(sources, outputs)]
+
+  with ProcessPoolExecutor(jobs) as executor:
+    return list(executor.map(runFile, [transformer] * len(sources), sources, outputs))
+
+
+def runWatch(transformer, patterns, outputFor, interval, debounce):
+  """runWatch transforms files whenever they change, printing one JSON summary line per batch
+
+  :param transformer: Transformer
+  :param patterns: list, files or glob patterns to watch
+  :param outputFor: function, returns the output path for a source (None for dry runs)
+  :param interval: float, seconds between polls
+  :param debounce: float, seconds to wait for a burst of changes to settle
+  """
+  # only changed files are reparsed, unchanged ones hit the cache
+  cache = ParseCache()
+  watcher = Watcher(lambda: expandSources(patterns), interval, debounce)
+
+  def run(sources):
+    start = time.time()
+    results = []
+    for source in sources:
+      output = outputFor(source)
+      results.append(runFile(transformer, source, output, cache))
+      if output is not None:
+        watcher.ignore(output)
+    print(json.dumps({'files': results, 'seconds': round(time.time() - start, 6)}), flush=True)
+
+  run(expandSources(patterns))
+  try:
+    watcher.watch(run)
+  except KeyboardInterrupt:
+    pass
+
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(
+    prog='modelica-transform',
+    description='Apply the transformations in a JSON or TOML spec to Modelica files')
+  parser.add_argument('spec', help='path to spec file (.json or .toml)')
+  parser.add_argument('files', nargs='*', help='files or glob patterns, defaults to the spec\'s "files"')
+  output_group = parser.add_mutually_exclusive_group()
+  output_group.add_argument('--in-place', action='store_true', help='overwrite the source files')
+  output_group.add_argument('--output-dir', help='write results into this directory')
+  parser.add_argument('--base-dir', default='.', help='sources keep their path relative to this inside --output-dir')
+  parser.add_argument('--jobs', '-j', type=int, default=1, help='number of worker processes')
+  parser.add_argument('--summary', default='-', help='where to write the JSON run summary, - for stdout')
+  parser.add_argument('--error-policy', choices=ERROR_POLICIES,
+                      help='what to do on syntax errors, bail skips a file at its first error (default: the spec\'s, or recover)')
+  parser.add_argument('--watch', action='store_true', help='keep running and transform files again when they change')
+  parser.add_argument('--interval', type=float, default=0.5, help='seconds between polls in watch mode')
+  parser.add_argument('--debounce', type=float, default=0.25, help='seconds to let a burst of changes settle in watch mode')
+  args = parser.parse_args(argv)
+
+  try:
+    spec = loadSpec(args.spec)
+    if args.error_policy is not None:
+      spec['parse_options'] = dict(spec.get('parse_options', {}), error_policy=args.error_policy)
+    transformer = transformerFromSpec(spec)
+  except (OSError, SpecError) as e:
+    parser.exit(2, f'modelica-transform: {e}\n')
+
+  patterns = args.files or spec.get('files', [])
+  output_dir = args.output_dir if args.output_dir is not None else spec.get('output_dir')
+
+  def outputFor(source):
+    if args.in_place:
+      return source
+    if output_dir is not None:
+      return outputPath(source, output_dir, args.base_dir)
+    # without an output the run only reports what would change
+    return None
+
+  if args.watch:
+    runWatch(transformer, patterns, outputFor, args.interval, args.debounce)
+    return 0
+
+  sources = expandSources(patterns)
+  if not sources:
+    parser.exit(2, 'modelica-transform: no files to transform\n')
+  outputs = [outputFor(source) for source in sources]
+
+  start = time.time()
+  results = runBatch(transformer, sources, outputs, args.jobs)
+  failed = sum(1 for result in results if result['status'] != 'ok')
+  summary = {
+    'files': results,
+    'total': len(results),
+    'failed': failed,
+    'seconds': round(time.time() - start, 6)
+  }
+
+  if args.summary == '-':
+    json.dump(summary, sys.stdout, indent=2)
+    sys.stdout.write('\n')
+  else:
+    with open(args.summary, 'w') as f:
+      json.dump(summary, f, indent=2)
+
+  return 1 if failed else 0
+
+
+if __name__ == '__main__':
+  sys.exit(main())
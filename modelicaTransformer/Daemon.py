@@ -0,0 +1,261 @@
+# Long-running transform server which keeps the parser, its DFA cache and
+# parsed trees warm between requests, plus a thin client for it.
+#
+# Start it with
+#   python -m modelicaTransformer.Daemon --port 7878 --root path/to/models
+#
+# and send requests with transformRemote(spec, source='path/to/Model.mo')
+#
+# Any local process, and any web page the user opens (by a cross-site POST or
+# DNS rebinding), can reach a localhost port, so the daemon only serves
+# requests which a browser can't forge: JSON bodies, to a Host of 127.0.0.1 or
+# localhost, without an Origin, carrying the token the daemon writes to a file
+# only the user can read when it starts. Sources and outputs must be inside
+# the daemon's root directory.
+
+import argparse
+import hmac
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import secrets
+import urllib.error
+import urllib.request
+
+from modelicaTransformer.Cache import ParseCache
+from modelicaTransformer.Parse import ParseError, load, readSource, writeSource
+from modelicaTransformer.Spec import SpecError, transformerFromSpec
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 7878
+
+
+class DaemonError(Exception):
+  """DaemonError is raised by the client when the daemon rejects a request"""
+
+
+def tokenPath(port):
+  """tokenPath returns the default path of the token file of a daemon
+
+  :param port: int, port the daemon listens on
+  :return: string, path in the user's home directory
+  """
+  return os.path.join(os.path.expanduser('~'), '.modelica-transformer', f'daemon-{port}.token')
+
+
+def writeToken(path):
+  """writeToken writes a new random token to a file only the user can read
+
+  :param path: string, token file, replaced if it exists
+  :return: string, the token
+  """
+  token = secrets.token_hex(32)
+  directory = os.path.dirname(path)
+  if directory:
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+  if os.path.lexists(path):
+    os.remove(path)
+  # created with its mode, so the token is never readable by others
+  fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+  with os.fdopen(fd, 'w') as f:
+    f.write(token)
+  return token
+
+
+def _insideRoot(path, root):
+  """_insideRoot resolves a requested path, it must be inside root
+
+  :param path: string, path from a request
+  :param root: string, real path of the daemon's root directory
+  :return: string, real path
+  """
+  real = os.path.realpath(os.path.join(root, path))
+  if os.path.commonpath([real, root]) != root:
+    raise PermissionError(f'{path} is outside the daemon\'s root {root}')
+  return real
+
+
+def handleRequest(request, cache, root):
+  """handleRequest runs a transform request
+
+  :param request: dict, with "spec" and either "source" (path) or "text",
+    and optionally "output" (path to write the result to)
+  :param cache: ParseCache, cache of parsed trees
+  :param root: string, directory sources and outputs must be in; relative
+    paths are relative to it
+  :return: dict, response with the transformed "result"
+  """
+  if 'spec' not in request:
+    raise SpecError('Missing "spec" in request')
+  transformer = transformerFromSpec(request['spec'])
+
+  root = os.path.realpath(root)
+  if 'text' in request:
+    text = request['text']
+  elif 'source' in request:
+    text = readSource(_insideRoot(request['source'], root))
+  else:
+    raise SpecError('Request needs a "source" or "text"')
+
+  output = None
+  if request.get('output') is not None:
+    # checked before transforming, so a refused request has no effect
+    output = _insideRoot(request['output'], root)
+
+  result = transformer.transform(text, cache)
+  if output is not None:
+    writeSource(output, result)
+
+  return {'result': result}
+
+
+class _Handler(BaseHTTPRequestHandler):
+  def _respond(self, status, body):
+    data = json.dumps(body).encode('utf-8')
+    self.send_response(status)
+    self.send_header('Content-Type', 'application/json')
+    self.send_header('Content-Length', str(len(data)))
+    self.end_headers()
+    self.wfile.write(data)
+
+  def _refuse(self, require_json):
+    """_refuse rejects requests a browser could have sent on a page's behalf
+
+    :param require_json: boolean, if true the body must be JSON
+    :return: boolean, true if the request was refused (and answered)
+    """
+    port = self.server.server_address[1]
+    if self.headers.get('Host') not in (f'127.0.0.1:{port}', f'localhost:{port}'):
+      self._respond(403, {'error': 'Unexpected Host'})
+      return True
+    if self.headers.get('Origin') is not None:
+      # browsers send an Origin with cross-site and scripted requests, clients don't
+      self._respond(403, {'error': 'Requests from web pages aren\'t accepted'})
+      return True
+    authorization = self.headers.get('Authorization', '')
+    if not hmac.compare_digest(authorization.encode('utf-8'), f'Bearer {self.server.token}'.encode('utf-8')):
+      self._respond(401, {'error': 'Missing or wrong token'})
+      return True
+    content_type = self.headers.get('Content-Type', '').split(';')[0].strip().lower()
+    if require_json and content_type != 'application/json':
+      self._respond(415, {'error': 'Expected Content-Type application/json'})
+      return True
+    return False
+
+  def do_GET(self):
+    if self._refuse(require_json=False):
+      return
+    if self.path != '/status':
+      self._respond(404, {'error': f'Unknown path {self.path}'})
+      return
+
+    cache = self.server.cache
+    self._respond(200, {'cached': len(cache), 'hits': cache.hits, 'misses': cache.misses})
+
+  def do_POST(self):
+    if self._refuse(require_json=True):
+      return
+    if self.path != '/transform':
+      self._respond(404, {'error': f'Unknown path {self.path}'})
+      return
+
+    try:
+      length = int(self.headers.get('Content-Length', 0))
+      request = json.loads(self.rfile.read(length))
+      self._respond(200, handleRequest(request, self.server.cache, self.server.root))
+    except ParseError as e:
+      self._respond(422, {'error': str(e), 'errors': [error._asdict() for error in e.errors]})
+    except PermissionError as e:
+      self._respond(403, {'error': str(e)})
+    except (ValueError, SpecError, OSError) as e:
+      self._respond(400, {'error': str(e)})
+    except Exception as e:
+      self._respond(500, {'error': str(e)})
+
+  def log_message(self, format, *args):
+    # requests are too frequent to log individually
+    pass
+
+
+def makeServer(host=DEFAULT_HOST, port=DEFAULT_PORT, cache=None, root=None, token_path=None):
+  """makeServer creates the daemon's HTTP server, call serve_forever to run it
+  A new token is written to token_path, requests without it are refused
+
+  :param host: string, address to bind, keep this local
+  :param port: int, port to bind, 0 picks a free port
+  :param cache: ParseCache, (optional) cache of parsed trees
+  :param root: string, (optional) directory request paths must be in, defaults
+    to the working directory
+  :param token_path: string, (optional) token file, defaults to tokenPath(port)
+  :return: ThreadingHTTPServer
+  """
+  server = ThreadingHTTPServer((host, port), _Handler)
+  server.cache = cache if cache is not None else ParseCache()
+  server.root = os.path.realpath(root if root is not None else os.getcwd())
+  server.token_path = token_path if token_path is not None else tokenPath(server.server_address[1])
+  server.token = writeToken(server.token_path)
+  return server
+
+
+def transformRemote(spec, source=None, text=None, output=None, host=DEFAULT_HOST, port=DEFAULT_PORT, timeout=60,
+                    token=None):
+  """transformRemote sends a transform request to a running daemon
+
+  :param spec: dict, transformation spec (see Spec.py)
+  :param source: string, (optional) path to file to transform, as seen by the
+    daemon; it must be inside the daemon's root
+  :param text: string, (optional) source text to transform instead of a path
+  :param output: string, (optional) path the daemon writes the result to, inside its root
+  :param host: string, daemon address
+  :param port: int, daemon port
+  :param timeout: float, seconds to wait for a response
+  :param token: string, (optional) the daemon's token, read from tokenPath(port) by default
+  :return: string, transformed source
+  """
+  if token is None:
+    with open(tokenPath(port)) as f:
+      token = f.read().strip()
+
+  request = {'spec': spec}
+  if text is not None:
+    request['text'] = text
+  if source is not None:
+    request['source'] = source
+  if output is not None:
+    request['output'] = output
+
+  http_request = urllib.request.Request(
+    f'http://{host}:{port}/transform',
+    data=json.dumps(request).encode('utf-8'),
+    headers={'Content-Type': 'application/json', 'Authorization': f'Bearer {token}'})
+  try:
+    with urllib.request.urlopen(http_request, timeout=timeout) as response:
+      return json.loads(response.read())['result']
+  except urllib.error.HTTPError as e:
+    raise DaemonError(json.loads(e.read()).get('error', str(e))) from e
+
+
+def main():
+  parser = argparse.ArgumentParser(description='Run the Modelica transform daemon')
+  parser.add_argument('--host', default=DEFAULT_HOST)
+  parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+  parser.add_argument('--max-cached', type=int, default=64, help='number of parsed files to keep')
+  parser.add_argument('--root', default=os.getcwd(), help='directory request sources and outputs must be in')
+  parser.add_argument('--token-file', help='file to write the token to, defaults to ~/.modelica-transformer/daemon-<port>.token')
+  args = parser.parse_args()
+
+  # load the parser up front so the first request doesn't pay for it
+  load()
+  server = makeServer(args.host, args.port, ParseCache(args.max_cached), args.root, args.token_file)
+  print(f'listening on {args.host}:{server.server_address[1]}, token in {server.token_path}')
+  try:
+    server.serve_forever()
+  except KeyboardInterrupt:
+    pass
+  finally:
+    server.server_close()
+    os.remove(server.token_path)
+
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,119 @@
+# Documents
+#
+# Transformers, selectors and debug helpers each used to read and parse the
+# file they're given, so querying and transforming the same file parsed it
+# again for every consumer. A Document is a source (text, or a path read on
+# first use) and everything derived from it: its parses, one per set of parse
+# options, and the line index. Trees keep their selector memo tables and
+# indexes (see Selector.py and Index.py), so every consumer given the same
+# Document shares the parse and the indexes built from it.
+
+from bisect import bisect_right
+
+from modelicaTransformer.Parse import parse, readSource
+
+
+class Document:
+  """Document is a Modelica source and its parses, accepted by Transformer,
+  Selector.apply and Selector.debug in place of a text or path
+  """
+
+  def __init__(self, text=None, path=None, **parse_options):
+    """__init__ initializes the document, nothing is read or parsed until needed
+
+    :param text: string, (optional) Modelica source
+    :param path: string, (optional) path to the source, read on first use if text isn't given
+    :param parse_options: options passed to Parse.parse for tree and parser
+    """
+    if text is None and path is None:
+      raise Exception('Expected a text or a path')
+    self.path = path
+    self._text = text
+    self._parse_options = parse_options
+    # options key -> (tree, parser)
+    self._parses = {}
+    self._line_starts = None
+
+  @property
+  def text(self):
+    """text is the source text"""
+    if self._text is None:
+      self._text = readSource(self.path)
+    return self._text
+
+  @property
+  def parseOptions(self):
+    """parseOptions are the document's own parse options, see __init__"""
+    return dict(self._parse_options)
+
+  def parse(self, options=None):
+    """parse returns the document's tree and parser for a set of parse options,
+    parsing the text the first time they're used
+
+    :param options: dict, (optional) options for Parse.parse, if None the
+      document's own parse options
+    :return: tree, parser
+    """
+    from modelicaTransformer.Cache import optionsKey
+
+    if options is None:
+      options = self._parse_options
+    key = optionsKey(options)
+    entry = self._parses.get(key)
+    if entry is None:
+      entry = parse(self.text, **options)
+      self._parses[key] = entry
+    return entry
+
+  @property
+  def tree(self):
+    """tree is the root of the tree parsed with the document's parse options"""
+    return self.parse()[0]
+
+  @property
+  def parser(self):
+    """parser is the parser that built tree"""
+    return self.parse()[1]
+
+  @property
+  def tokenStream(self):
+    """tokenStream is the filled token stream of tree"""
+    return self.parser.getTokenStream()
+
+  def select(self, selector):
+    """select applies a selector to the document's tree
+
+    :param selector: Selector, selector to apply
+    :return: list, selected nodes
+    """
+    return selector.apply(self.tree, self.parser)
+
+  def _lineStarts(self):
+    if self._line_starts is None:
+      starts = [0]
+      text = self.text
+      index = text.find('\n')
+      while index != -1:
+        starts.append(index + 1)
+        index = text.find('\n', index + 1)
+      self._line_starts = starts
+    return self._line_starts
+
+  def position(self, offset):
+    """position returns the line and column of a character offset
+
+    :param offset: int, 0-based character index into the text
+    :return: int, int; 1-based line and 0-based column, as in SyntaxIssue
+    """
+    starts = self._lineStarts()
+    line = bisect_right(starts, offset)
+    return line, offset - starts[line - 1]
+
+  def offset(self, line, column):
+    """offset returns the character offset of a line and column
+
+    :param line: int, 1-based line
+    :param column: int, 0-based column
+    :return: int, 0-based character index into the text
+    """
+    return self._lineStarts()[line - 1] + column
@@ -1,3 +1,6 @@
+import functools
+
+
 class Edit:
   start = None
   stop = None
@@ -17,21 +20,46 @@ class Edit:
     # e.g. if it's a terminal this might not work
     return node.start.start, node.stop.stop
   
+  @classmethod
+  def _delete(cls, node):
+    start, stop = cls._getSpan(node)
+    edit = cls()
+    edit.start = start
+    edit.stop = stop
+    edit.data = None
+    return edit
+
+  @classmethod
+  def _replace(cls, data, node):
+    start, stop = cls._getSpan(node)
+
+    edit = cls()
+    edit.start = start
+    edit.stop = stop
+    edit.data = data
+    return edit
+
+  @classmethod
+  def _insert(cls, data, insert_after, node):
+    start, stop = cls._getSpan(node)
+    if insert_after:
+      start = stop + 1
+    
+    edit = cls()
+    edit.start = start
+    edit.stop = stop
+    edit.data = data
+    return edit
+
+  # the factories return partials rather than closures so transformations
+  # can be pickled and sent to worker processes
   @classmethod
   def makeDelete(cls):
     """Factory for a deletion edit
 
     :return: function, edit function for delete
     """
-    def delete(node):
-      start, stop = cls._getSpan(node)
-      edit = cls()
-      edit.start = start
-      edit.stop = stop
-      edit.data = None
-      return edit
-  
-    return delete
+    return functools.partial(cls._delete)
   
   @classmethod
   def makeReplace(cls, data):
@@ -40,16 +68,20 @@ class Edit:
     :param data: string, replacement value
     :return: function, edit function for replace
     """
-    def replace(node):
-      start, stop = cls._getSpan(node)
+    return functools.partial(cls._replace, data)
+  
+  @classmethod
+  def makeReplaceArray(cls, array):
+    """Factory for a replacement edit with an array literal, e.g. for a
+    numeric literal selected with the numeric_literals parse option.
+    The literal is formatted once, when the edit is made
 
-      edit = cls()
-      edit.start = start
-      edit.stop = stop
-      edit.data = data
-      return edit
-    
-    return replace
+    :param array: array-like, numbers; 2-D arrays are written as matrices
+    :return: function, edit function for replace
+    """
+    from modelicaTransformer.Numeric import formatArray
+
+    return functools.partial(cls._replace, formatArray(array))
   
   @classmethod
   def makeInsert(cls, data, insert_after=True):
@@ -59,18 +91,7 @@ class Edit:
     :param insert_after: boolean, if true data is inserted _after_ selected node
     :return: function, edit function for insert
     """
-    def insert(node):
-      start, stop = cls._getSpan(node)
-      if insert_after:
-        start = stop + 1
-      
-      edit = cls()
-      edit.start = start
-      edit.stop = stop
-      edit.data = data
-      return edit
-    
-    return insert
+    return functools.partial(cls._insert, data, insert_after)
   
   @staticmethod
   def applyEdits(edits, document):
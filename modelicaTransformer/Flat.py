@@ -0,0 +1,66 @@
+# Flat expression trees
+#
+# Every operand in an expression goes through the chain
+#   expression > simple_expression > logical_expression > logical_term >
+#   logical_factor > relation > arithmetic_expression > term > factor > primary
+# which adds eight single-child contexts for every number in a model. In a
+# flat tree the intermediate contexts are only kept where they have more
+# than one child (i.e. where an operator actually appears), so a plain value
+# is just expression > primary.
+#
+# expression and primary nodes, and all spans, are the same as in the full
+# tree, so selectors on those rules work unchanged. Selectors or accessors
+# that expect the intermediate rules (e.g. expression.simple_expression())
+# only find them where an operator is present.
+#
+# The parser still builds every context and splices the chain out when an
+# expression exits, so parsing isn't faster (it's slightly slower). The gain
+# is in what comes after: selections, indexes and cached trees have far fewer
+# nodes to walk and hold.
+
+from antlr4 import ParserRuleContext
+
+CHAIN_RULES = (
+  'simple_expression',
+  'logical_expression',
+  'logical_term',
+  'logical_factor',
+  'relation',
+  'arithmetic_expression',
+  'term',
+  'factor',
+)
+
+
+def chainRuleIndexes(parser_class):
+  return frozenset(parser_class.ruleNames.index(rule) for rule in CHAIN_RULES)
+
+
+def collapse(ctx, chain_rules):
+  """collapse splices single-child intermediate contexts out of an expression
+
+  :param ctx: object, expression (or intermediate) context to collapse below
+  :param chain_rules: frozenset, rule indexes of the intermediate rules
+  """
+  children = ctx.children
+  if not children:
+    return
+
+  for i, child in enumerate(children):
+    if not isinstance(child, ParserRuleContext) or child.getRuleIndex() not in chain_rules:
+      continue
+
+    replacement = child
+    while (replacement.getRuleIndex() in chain_rules
+           and replacement.children is not None
+           and len(replacement.children) == 1
+           and isinstance(replacement.children[0], ParserRuleContext)):
+      replacement = replacement.children[0]
+
+    if replacement is not child:
+      replacement.parentCtx = ctx
+      children[i] = replacement
+
+    if replacement.getRuleIndex() in chain_rules:
+      collapse(replacement, chain_rules)
+
@@ -0,0 +1,247 @@
+# Tree indexes
+#
+# select() used to find a rule's nodes with an XPath query, which walks the
+# whole subtree for every step of a path and filters duplicates with a linear
+# scan of the results. A tree's index lists the nodes of each rule in
+# preorder, found the first time the rule is selected by a walk skipping the
+# subtrees which can't contain it (see Reach.py), and is kept on the tree's
+# root like the selector memo table. The nodes of a rule below a root are
+# found by bisecting on their start offset and checking their ancestry.
+#
+# Filtering on a child's text uses a second index per (rule, child), mapping
+# the child's normalized text to the nodes, built on first use from the
+# tree's root; selections below other roots compare the texts of their
+# candidates directly.
+
+from bisect import bisect_left, bisect_right
+import threading
+
+from modelicaTransformer.Reach import ruleReachability, walkRule
+from modelicaTransformer.Text import nodeText
+
+_index_lock = threading.Lock()
+
+
+def _treeRoot(node):
+  while node.parentCtx is not None:
+    node = node.parentCtx
+  return node
+
+
+def _startOffset(node):
+  return node.start.start if node.start is not None else -1
+
+
+def _children(node, child):
+  """_children returns the children of node selected by a child name, like
+  the generated accessors (e.g. IDENT or component_reference)
+
+  :param node: object, context
+  :param child: string, name of the child's rule or token
+  :return: list, children
+  """
+  accessor = getattr(node, child, None)
+  if accessor is None:
+    return []
+  # accessors return a list when the rule can have several such children
+  children = accessor()
+  if not isinstance(children, list):
+    children = [children] if children is not None else []
+  return children
+
+
+def matchingChildren(node, child, child_value):
+  """matchingChildren counts the children of node selected by a child name
+  whose normalized text (see Text.py) is child_value
+
+  :param node: object, context
+  :param child: string, name of the child's rule or token
+  :param child_value: string, text to match
+  :return: int, number of matching children
+  """
+  return sum(1 for _child in _children(node, child) if nodeText(_child, normalized=True) == child_value)
+
+
+class TreeIndex:
+  """TreeIndex lists the nodes of each rule of a tree"""
+
+  def __init__(self, root, parser):
+    """__init__ initializes the index of a tree, rules are indexed when first looked up
+
+    :param root: object, root of the tree
+    :param parser: object, parser that built the tree
+    """
+    self._root = root
+    self._rules = {name: index for index, name in enumerate(parser.ruleNames)}
+    self._reachable = ruleReachability(parser)
+    # rule index -> (nodes in preorder, their start offsets); offsets are
+    # characters rather than token indexes, the tokens of expanded annotations
+    # are indexed in their own stream. Entries are replaced, never changed in
+    # place, so threads selecting from the tree read consistent lists
+    self._entries = {}
+    # (rule index, child) -> child text -> nodes
+    self._child_texts = {}
+    # serializes filling and updating the index, trees are shared across threads
+    self._lock = threading.RLock()
+
+  def _indexed(self, rule):
+    """_indexed returns the nodes of a rule and their start offsets, walking
+    the tree for them on first use
+
+    :param rule: int, rule index
+    :return: list, list; nodes in preorder and their start offsets
+    """
+    entry = self._entries.get(rule)
+    if entry is None:
+      with self._lock:
+        entry = self._entries.get(rule)
+        if entry is None:
+          nodes = walkRule(self._root, rule, self._reachable)
+          entry = (nodes, [_startOffset(node) for node in nodes])
+          self._entries[rule] = entry
+    return entry
+
+  def replace(self, old, new):
+    """replace updates the index after the subtree old was replaced by new,
+    both having the same span
+
+    :param old: object, root of the removed subtree
+    :param new: object, root of the added subtree
+    """
+    with self._lock:
+      changed = set()
+      for rule, (nodes, starts) in list(self._entries.items()):
+        removed = walkRule(old, rule, self._reachable)
+        added = walkRule(new, rule, self._reachable)
+        if not removed and not added:
+          continue
+        changed.add(rule)
+        # nothing else starts inside the span, each subtree's nodes are contiguous in preorder
+        if removed:
+          i = nodes.index(removed[0], bisect_left(starts, _startOffset(removed[0])))
+        else:
+          i = bisect_left(starts, _startOffset(added[0]))
+        end = i + len(removed)
+        self._entries[rule] = (
+          nodes[:i] + added + nodes[end:],
+          starts[:i] + [_startOffset(node) for node in added] + starts[end:])
+      self._child_texts = {key: texts for key, texts in self._child_texts.items() if key[0] not in changed}
+
+  def _ruleIndex(self, rule):
+    if rule not in self._rules:
+      raise Exception(f'{rule} is not a valid rule name')
+    return self._rules[rule]
+
+  def _below(self, root, nodes, starts, max_depth=None):
+    """_below filters nodes, in preorder, to root and its descendants
+
+    :param root: object, context
+    :param nodes: list, nodes in preorder
+    :param starts: list, start character offset of each node
+    :param max_depth: int, (optional) deepest level below root to keep, 0 is root itself
+    :return: list, nodes which are root or below it
+    """
+    if root is self._root and max_depth is None:
+      return list(nodes)
+    if root.start is None:
+      return [node for node in nodes if node is root]
+
+    first = root.start.start
+    last = root.stop.stop if root.stop is not None else first
+    begin = bisect_left(starts, first)
+    end = bisect_right(starts, last)
+    # empty nodes at the end of root start at the token after it
+    if end < len(starts):
+      end = bisect_right(starts, starts[end])
+
+    results = []
+    for node in nodes[begin:end]:
+      # nodes overlapping root are either above or below it
+      ancestor = node
+      depth = 0
+      while ancestor is not None and ancestor is not root and ancestor.start.start >= first:
+        ancestor = ancestor.parentCtx
+        depth += 1
+        if max_depth is not None and depth > max_depth:
+          break
+      if ancestor is root and (max_depth is None or depth <= max_depth):
+        results.append(node)
+    return results
+
+  def find(self, root, rule, max_depth=None):
+    """find returns root and its descendants of a rule, in preorder
+
+    :param root: object, node of the indexed tree
+    :param rule: string, name of the rule
+    :param max_depth: int, (optional) deepest level below root to search, 0 is root itself
+    :return: list, nodes
+    """
+    nodes, starts = self._indexed(self._ruleIndex(rule))
+    return self._below(root, nodes, starts, max_depth)
+
+  def findByChild(self, root, rule, child, child_value, max_depth=None):
+    """findByChild returns root and its descendants of a rule which have a
+    child with a normalized text (see Text.py); a node is listed once per
+    matching child
+
+    :param root: object, node of the indexed tree
+    :param rule: string, name of the rule
+    :param child: string, name of the child, e.g. IDENT or name
+    :param child_value: string, text to match
+    :param max_depth: int, (optional) deepest level below root to search, 0 is root itself
+    :return: list, nodes
+    """
+    index = self._ruleIndex(rule)
+    key = (index, child)
+    if root is not self._root and key not in self._child_texts:
+      # a subtree, cheaper to compare the candidates than to index the tree
+      return [
+        node for node in self.find(root, rule, max_depth)
+        for _ in range(matchingChildren(node, child, child_value))
+      ]
+
+    texts = self._child_texts.get(key)
+    if texts is None:
+      with self._lock:
+        texts = self._child_texts.get(key)
+        if texts is None:
+          texts = {}
+          for node in self._indexed(index)[0]:
+            for _child in _children(node, child):
+              texts.setdefault(nodeText(_child, normalized=True), []).append(node)
+          self._child_texts[key] = texts
+
+    nodes = texts.get(child_value, [])
+    if root is self._root and max_depth is None:
+      return list(nodes)
+    return self._below(root, nodes, [_startOffset(node) for node in nodes], max_depth)
+
+
+def treeIndex(node, parser):
+  """treeIndex returns the index of the tree a node belongs to, building it if needed
+
+  :param node: object, any node of the tree
+  :param parser: object, parser that built the tree
+  :return: TreeIndex
+  """
+  root = _treeRoot(node)
+  index = getattr(root, '_tree_index', None)
+  if index is None:
+    with _index_lock:
+      index = getattr(root, '_tree_index', None)
+      if index is None:
+        index = TreeIndex(root, parser)
+        root._tree_index = index
+  return index
+
+
+def replaceInIndex(old, new):
+  """replaceInIndex updates the index of a tree, if it has one, after the
+  subtree old was replaced by new (e.g. expanding an opaque annotation)
+
+  :param old: object, root of the removed subtree
+  :param new: object, root of the added subtree, already in the tree
+  """
+  index = getattr(_treeRoot(new), '_tree_index', None)
+  if index is not None:
+    index.replace(old, new)
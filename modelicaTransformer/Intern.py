@@ -0,0 +1,43 @@
+# Identifier interning
+#
+# The same identifiers (flange, port_a, p, n) repeat throughout a library,
+# and every IDENT token holds its own copy of its text, or builds a new one
+# each time it's read. With the interning parse option, IDENT tokens share a
+# single string per identifier: per document (a table owned by the parser),
+# or per process (sys.intern, shared by all parses for the life of the
+# process). Texts read from the tree (getText, nodeText) and the keys of the
+# tree's indexes are then the shared strings, so matching them against an
+# interned value is an identity check.
+
+import sys
+
+
+def makeInterner(mode):
+  """makeInterner returns the function interning identifiers for a mode
+
+  :param mode: string, one of Parse.INTERNING
+  :return: function, string -> shared equal string; None if mode is none
+  """
+  if mode == 'none':
+    return None
+  if mode == 'process':
+    return sys.intern
+
+  table = {}
+
+  def intern(text):
+    return table.setdefault(text, text)
+
+  return intern
+
+
+def internTokens(tokens, ident_type, intern):
+  """internTokens replaces the texts of IDENT tokens with interned strings
+
+  :param tokens: list, tokens (a filled token stream)
+  :param ident_type: int, token type of IDENT
+  :param intern: function, from makeInterner
+  """
+  for token in tokens:
+    if token.type == ident_type:
+      token.text = intern(token.text)
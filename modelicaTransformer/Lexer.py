@@ -0,0 +1,199 @@
+# Regular expression lexer
+#
+# The generated modelicaLexer runs the runtime's ATN simulator for every
+# character, which makes lexing a large part of parsing, most of all for
+# files heavy in comments and strings. RegexLexer matches one token at a
+# time with a single compiled regular expression instead, and emits the same
+# tokens: same types (keywords and operators from modelica.tokens), channels
+# (WS, COMMENT and LINE_COMMENT hidden), character offsets, lines and columns.
+#
+# The lexer rules are written so that the first alternative matching at a
+# position is also the longest match antlr would pick; keywords are matched as
+# identifiers and looked up, so `end` is a keyword but `ending` an IDENT.
+#
+# It only handles characters it can match: at the first position where no
+# token matches (a lexer error, e.g. an unterminated string), it hands the
+# rest of the input over to modelicaLexer, so errors are reported and
+# recovered from exactly as with the generated lexer.
+#
+# Select it with the lexer='regex' parse option.
+
+import re
+
+from antlr4 import Token
+from antlr4.CommonTokenFactory import CommonTokenFactory
+from antlr4.error.ErrorListener import ConsoleErrorListener
+from antlr4.Lexer import TokenSource
+from antlr4.Token import CommonToken
+
+_ESCAPE = r'\\[\u2019\'"?\\abfnrtv]'
+
+# alternatives are tried in order, each starts with different characters
+# except the comments, which are longer than the '/' operator they start with
+_RULES = [
+  ('WS', r'[ \r\n\t]+'),
+  ('COMMENT', r'/\*[\s\S]*?\*/'),
+  ('LINE_COMMENT', r'//[^\r\n]*'),
+  ('STRING', r'"(?:[^"\\]|' + _ESCAPE + r')*"'),
+  ('Q_IDENT', r"'(?:[A-Za-z0-9_!#$%&()*+,\-./:;<>=?@\[\]^{}|~]|" + _ESCAPE + r")+'"),
+  ('UNSIGNED_NUMBER', r'[0-9]+(?:\.[0-9]*)?(?:[eE][+-]?[0-9]+)?'),
+  ('WORD', r'[A-Za-z_][A-Za-z0-9_]*'),
+]
+
+_tables = None
+
+
+def _lexerTables():
+  """_lexerTables builds the token regular expression and the token types of
+  keywords and operators from the generated lexer's literal names
+
+  :return: pattern, dict, dict, dict; the compiled expression, keyword types,
+    operator types and the type and channel of the other rules
+  """
+  global _tables
+  if _tables is None:
+    from modelicaTransformer.Parse import load
+
+    modelicaLexer, _ = load()
+    keywords = {}
+    operators = {}
+    for token_type, name in enumerate(modelicaLexer.literalNames):
+      if not name.startswith("'"):
+        continue
+      literal = name[1:-1]
+      if re.match(r'[A-Za-z_]\w*$', literal):
+        keywords[literal] = token_type
+      else:
+        operators[literal] = token_type
+
+    # longest operators first, so '.*' is matched before '.'
+    operator_pattern = '|'.join(re.escape(literal) for literal in sorted(operators, key=len, reverse=True))
+    pattern = re.compile('|'.join(
+      [f'(?P<{name}>{rule})' for name, rule in _RULES] + [f'(?P<OPERATOR>{operator_pattern})']))
+    kinds = {
+      'WS': (modelicaLexer.WS, Token.HIDDEN_CHANNEL),
+      'COMMENT': (modelicaLexer.COMMENT, Token.HIDDEN_CHANNEL),
+      'LINE_COMMENT': (modelicaLexer.LINE_COMMENT, Token.HIDDEN_CHANNEL),
+      'STRING': (modelicaLexer.STRING, Token.DEFAULT_CHANNEL),
+      'Q_IDENT': (modelicaLexer.IDENT, Token.DEFAULT_CHANNEL),
+      'UNSIGNED_NUMBER': (modelicaLexer.UNSIGNED_NUMBER, Token.DEFAULT_CHANNEL),
+    }
+    _tables = pattern, keywords, operators, kinds
+  return _tables
+
+
+class RegexLexer(TokenSource):
+  """RegexLexer is a token source emitting the same tokens as modelicaLexer,
+  it can be used in its place, e.g. CommonTokenStream(RegexLexer(TextStream(text)))
+  """
+
+  def __init__(self, input, intern=None):
+    """__init__ initializes the lexer
+
+    :param input: object, antlr char stream; lexing starts at its current index
+    :param intern: function, (optional) interns the texts of IDENT tokens (see Intern.py)
+    """
+    self._input = input
+    self._text = input.strdata
+    self._pos = input.index
+    self._line = 1
+    self._line_start = 0
+    self._pattern, self._keywords, self._operators, self._kinds = _lexerTables()
+    self._ident = self._kinds['Q_IDENT'][0]
+    self._intern = intern
+    self._factory = CommonTokenFactory.DEFAULT
+    self._tokenFactorySourcePair = (self, input)
+    self._listeners = [ConsoleErrorListener.INSTANCE]
+    # modelicaLexer lexing the rest of the input after a lexer error
+    self._fallback = None
+
+  @property
+  def line(self):
+    return self._fallback.line if self._fallback is not None else self._line
+
+  @property
+  def column(self):
+    return self._fallback.column if self._fallback is not None else self._pos - self._line_start
+
+  def getInputStream(self):
+    return self._input
+
+  def getSourceName(self):
+    return self._input.name
+
+  def addErrorListener(self, listener):
+    self._listeners.append(listener)
+
+  def removeErrorListeners(self):
+    self._listeners = []
+
+  def _handOver(self):
+    """_handOver continues lexing with modelicaLexer from the current position"""
+    from modelicaTransformer.Parse import load
+
+    modelicaLexer, _ = load()
+    lexer = modelicaLexer(self._input)
+    self._input.seek(self._pos)
+    lexer.line = self._line
+    lexer.column = self._pos - self._line_start
+    lexer._listeners = list(self._listeners)
+    self._fallback = lexer
+
+  def nextToken(self):
+    """nextToken matches the token at the current position
+
+    :return: object, CommonToken; an EOF token at the end of the input
+    """
+    if self._fallback is not None:
+      return self._fallback.nextToken()
+
+    pos = self._pos
+    text = self._text
+    token = object.__new__(CommonToken)
+    if pos >= len(text):
+      token.__dict__.update(
+        source=self._tokenFactorySourcePair, type=Token.EOF, channel=Token.DEFAULT_CHANNEL, start=pos,
+        stop=pos - 1, tokenIndex=-1, line=self._line, column=pos - self._line_start, _text=None)
+      return token
+
+    match = self._pattern.match(text, pos)
+    if match is None:
+      self._handOver()
+      return self._fallback.nextToken()
+
+    value = match.group()
+    kind = match.lastgroup
+    if kind == 'WORD':
+      token_type = self._keywords.get(value, self._ident)
+      channel = Token.DEFAULT_CHANNEL
+    elif kind == 'OPERATOR':
+      token_type = self._operators[value]
+      channel = Token.DEFAULT_CHANNEL
+    else:
+      token_type, channel = self._kinds[kind]
+    if token_type == self._ident and self._intern is not None:
+      value = self._intern(value)
+
+    end = match.end()
+    token.__dict__.update(
+      source=self._tokenFactorySourcePair, type=token_type, channel=channel, start=pos, stop=end - 1,
+      tokenIndex=-1, line=self._line, column=pos - self._line_start, _text=value)
+
+    self._pos = end
+    newlines = value.count('\n')
+    if newlines:
+      self._line += newlines
+      self._line_start = pos + value.rfind('\n') + 1
+    return token
+
+  def getAllTokens(self):
+    """getAllTokens lexes the rest of the input
+
+    :return: list, tokens up to, but not including, EOF
+    """
+    tokens = []
+    token = self.nextToken()
+    while token.type != Token.EOF:
+      tokens.append(token)
+      token = self.nextToken()
+    return tokens
@@ -0,0 +1,1051 @@
+# Recursive descent parsing engine
+#
+# A hand-written parser for modelica.g4 which builds the same contexts as the
+# generated modelicaParser (same classes, children, start and stop tokens),
+# without the runtime's adaptive prediction. Every decision is made with a
+# fixed lookahead on the on-channel tokens; the few which need more (a call
+# statement in an equation, a function call in a primary) scan ahead to the
+# token which decides them.
+#
+# It only handles valid input: on the first token it can't match it gives up
+# and the generated parser parses the file instead, so syntax errors are
+# reported and recovered from exactly as with the antlr engine.
+#
+# Select it with the engine='native' parse option. Tree shaping options
+# (flat_expressions, prune) are applied while building, the same way as
+# ShapedModelicaParser; parse listeners aren't supported, parsers with
+# listeners (e.g. streaming selection) always use the antlr engine.
+
+import gc
+
+from antlr4 import Token
+from antlr4.tree.Tree import TerminalNodeImpl
+
+CLASS_KEYWORDS = frozenset([
+  'class', 'model', 'operator', 'record', 'block', 'expandable', 'connector',
+  'type', 'package', 'pure', 'impure', 'function'
+])
+CLASS_PREFIX_FIRST = CLASS_KEYWORDS | {'partial'}
+CLASS_DEFINITION_FIRST = CLASS_PREFIX_FIRST | {'encapsulated'}
+TYPE_PREFIXES = frozenset(['flow', 'stream', 'discrete', 'parameter', 'constant', 'input', 'output'])
+ELEMENT_FIRST = CLASS_DEFINITION_FIRST | TYPE_PREFIXES | {
+  'import', 'extends', 'redeclare', 'final', 'inner', 'outer', 'replaceable', '.', 'IDENT'
+}
+PRIMARY_FIRST = frozenset([
+  'NUMBER', 'STRING', 'false', 'true', '.', 'IDENT', 'der', 'initial', '(', '[', '{', 'end'
+])
+ADD_OPS = frozenset(['+', '-', '.+', '.-'])
+MUL_OPS = frozenset(['*', '/', '.*', './'])
+REL_OPS = frozenset(['<', '<=', '>', '>=', '==', '<>'])
+EXPRESSION_FIRST = PRIMARY_FIRST | ADD_OPS | {'not', 'if'}
+EQUATION_FIRST = EXPRESSION_FIRST | {'for', 'connect', 'when'}
+STATEMENT_FIRST = frozenset(['IDENT', '.', '(', 'break', 'return', 'if', 'for', 'while', 'when'])
+
+# decisions look at most this many tokens past the current one
+_LOOKAHEAD = 4
+
+
+class _Mismatch(Exception):
+  """_Mismatch is raised when the input isn't valid, the antlr engine takes over"""
+
+
+class NativeParser:
+  """NativeParser parses the tokens of a generated parser's token stream into
+  the generated parser's contexts
+  """
+
+  def __init__(self, parser):
+    """__init__ initializes the engine
+
+    :param parser: object, generated (or shaped) parser; its token stream is
+      read, and it's the parser of the built contexts
+    """
+    stream = parser.getTokenStream()
+    stream.fill()
+    self._parser = parser
+    self._tokens = [token for token in stream.tokens if token.channel == Token.DEFAULT_CHANNEL]
+
+    kinds = {
+      parser.IDENT: 'IDENT',
+      parser.STRING: 'STRING',
+      parser.UNSIGNED_NUMBER: 'NUMBER',
+      Token.EOF: '<EOF>'
+    }
+    # keywords and operators are compared by text, other tokens by kind
+    self._kinds = [kinds.get(token.type, token.text) for token in self._tokens] + ['<EOF>'] * _LOOKAHEAD
+    self._pos = 0
+
+    self._classes = {
+      rule: getattr(parser.__class__, rule[0].upper() + rule[1:] + 'Context')
+      for rule in parser.ruleNames
+    }
+    self._flat = getattr(parser, 'flat_expressions', False)
+    self._prune = getattr(parser, 'prune_rules', frozenset())
+
+  def parse(self, rule='stored_definition'):
+    """parse parses a rule, stored_definition must reach the end of input
+
+    :param rule: string, name of the rule to parse
+    :return: object, context of the rule, or None if the input isn't valid
+    """
+    # the tree is hundreds of thousands of new objects, all reachable, which
+    # would make the cyclic garbage collector run over and over while it's built
+    collecting = gc.isenabled()
+    gc.disable()
+    try:
+      ctx = getattr(self, rule)()
+    except (_Mismatch, RecursionError):
+      return None
+    finally:
+      if collecting:
+        gc.enable()
+
+    if rule == 'stored_definition' and self._kinds[self._pos] != '<EOF>':
+      return None
+    return ctx
+
+  # helpers
+
+  def _new(self, rule):
+    # the attributes the generated context's __init__ sets, without its chain of __init__ calls
+    ctx = object.__new__(self._classes[rule])
+    ctx.__dict__.update(
+      parentCtx=None, invokingState=-1, children=None, start=self._tokens[self._pos],
+      stop=None, exception=None, parser=self._parser)
+    return ctx
+
+  def _done(self, ctx):
+    pos = self._pos
+    ctx.stop = self._tokens[pos - 1] if pos else None
+    if self._prune and ctx.getRuleIndex() in self._prune:
+      ctx.children = None
+    return ctx
+
+  def _add(self, ctx, child):
+    child.parentCtx = ctx
+    child.invokingState = 0
+    if ctx.children is None:
+      ctx.children = [child]
+    else:
+      ctx.children.append(child)
+
+  def _token(self, ctx):
+    node = object.__new__(TerminalNodeImpl)
+    node.__dict__.update(parentCtx=ctx, symbol=self._tokens[self._pos])
+    if ctx.children is None:
+      ctx.children = [node]
+    else:
+      ctx.children.append(node)
+    self._pos += 1
+
+  def _expect(self, ctx, kind):
+    if self._kinds[self._pos] != kind:
+      raise _Mismatch()
+    self._token(ctx)
+
+  def _optional(self, ctx, kinds):
+    if self._kinds[self._pos] in kinds:
+      self._token(ctx)
+
+  def _at(self, offset=0):
+    return self._kinds[self._pos + offset]
+
+  def _isCall(self):
+    """_isCall checks if a name followed by '(' starts at the current token"""
+    kinds = self._kinds
+    i = self._pos
+    if kinds[i] == '.':
+      i += 1
+    if kinds[i] != 'IDENT':
+      return False
+    i += 1
+    while kinds[i] == '.' and kinds[i + 1] == 'IDENT':
+      i += 2
+    return kinds[i] == '('
+
+  def _isCallEquation(self):
+    """_isCallEquation checks if an equation is `name function_call_args comment`
+    rather than `simple_expression = expression`, by looking past the call's arguments
+    """
+    if not self._isCall():
+      return False
+
+    kinds = self._kinds
+    i = self._pos
+    while kinds[i] != '(':
+      i += 1
+    depth = 0
+    while True:
+      kind = kinds[i]
+      if kind == '(':
+        depth += 1
+      elif kind == ')':
+        depth -= 1
+        if depth == 0:
+          break
+      elif kind == '<EOF>':
+        return False
+      i += 1
+    return kinds[i + 1] in (';', 'STRING', 'annotation')
+
+  def _classDefinitionOrComponent(self, ctx):
+    if self._at() in CLASS_DEFINITION_FIRST:
+      self._add(ctx, self.class_definition())
+    else:
+      self._add(ctx, self.component_clause())
+
+  def _shortClassOrComponent1(self, ctx):
+    if self._at() in CLASS_PREFIX_FIRST:
+      self._add(ctx, self.short_class_definition())
+    else:
+      self._add(ctx, self.component_clause1())
+
+  def _equations(self, ctx):
+    # (equation ';')*, 'initial equation' starts a new section and 'end' closes the block
+    while True:
+      kind = self._at()
+      if kind == 'end' or (kind == 'initial' and self._at(1) != '('):
+        return
+      if kind not in EQUATION_FIRST:
+        return
+      self._add(ctx, self.equation())
+      self._expect(ctx, ';')
+
+  def _statements(self, ctx):
+    while self._at() in STATEMENT_FIRST:
+      self._add(ctx, self.statement())
+      self._expect(ctx, ';')
+
+  def _chain(self, ctx, flat):
+    """_chain finishes an intermediate expression context, in a flat
+    expression it's left out when it has just one child (see Flat.py)
+    """
+    self._done(ctx)
+    children = ctx.children
+    if flat and children is not None and len(children) == 1 and not isinstance(children[0], TerminalNodeImpl):
+      return children[0]
+    return ctx
+
+  # rules, in the order of modelica.g4
+
+  def stored_definition(self):
+    ctx = self._new('stored_definition')
+    while self._at() == 'within':
+      self._token(ctx)
+      if self._at() != ';':
+        self._add(ctx, self.name())
+      self._expect(ctx, ';')
+    while self._at() == 'final' or self._at() in CLASS_DEFINITION_FIRST:
+      self._optional(ctx, ('final',))
+      self._add(ctx, self.class_definition())
+      self._expect(ctx, ';')
+    return self._done(ctx)
+
+  def class_definition(self):
+    ctx = self._new('class_definition')
+    self._optional(ctx, ('encapsulated',))
+    self._add(ctx, self.class_prefixes())
+    self._add(ctx, self.class_specifier())
+    return self._done(ctx)
+
+  def class_specifier(self):
+    ctx = self._new('class_specifier')
+    if self._at() == 'IDENT' and self._at(1) == '=':
+      if self._at(2) == 'der':
+        self._add(ctx, self.der_class_specifier())
+      else:
+        self._add(ctx, self.short_class_specifier())
+    else:
+      self._add(ctx, self.long_class_specifier())
+    return self._done(ctx)
+
+  def class_prefixes(self):
+    ctx = self._new('class_prefixes')
+    self._optional(ctx, ('partial',))
+    kind = self._at()
+    if kind in ('class', 'model', 'record', 'block', 'connector', 'type', 'package', 'function'):
+      self._token(ctx)
+    elif kind == 'operator':
+      self._token(ctx)
+      self._optional(ctx, ('record', 'function'))
+    elif kind == 'expandable':
+      self._token(ctx)
+      self._expect(ctx, 'connector')
+    elif kind in ('pure', 'impure'):
+      self._token(ctx)
+      self._optional(ctx, ('operator',))
+      self._expect(ctx, 'function')
+    else:
+      raise _Mismatch()
+    return self._done(ctx)
+
+  def long_class_specifier(self):
+    ctx = self._new('long_class_specifier')
+    if self._at() == 'extends':
+      self._token(ctx)
+      self._expect(ctx, 'IDENT')
+      if self._at() == '(':
+        self._add(ctx, self.class_modification())
+    else:
+      self._expect(ctx, 'IDENT')
+    self._add(ctx, self.string_comment())
+    self._add(ctx, self.composition())
+    self._expect(ctx, 'end')
+    self._expect(ctx, 'IDENT')
+    return self._done(ctx)
+
+  def short_class_specifier(self):
+    ctx = self._new('short_class_specifier')
+    self._expect(ctx, 'IDENT')
+    self._expect(ctx, '=')
+    if self._at() == 'enumeration':
+      self._token(ctx)
+      self._expect(ctx, '(')
+      if self._at() == ':':
+        self._token(ctx)
+      elif self._at() == 'IDENT':
+        self._add(ctx, self.enum_list())
+      self._expect(ctx, ')')
+    else:
+      self._add(ctx, self.base_prefix())
+      self._add(ctx, self.name())
+      if self._at() == '[':
+        self._add(ctx, self.array_subscripts())
+      if self._at() == '(':
+        self._add(ctx, self.class_modification())
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def der_class_specifier(self):
+    ctx = self._new('der_class_specifier')
+    self._expect(ctx, 'IDENT')
+    self._expect(ctx, '=')
+    self._expect(ctx, 'der')
+    self._expect(ctx, '(')
+    self._add(ctx, self.name())
+    self._expect(ctx, ',')
+    self._expect(ctx, 'IDENT')
+    while self._at() == ',':
+      self._token(ctx)
+      self._expect(ctx, 'IDENT')
+    self._expect(ctx, ')')
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def base_prefix(self):
+    ctx = self._new('base_prefix')
+    self._add(ctx, self.type_prefix())
+    return self._done(ctx)
+
+  def enum_list(self):
+    ctx = self._new('enum_list')
+    self._add(ctx, self.enumeration_literal())
+    while self._at() == ',':
+      self._token(ctx)
+      self._add(ctx, self.enumeration_literal())
+    return self._done(ctx)
+
+  def enumeration_literal(self):
+    ctx = self._new('enumeration_literal')
+    self._expect(ctx, 'IDENT')
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def composition(self):
+    ctx = self._new('composition')
+    self._add(ctx, self.element_list())
+    while True:
+      kind = self._at()
+      if kind in ('public', 'protected'):
+        self._token(ctx)
+        self._add(ctx, self.element_list())
+      elif kind == 'equation' or (kind == 'initial' and self._at(1) == 'equation'):
+        self._add(ctx, self.equation_section())
+      elif kind == 'algorithm' or (kind == 'initial' and self._at(1) == 'algorithm'):
+        self._add(ctx, self.algorithm_section())
+      else:
+        break
+    if self._at() == 'external':
+      self._token(ctx)
+      if self._at() == 'STRING':
+        self._add(ctx, self.language_specification())
+      if self._at() in ('IDENT', '.'):
+        self._add(ctx, self.external_function_call())
+      if self._at() == 'annotation':
+        self._add(ctx, self.annotation())
+      self._expect(ctx, ';')
+    if self._at() == 'annotation':
+      self._add(ctx, self.annotation())
+      self._expect(ctx, ';')
+    return self._done(ctx)
+
+  def language_specification(self):
+    ctx = self._new('language_specification')
+    self._expect(ctx, 'STRING')
+    return self._done(ctx)
+
+  def external_function_call(self):
+    ctx = self._new('external_function_call')
+    if not (self._at() == 'IDENT' and self._at(1) == '('):
+      self._add(ctx, self.component_reference())
+      self._expect(ctx, '=')
+    self._expect(ctx, 'IDENT')
+    self._expect(ctx, '(')
+    if self._at() != ')':
+      self._add(ctx, self.expression_list())
+    self._expect(ctx, ')')
+    return self._done(ctx)
+
+  def element_list(self):
+    ctx = self._new('element_list')
+    while self._at() in ELEMENT_FIRST:
+      self._add(ctx, self.element())
+      self._expect(ctx, ';')
+    return self._done(ctx)
+
+  def element(self):
+    ctx = self._new('element')
+    kind = self._at()
+    if kind == 'import':
+      self._add(ctx, self.import_clause())
+    elif kind == 'extends':
+      self._add(ctx, self.extends_clause())
+    else:
+      for prefix in ('redeclare', 'final', 'inner', 'outer'):
+        self._optional(ctx, (prefix,))
+      if self._at() == 'replaceable':
+        self._token(ctx)
+        self._classDefinitionOrComponent(ctx)
+        if self._at() == 'constrainedby':
+          self._add(ctx, self.constraining_clause())
+          self._add(ctx, self.comment())
+      else:
+        self._classDefinitionOrComponent(ctx)
+    return self._done(ctx)
+
+  def import_clause(self):
+    ctx = self._new('import_clause')
+    self._expect(ctx, 'import')
+    if self._at() == 'IDENT' and self._at(1) == '=':
+      self._token(ctx)
+      self._token(ctx)
+      self._add(ctx, self.name())
+    else:
+      self._add(ctx, self.name())
+      if self._at() == '.*':
+        self._token(ctx)
+      elif self._at() == '.{':
+        self._token(ctx)
+        self._add(ctx, self.import_list())
+        self._expect(ctx, '}')
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def import_list(self):
+    ctx = self._new('import_list')
+    self._expect(ctx, 'IDENT')
+    while self._at() == ',':
+      self._token(ctx)
+      self._expect(ctx, 'IDENT')
+    return self._done(ctx)
+
+  def extends_clause(self):
+    ctx = self._new('extends_clause')
+    self._expect(ctx, 'extends')
+    self._add(ctx, self.name())
+    if self._at() == '(':
+      self._add(ctx, self.class_modification())
+    if self._at() == 'annotation':
+      self._add(ctx, self.annotation())
+    return self._done(ctx)
+
+  def constraining_clause(self):
+    ctx = self._new('constraining_clause')
+    self._expect(ctx, 'constrainedby')
+    self._add(ctx, self.name())
+    if self._at() == '(':
+      self._add(ctx, self.class_modification())
+    return self._done(ctx)
+
+  def component_clause(self):
+    ctx = self._new('component_clause')
+    self._add(ctx, self.type_prefix())
+    self._add(ctx, self.type_specifier())
+    if self._at() == '[':
+      self._add(ctx, self.array_subscripts())
+    self._add(ctx, self.component_list())
+    return self._done(ctx)
+
+  def type_prefix(self):
+    ctx = self._new('type_prefix')
+    self._optional(ctx, ('flow', 'stream'))
+    self._optional(ctx, ('discrete', 'parameter', 'constant'))
+    self._optional(ctx, ('input', 'output'))
+    return self._done(ctx)
+
+  def type_specifier(self):
+    ctx = self._new('type_specifier')
+    self._add(ctx, self.name())
+    return self._done(ctx)
+
+  def component_list(self):
+    ctx = self._new('component_list')
+    self._add(ctx, self.component_declaration())
+    while self._at() == ',':
+      self._token(ctx)
+      self._add(ctx, self.component_declaration())
+    return self._done(ctx)
+
+  def component_declaration(self):
+    ctx = self._new('component_declaration')
+    self._add(ctx, self.declaration())
+    if self._at() == 'if':
+      self._add(ctx, self.condition_attribute())
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def condition_attribute(self):
+    ctx = self._new('condition_attribute')
+    self._expect(ctx, 'if')
+    self._add(ctx, self.expression())
+    return self._done(ctx)
+
+  def declaration(self):
+    ctx = self._new('declaration')
+    self._expect(ctx, 'IDENT')
+    if self._at() == '[':
+      self._add(ctx, self.array_subscripts())
+    if self._at() in ('(', '=', ':='):
+      self._add(ctx, self.modification())
+    return self._done(ctx)
+
+  def modification(self):
+    ctx = self._new('modification')
+    if self._at() == '(':
+      self._add(ctx, self.class_modification())
+      if self._at() == '=':
+        self._token(ctx)
+        self._add(ctx, self.expression())
+    elif self._at() in ('=', ':='):
+      self._token(ctx)
+      self._add(ctx, self.expression())
+    else:
+      raise _Mismatch()
+    return self._done(ctx)
+
+  def class_modification(self):
+    ctx = self._new('class_modification')
+    self._expect(ctx, '(')
+    if self._at() != ')':
+      self._add(ctx, self.argument_list())
+    self._expect(ctx, ')')
+    return self._done(ctx)
+
+  def argument_list(self):
+    ctx = self._new('argument_list')
+    self._add(ctx, self.argument())
+    while self._at() == ',':
+      self._token(ctx)
+      self._add(ctx, self.argument())
+    return self._done(ctx)
+
+  def argument(self):
+    ctx = self._new('argument')
+    if self._at() == 'redeclare':
+      self._add(ctx, self.element_redeclaration())
+    else:
+      self._add(ctx, self.element_modification_or_replaceable())
+    return self._done(ctx)
+
+  def element_modification_or_replaceable(self):
+    ctx = self._new('element_modification_or_replaceable')
+    self._optional(ctx, ('each',))
+    self._optional(ctx, ('final',))
+    if self._at() == 'replaceable':
+      self._add(ctx, self.element_replaceable())
+    else:
+      self._add(ctx, self.element_modification())
+    return self._done(ctx)
+
+  def element_modification(self):
+    ctx = self._new('element_modification')
+    self._add(ctx, self.name())
+    if self._at() in ('(', '=', ':='):
+      self._add(ctx, self.modification())
+    self._add(ctx, self.string_comment())
+    return self._done(ctx)
+
+  def element_redeclaration(self):
+    ctx = self._new('element_redeclaration')
+    self._expect(ctx, 'redeclare')
+    self._optional(ctx, ('each',))
+    self._optional(ctx, ('final',))
+    if self._at() == 'replaceable':
+      self._add(ctx, self.element_replaceable())
+    else:
+      self._shortClassOrComponent1(ctx)
+    return self._done(ctx)
+
+  def element_replaceable(self):
+    ctx = self._new('element_replaceable')
+    self._expect(ctx, 'replaceable')
+    self._shortClassOrComponent1(ctx)
+    if self._at() == 'constrainedby':
+      self._add(ctx, self.constraining_clause())
+    return self._done(ctx)
+
+  def component_clause1(self):
+    ctx = self._new('component_clause1')
+    self._add(ctx, self.type_prefix())
+    self._add(ctx, self.type_specifier())
+    self._add(ctx, self.component_declaration1())
+    return self._done(ctx)
+
+  def component_declaration1(self):
+    ctx = self._new('component_declaration1')
+    self._add(ctx, self.declaration())
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def short_class_definition(self):
+    ctx = self._new('short_class_definition')
+    self._add(ctx, self.class_prefixes())
+    self._add(ctx, self.short_class_specifier())
+    return self._done(ctx)
+
+  def equation_section(self):
+    ctx = self._new('equation_section')
+    self._optional(ctx, ('initial',))
+    self._expect(ctx, 'equation')
+    self._equations(ctx)
+    return self._done(ctx)
+
+  def algorithm_section(self):
+    ctx = self._new('algorithm_section')
+    self._optional(ctx, ('initial',))
+    self._expect(ctx, 'algorithm')
+    self._statements(ctx)
+    return self._done(ctx)
+
+  def equation(self):
+    ctx = self._new('equation')
+    kind = self._at()
+    if kind == 'if':
+      self._add(ctx, self.if_equation())
+    elif kind == 'for':
+      self._add(ctx, self.for_equation())
+    elif kind == 'connect':
+      self._add(ctx, self.connect_clause())
+    elif kind == 'when':
+      self._add(ctx, self.when_equation())
+    elif kind in ('IDENT', '.') and self._isCallEquation():
+      self._add(ctx, self.name())
+      self._add(ctx, self.function_call_args())
+    else:
+      # the left hand side isn't in an expression, it's never flattened
+      self._add(ctx, self.simple_expression(False))
+      self._expect(ctx, '=')
+      self._add(ctx, self.expression())
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def statement(self):
+    ctx = self._new('statement')
+    kind = self._at()
+    if kind in ('IDENT', '.'):
+      self._add(ctx, self.component_reference())
+      if self._at() == ':=':
+        self._token(ctx)
+        self._add(ctx, self.expression())
+      else:
+        self._add(ctx, self.function_call_args())
+    elif kind == '(':
+      self._token(ctx)
+      self._add(ctx, self.output_expression_list())
+      self._expect(ctx, ')')
+      self._expect(ctx, ':=')
+      self._add(ctx, self.component_reference())
+      self._add(ctx, self.function_call_args())
+    elif kind in ('break', 'return'):
+      self._token(ctx)
+    elif kind == 'if':
+      self._add(ctx, self.if_statement())
+    elif kind == 'for':
+      self._add(ctx, self.for_statement())
+    elif kind == 'while':
+      self._add(ctx, self.while_statement())
+    elif kind == 'when':
+      self._add(ctx, self.when_statement())
+    else:
+      raise _Mismatch()
+    self._add(ctx, self.comment())
+    return self._done(ctx)
+
+  def _ifBlock(self, rule, body):
+    ctx = self._new(rule)
+    self._expect(ctx, 'if')
+    self._add(ctx, self.expression())
+    self._expect(ctx, 'then')
+    body(ctx)
+    while self._at() == 'elseif':
+      self._token(ctx)
+      self._add(ctx, self.expression())
+      self._expect(ctx, 'then')
+      body(ctx)
+    if self._at() == 'else':
+      self._token(ctx)
+      body(ctx)
+    self._expect(ctx, 'end')
+    self._expect(ctx, 'if')
+    return self._done(ctx)
+
+  def if_equation(self):
+    return self._ifBlock('if_equation', self._equations)
+
+  def if_statement(self):
+    return self._ifBlock('if_statement', self._statements)
+
+  def _forBlock(self, rule, body):
+    ctx = self._new(rule)
+    self._expect(ctx, 'for')
+    self._add(ctx, self.for_indices())
+    self._expect(ctx, 'loop')
+    body(ctx)
+    self._expect(ctx, 'end')
+    self._expect(ctx, 'for')
+    return self._done(ctx)
+
+  def for_equation(self):
+    return self._forBlock('for_equation', self._equations)
+
+  def for_statement(self):
+    return self._forBlock('for_statement', self._statements)
+
+  def for_indices(self):
+    ctx = self._new('for_indices')
+    self._add(ctx, self.for_index())
+    while self._at() == ',':
+      self._token(ctx)
+      self._add(ctx, self.for_index())
+    return self._done(ctx)
+
+  def for_index(self):
+    ctx = self._new('for_index')
+    self._expect(ctx, 'IDENT')
+    if self._at() == 'in':
+      self._token(ctx)
+      self._add(ctx, self.expression())
+    return self._done(ctx)
+
+  def while_statement(self):
+    ctx = self._new('while_statement')
+    self._expect(ctx, 'while')
+    self._add(ctx, self.expression())
+    self._expect(ctx, 'loop')
+    self._statements(ctx)
+    self._expect(ctx, 'end')
+    self._expect(ctx, 'while')
+    return self._done(ctx)
+
+  def _whenBlock(self, rule, body):
+    ctx = self._new(rule)
+    self._expect(ctx, 'when')
+    self._add(ctx, self.expression())
+    self._expect(ctx, 'then')
+    body(ctx)
+    while self._at() == 'elsewhen':
+      self._token(ctx)
+      self._add(ctx, self.expression())
+      self._expect(ctx, 'then')
+      body(ctx)
+    self._expect(ctx, 'end')
+    self._expect(ctx, 'when')
+    return self._done(ctx)
+
+  def when_equation(self):
+    return self._whenBlock('when_equation', self._equations)
+
+  def when_statement(self):
+    return self._whenBlock('when_statement', self._statements)
+
+  def connect_clause(self):
+    ctx = self._new('connect_clause')
+    self._expect(ctx, 'connect')
+    self._expect(ctx, '(')
+    self._add(ctx, self.component_reference())
+    self._expect(ctx, ',')
+    self._add(ctx, self.component_reference())
+    self._expect(ctx, ')')
+    return self._done(ctx)
+
+  def expression(self):
+    ctx = self._new('expression')
+    if self._at() == 'if':
+      self._token(ctx)
+      self._add(ctx, self.expression())
+      self._expect(ctx, 'then')
+      self._add(ctx, self.expression())
+      while self._at() == 'elseif':
+        self._token(ctx)
+        self._add(ctx, self.expression())
+        self._expect(ctx, 'then')
+        self._add(ctx, self.expression())
+      self._expect(ctx, 'else')
+      self._add(ctx, self.expression())
+    else:
+      self._add(ctx, self.simple_expression(self._flat))
+    return self._done(ctx)
+
+  def simple_expression(self, flat=False):
+    ctx = self._new('simple_expression')
+    self._add(ctx, self.logical_expression(flat))
+    if self._at() == ':':
+      self._token(ctx)
+      self._add(ctx, self.logical_expression(flat))
+      if self._at() == ':':
+        self._token(ctx)
+        self._add(ctx, self.logical_expression(flat))
+    return self._chain(ctx, flat)
+
+  def logical_expression(self, flat=False):
+    ctx = self._new('logical_expression')
+    self._add(ctx, self.logical_term(flat))
+    while self._at() == 'or':
+      self._token(ctx)
+      self._add(ctx, self.logical_term(flat))
+    return self._chain(ctx, flat)
+
+  def logical_term(self, flat=False):
+    ctx = self._new('logical_term')
+    self._add(ctx, self.logical_factor(flat))
+    while self._at() == 'and':
+      self._token(ctx)
+      self._add(ctx, self.logical_factor(flat))
+    return self._chain(ctx, flat)
+
+  def logical_factor(self, flat=False):
+    ctx = self._new('logical_factor')
+    self._optional(ctx, ('not',))
+    self._add(ctx, self.relation(flat))
+    return self._chain(ctx, flat)
+
+  def relation(self, flat=False):
+    ctx = self._new('relation')
+    self._add(ctx, self.arithmetic_expression(flat))
+    if self._at() in REL_OPS:
+      self._add(ctx, self._operator('rel_op'))
+      self._add(ctx, self.arithmetic_expression(flat))
+    return self._chain(ctx, flat)
+
+  def rel_op(self):
+    return self._operator('rel_op')
+
+  def arithmetic_expression(self, flat=False):
+    ctx = self._new('arithmetic_expression')
+    if self._at() in ADD_OPS:
+      self._add(ctx, self._operator('add_op'))
+    self._add(ctx, self.term(flat))
+    while self._at() in ADD_OPS:
+      self._add(ctx, self._operator('add_op'))
+      self._add(ctx, self.term(flat))
+    return self._chain(ctx, flat)
+
+  def add_op(self):
+    return self._operator('add_op')
+
+  def term(self, flat=False):
+    ctx = self._new('term')
+    self._add(ctx, self.factor(flat))
+    while self._at() in MUL_OPS:
+      self._add(ctx, self._operator('mul_op'))
+      self._add(ctx, self.factor(flat))
+    return self._chain(ctx, flat)
+
+  def mul_op(self):
+    return self._operator('mul_op')
+
+  def _operator(self, rule):
+    ctx = self._new(rule)
+    self._token(ctx)
+    return self._done(ctx)
+
+  def factor(self, flat=False):
+    ctx = self._new('factor')
+    self._add(ctx, self.primary())
+    if self._at() in ('^', '.^'):
+      self._token(ctx)
+      self._add(ctx, self.primary())
+    return self._chain(ctx, flat)
+
+  def primary(self):
+    ctx = self._new('primary')
+    kind = self._at()
+    if kind in ('NUMBER', 'STRING', 'false', 'true', 'end'):
+      self._token(ctx)
+    elif kind in ('der', 'initial'):
+      self._token(ctx)
+      self._add(ctx, self.function_call_args())
+    elif kind in ('IDENT', '.'):
+      if self._isCall():
+        self._add(ctx, self.name())
+        self._add(ctx, self.function_call_args())
+      else:
+        self._add(ctx, self.component_reference())
+    elif kind == '(':
+      self._token(ctx)
+      self._add(ctx, self.output_expression_list())
+      self._expect(ctx, ')')
+    elif kind == '[':
+      self._token(ctx)
+      self._add(ctx, self.expression_list())
+      while self._at() == ';':
+        self._token(ctx)
+        self._add(ctx, self.expression_list())
+      self._expect(ctx, ']')
+    elif kind == '{':
+      self._token(ctx)
+      self._add(ctx, self.function_arguments())
+      self._expect(ctx, '}')
+    else:
+      raise _Mismatch()
+    return self._done(ctx)
+
+  def name(self):
+    ctx = self._new('name')
+    self._optional(ctx, ('.',))
+    self._expect(ctx, 'IDENT')
+    while self._at() == '.':
+      self._token(ctx)
+      self._expect(ctx, 'IDENT')
+    return self._done(ctx)
+
+  def component_reference(self):
+    ctx = self._new('component_reference')
+    self._optional(ctx, ('.',))
+    self._expect(ctx, 'IDENT')
+    if self._at() == '[':
+      self._add(ctx, self.array_subscripts())
+    while self._at() == '.':
+      self._token(ctx)
+      self._expect(ctx, 'IDENT')
+      if self._at() == '[':
+        self._add(ctx, self.array_subscripts())
+    return self._done(ctx)
+
+  def function_call_args(self):
+    ctx = self._new('function_call_args')
+    self._expect(ctx, '(')
+    if self._at() != ')':
+      self._add(ctx, self.function_arguments())
+    self._expect(ctx, ')')
+    return self._done(ctx)
+
+  def function_arguments(self):
+    ctx = self._new('function_arguments')
+    if self._at() == 'IDENT' and self._at(1) == '=':
+      self._add(ctx, self.named_arguments())
+    else:
+      self._add(ctx, self.function_argument())
+      if self._at() == ',':
+        self._token(ctx)
+        self._add(ctx, self.function_arguments())
+      elif self._at() == 'for':
+        self._token(ctx)
+        self._add(ctx, self.for_indices())
+    return self._done(ctx)
+
+  def named_arguments(self):
+    ctx = self._new('named_arguments')
+    self._add(ctx, self.named_argument())
+    if self._at() == ',':
+      self._token(ctx)
+      self._add(ctx, self.named_arguments())
+    return self._done(ctx)
+
+  def named_argument(self):
+    ctx = self._new('named_argument')
+    self._expect(ctx, 'IDENT')
+    self._expect(ctx, '=')
+    self._add(ctx, self.function_argument())
+    return self._done(ctx)
+
+  def function_argument(self):
+    ctx = self._new('function_argument')
+    if self._at() == 'function':
+      self._token(ctx)
+      self._add(ctx, self.name())
+      self._expect(ctx, '(')
+      if self._at() == 'IDENT':
+        self._add(ctx, self.named_arguments())
+      self._expect(ctx, ')')
+    else:
+      self._add(ctx, self.expression())
+    return self._done(ctx)
+
+  def output_expression_list(self):
+    ctx = self._new('output_expression_list')
+    if self._at() in EXPRESSION_FIRST:
+      self._add(ctx, self.expression())
+    while self._at() == ',':
+      self._token(ctx)
+      if self._at() in EXPRESSION_FIRST:
+        self._add(ctx, self.expression())
+    return self._done(ctx)
+
+  def expression_list(self):
+    ctx = self._new('expression_list')
+    self._add(ctx, self.expression())
+    while self._at() == ',':
+      self._token(ctx)
+      self._add(ctx, self.expression())
+    return self._done(ctx)
+
+  def array_subscripts(self):
+    ctx = self._new('array_subscripts')
+    self._expect(ctx, '[')
+    self._add(ctx, self.subscript())
+    while self._at() == ',':
+      self._token(ctx)
+      self._add(ctx, self.subscript())
+    self._expect(ctx, ']')
+    return self._done(ctx)
+
+  def subscript(self):
+    ctx = self._new('subscript')
+    if self._at() == ':':
+      self._token(ctx)
+    else:
+      self._add(ctx, self.expression())
+    return self._done(ctx)
+
+  def comment(self):
+    ctx = self._new('comment')
+    self._add(ctx, self.string_comment())
+    if self._at() == 'annotation':
+      self._add(ctx, self.annotation())
+    return self._done(ctx)
+
+  def string_comment(self):
+    ctx = self._new('string_comment')
+    if self._at() == 'STRING':
+      self._token(ctx)
+      while self._at() == '+':
+        self._token(ctx)
+        self._expect(ctx, 'STRING')
+    return self._done(ctx)
+
+  def annotation(self):
+    ctx = self._new('annotation')
+    self._expect(ctx, 'annotation')
+    self._add(ctx, self.class_modification())
+    return self._done(ctx)
+
+
+def parseNative(parser, rule='stored_definition'):
+  """parseNative parses with the native engine
+
+  :param parser: object, generated parser from Parse.makeParser
+  :param rule: string, name of the rule to parse
+  :return: object, context of the rule, or None if the input isn't valid
+  """
+  return NativeParser(parser).parse(rule)
@@ -0,0 +1,247 @@
+# Large numeric array and matrix literals
+#
+# Tables like `table=[0, 1; 1, 2; ...]` or `{{0, 1}, {1, 2}, ...}` can have
+# tens of thousands of entries, and the parser builds an expression chain for
+# each one. With the numeric_literals parse option, literals made only of
+# (signed) numbers with at least MIN_ELEMENTS entries are found with a token
+# scan before parsing, and all their tokens but the brackets and the first
+# entry are moved off the parser's channel. The literal is then a single
+# primary node with the literal's full span; its getText() only has the first
+# entry.
+#
+# literalArray reads a literal's values from its tokens, so it works on any
+# pure numeric literal node, and Edit.makeReplaceArray replaces one from an
+# array without building contexts for the new values.
+
+NUMERIC_CHANNEL = 4
+
+MIN_ELEMENTS = 16
+
+_OPEN = {'[': ']', '{': '}'}
+
+
+class NumericLiteralError(Exception):
+  """NumericLiteralError is raised when a node isn't a pure numeric literal"""
+
+
+def _scanLiteral(texts, start):
+  """_scanLiteral checks if a pure numeric literal starts at start
+
+  :param texts: list, texts of the on-channel tokens
+  :param start: int, index of the opening bracket
+  :return: int, int; index of the closing bracket and number of entries, or None, 0
+  """
+  # brackets hold rows separated by ';' (no nesting), braces hold numbers or braces
+  matrix = texts[start] == '['
+  closes = []
+  entries = 0
+  expect_value = True
+  i = start
+  while i < len(texts):
+    text = texts[i]
+    if text in _OPEN:
+      if not expect_value or (matrix and closes) or (not matrix and text != '{'):
+        return None, 0
+      closes.append(_OPEN[text])
+    elif closes and text == closes[-1]:
+      if expect_value:
+        # empty or trailing separator
+        return None, 0
+      closes.pop()
+      if not closes:
+        return i, entries
+    elif text in (',', ';'):
+      if expect_value or (text == ';' and not matrix):
+        return None, 0
+      expect_value = True
+      i += 1
+      continue
+    else:
+      if text in ('-', '+') and i + 1 < len(texts):
+        i += 1
+        text = texts[i]
+      if not expect_value or not text[:1].isdigit():
+        return None, 0
+      entries += 1
+    expect_value = text in _OPEN
+    i += 1
+
+  return None, 0
+
+
+def hideNumericLiterals(tokens, min_elements=MIN_ELEMENTS):
+  """hideNumericLiterals moves the on-channel tokens of large numeric literals,
+  except the brackets and the first entry, to NUMERIC_CHANNEL
+
+  :param tokens: list, all tokens of the file (a filled token stream)
+  :param min_elements: int, minimum number of entries of a literal
+  :return: dict, token index of each literal's opening bracket -> token index of its closing bracket
+  """
+  from antlr4 import Token
+
+  on_channel = [token for token in tokens if token.channel == Token.DEFAULT_CHANNEL]
+  texts = [token.text for token in on_channel]
+  literals = {}
+  i = 0
+  while i < len(texts):
+    if texts[i] not in _OPEN:
+      i += 1
+      continue
+
+    close, entries = _scanLiteral(texts, i)
+    if close is None or entries < min_elements:
+      i += 1
+      continue
+
+    # keep the opening brackets, the first entry and the brackets closing them,
+    # e.g. {{1, 2}, {3, 4}} is parsed as {{1}}
+    visible = set()
+    j = i
+    while texts[j] in _OPEN:
+      visible.add(j)
+      j += 1
+    visible.add(j)
+    if texts[j] in ('-', '+'):
+      visible.add(j + 1)
+    depth = lowest = j - i
+    k = j
+    while depth:
+      if texts[k] in _OPEN:
+        depth += 1
+      elif texts[k] in (']', '}'):
+        depth -= 1
+        if depth < lowest:
+          # closes the innermost prefix bracket which is still open
+          visible.add(k)
+          lowest = depth
+      k += 1
+
+    for index in range(i, close + 1):
+      if index not in visible:
+        on_channel[index].channel = NUMERIC_CHANNEL
+    literals[on_channel[i].tokenIndex] = on_channel[close].tokenIndex
+    i = close + 1
+
+  return literals
+
+
+def isNumericLiteral(node, parser):
+  """isNumericLiteral checks if a node is a literal hidden by the numeric_literals option
+
+  :param node: object, node of the AST
+  :param parser: object, parser that built the tree
+  :return: boolean
+  """
+  literals = getattr(parser, 'numeric_literals', None)
+  return bool(literals) and node.start.tokenIndex in literals and literals[node.start.tokenIndex] == node.stop.tokenIndex
+
+
+def literalText(node):
+  """literalText returns the source of a node, including whitespace and comments
+
+  :param node: object, node of the AST
+  :return: string, source text of the node
+  """
+  from modelicaTransformer.Text import nodeText
+
+  return nodeText(node)
+
+
+def literalValues(node, parser):
+  """literalValues reads the values of a pure numeric literal node
+
+  :param node: object, primary node of an array or matrix literal
+  :param parser: object, parser that built the tree
+  :return: list, nested lists of numbers; rows of a matrix, or nested brace arrays
+  """
+  from antlr4 import Token
+
+  tokens = [
+    token for token in parser.getTokenStream().tokens[node.start.tokenIndex:node.stop.tokenIndex + 1]
+    if token.channel in (Token.DEFAULT_CHANNEL, NUMERIC_CHANNEL)
+  ]
+  texts = [token.text for token in tokens]
+  if not texts or texts[0] not in _OPEN or _scanLiteral(texts, 0)[0] != len(texts) - 1:
+    raise NumericLiteralError(f'Not a numeric literal: {literalText(node)[:80]}')
+
+  def number(text):
+    return int(text) if text.isdigit() else float(text)
+
+  if texts[0] == '[':
+    rows = [[]]
+    sign = 1
+    for text in texts[1:-1]:
+      if text == ';':
+        rows.append([])
+      elif text == '-':
+        sign = -1
+      elif text not in (',', '+'):
+        rows[-1].append(sign * number(text))
+        sign = 1
+    return rows
+
+  stack = []
+  sign = 1
+  for text in texts:
+    if text == '{':
+      stack.append([])
+    elif text == '}':
+      values = stack.pop()
+      if not stack:
+        return values
+      stack[-1].append(values)
+    elif text == '-':
+      sign = -1
+    elif text not in (',', '+'):
+      stack[-1].append(sign * number(text))
+      sign = 1
+
+
+def literalArray(node, parser):
+  """literalArray returns a NumPy array of a pure numeric literal node, a
+  matrix literal gives a 2-D array
+
+  :param node: object, primary node of an array or matrix literal
+  :param parser: object, parser that built the tree
+  :return: numpy.ndarray
+  """
+  try:
+    import numpy
+  except ImportError:
+    raise NumericLiteralError('Array views of numeric literals require the numpy package')
+
+  return numpy.array(literalValues(node, parser))
+
+
+def formatArray(array):
+  """formatArray formats an array as a Modelica literal; 2-D arrays are
+  written as matrices ([a, b; c, d]), others as nested braces
+
+  :param array: array-like, numbers
+  :return: string, Modelica literal
+  """
+  try:
+    import numpy
+  except ImportError:
+    raise NumericLiteralError('Formatting arrays requires the numpy package')
+
+  array = numpy.asarray(array)
+  if array.ndim == 0:
+    raise NumericLiteralError('Expected an array, got a scalar')
+  if not numpy.issubdtype(array.dtype, numpy.number) or numpy.issubdtype(array.dtype, numpy.complexfloating):
+    raise NumericLiteralError(f'Expected a real numeric array, got dtype {array.dtype}')
+  if numpy.issubdtype(array.dtype, numpy.floating) and not numpy.isfinite(array).all():
+    raise NumericLiteralError('Modelica literals can\'t hold inf or nan')
+
+  def row(values):
+    return ', '.join(map(repr, values))
+
+  if array.ndim == 2:
+    return '[' + '; '.join(row(values) for values in array.tolist()) + ']'
+
+  def braces(values):
+    if values and isinstance(values[0], list):
+      return '{' + ', '.join(braces(value) for value in values) + '}'
+    return '{' + row(values) + '}'
+
+  return braces(array.tolist())
@@ -0,0 +1,150 @@
+# Opaque annotations
+#
+# Annotations (graphics, Documentation, experiment settings) are most of the
+# source of typical models, but transformations rarely look inside them.
+# With the opaque_annotations parse option, the tokens of each annotation's
+# body are moved off the parser's channel before parsing, found with a
+# matched parenthesis scan of the token stream. The parser then sees
+# `annotation()`, so the annotation node keeps its full span (its
+# class_modification starts at '(' and stops at ')'), but has no children for
+# the body and its getText() is 'annotation()'.
+#
+# A body is parsed on demand, and grafted into the tree, when a selection
+# could find nodes in it: one rooted at its annotation node, e.g. the steps
+# after an 'annotation' step of a path, or a descendant search from above for
+# a rule which can occur inside annotations (e.g. element_modification, but
+# not connect_clause). Trees can be shared between threads (see Cache.py), so
+# bodies are expanded under a lock, once.
+
+import threading
+
+OPAQUE_CHANNEL = 3
+
+_expand_lock = threading.Lock()
+
+
+def hideAnnotationBodies(tokens):
+  """hideAnnotationBodies moves the on-channel tokens inside each annotation's
+  parentheses to OPAQUE_CHANNEL
+
+  :param tokens: list, all tokens of the file (a filled token stream)
+  :return: dict, token index of each hidden body's '(' -> token index of its ')'
+  """
+  from antlr4 import Token
+
+  on_channel = [token for token in tokens if token.channel == Token.DEFAULT_CHANNEL]
+  bodies = {}
+  i = 0
+  while i < len(on_channel) - 1:
+    if on_channel[i].text != 'annotation' or on_channel[i + 1].text != '(':
+      i += 1
+      continue
+
+    depth = 0
+    j = i + 1
+    while j < len(on_channel):
+      text = on_channel[j].text
+      if text == '(':
+        depth += 1
+      elif text == ')':
+        depth -= 1
+        if depth == 0:
+          break
+      j += 1
+    if j == len(on_channel):
+      # unbalanced, leave it to the parser to report
+      break
+
+    for token in on_channel[i + 2:j]:
+      token.channel = OPAQUE_CHANNEL
+    bodies[on_channel[i + 1].tokenIndex] = on_channel[j].tokenIndex
+    i = j + 1
+
+  return bodies
+
+
+def expandAnnotation(ctx, parser):
+  """expandAnnotation parses the body of an opaque annotation and replaces
+  its empty class_modification with the result
+
+  :param ctx: object, annotation node
+  :param parser: object, parser that built the tree
+  """
+  if not getattr(parser, 'opaque_annotations', None):
+    return
+
+  with _expand_lock:
+    _expand(ctx, parser)
+
+
+def _expand(ctx, parser):
+  from antlr4 import CommonTokenStream, Token
+  from antlr4.ListTokenSource import ListTokenSource
+
+  from modelicaTransformer.Index import replaceInIndex
+  from modelicaTransformer.Parse import configureErrors, runParser
+
+  opaque = parser.opaque_annotations
+  modification = ctx.class_modification()
+  # an expanded body was built by another parser, its token indexes aren't the file's
+  if modification is None or modification.parser is not parser or modification.start.tokenIndex not in opaque:
+    return
+  close = opaque.pop(modification.start.tokenIndex)
+
+  # copies keep the character offsets, lines and columns of the file
+  tokens = []
+  for token in parser.getTokenStream().tokens[modification.start.tokenIndex:close + 1]:
+    copy = token.clone()
+    if copy.channel == OPAQUE_CHANNEL:
+      copy.channel = Token.DEFAULT_CHANNEL
+    tokens.append(copy)
+
+  body_parser = parser.__class__(CommonTokenStream(ListTokenSource(tokens)))
+  for option in ('flat_expressions', 'prune_rules', 'engine', 'intern'):
+    if hasattr(parser, option):
+      setattr(body_parser, option, getattr(parser, option))
+  configureErrors(None, body_parser, parser.error_policy)
+
+  expanded = runParser(body_parser, 'class_modification')
+  expanded.parentCtx = ctx
+  ctx.children[ctx.children.index(modification)] = expanded
+  replaceInIndex(modification, expanded)
+
+
+def expandAnnotations(tree, parser):
+  """expandAnnotations parses the bodies of all opaque annotations in a tree
+
+  :param tree: object, root of the AST
+  :param parser: object, parser that built the tree
+  """
+  from modelicaTransformer.Reach import ruleReachability, walkRule
+
+  if not getattr(parser, 'opaque_annotations', None):
+    return
+
+  # bodies nested in a hidden body weren't hidden separately, so one pass expands everything
+  for node in walkRule(tree, parser.RULE_annotation, ruleReachability(parser)):
+    expandAnnotation(node, parser)
+
+
+def expandAnnotationsFor(root, parser, rule):
+  """expandAnnotationsFor parses the bodies of the opaque annotations below
+  root if nodes of a rule can occur inside them
+
+  :param root: object, context the search starts from
+  :param parser: object, parser that built the tree
+  :param rule: string, name of the rule searched for
+  """
+  from modelicaTransformer.Reach import ruleReachability
+
+  if not getattr(parser, 'opaque_annotations', None) or rule not in parser.ruleNames:
+    return
+
+  reachable = ruleReachability(parser)
+  annotation = parser.RULE_annotation
+  if list(parser.ruleNames).index(rule) not in reachable[annotation]:
+    return
+  if root.getRuleIndex() != annotation and annotation not in reachable[root.getRuleIndex()]:
+    return
+
+  expandAnnotations(root, parser)
@@ -0,0 +1,337 @@
+from collections import namedtuple
+import os
+import sys
+
+from modelicaTransformer.Intern import internTokens, makeInterner
+
+# The antlr runtime and the generated lexer and parser are imported on first
+# use; importing (and deserializing the ATN of) the generated parser is most
+# of the package's import time, and many callers never parse
+
+_GENERATED_PARSER = 'modelicaTransformer.modelicaAntlr.modelicaParser'
+
+
+def load(atn_cache_dir=None):
+  """load imports the generated lexer and parser, deserializing their ATNs
+  the first time it's called
+
+  :param atn_cache_dir: string, (optional) directory to cache deserialized ATNs in,
+    defaults to the MODELICA_TRANSFORMER_ATN_CACHE environment variable
+  :return: modelicaLexer, modelicaParser; the generated classes
+  """
+  if atn_cache_dir is None:
+    atn_cache_dir = os.environ.get('MODELICA_TRANSFORMER_ATN_CACHE')
+
+  if atn_cache_dir and _GENERATED_PARSER not in sys.modules:
+    from modelicaTransformer.AtnCache import cachedDeserialization, restoreDfa
+
+    with cachedDeserialization(atn_cache_dir) as snapshots:
+      from modelicaTransformer.modelicaAntlr.modelicaLexer import modelicaLexer
+      from modelicaTransformer.modelicaAntlr.modelicaParser import modelicaParser
+    restoreDfa(modelicaLexer, snapshots)
+    restoreDfa(modelicaParser, snapshots)
+  else:
+    from modelicaTransformer.modelicaAntlr.modelicaLexer import modelicaLexer
+    from modelicaTransformer.modelicaAntlr.modelicaParser import modelicaParser
+
+  return modelicaLexer, modelicaParser
+
+
+def saveParserState(atn_cache_dir=None):
+  """saveParserState saves the lexer's and parser's ATNs and the DFAs built
+  so far, so new processes loading from the same cache start warm.
+  Call it after parsing representative files, while no other thread is parsing
+
+  :param atn_cache_dir: string, (optional) cache directory, defaults to the
+    MODELICA_TRANSFORMER_ATN_CACHE environment variable
+  """
+  if atn_cache_dir is None:
+    atn_cache_dir = os.environ.get('MODELICA_TRANSFORMER_ATN_CACHE')
+  if not atn_cache_dir:
+    raise Exception('No ATN cache directory given')
+
+  from modelicaTransformer.AtnCache import saveWarmState
+
+  saveWarmState(atn_cache_dir, load(atn_cache_dir))
+
+
+# recover: antlr's default, recover from syntax errors and report them on stderr
+# collect: recover from syntax errors and raise ParseError with all of them at the end
+# bail: stop at the first syntax error and raise ParseError
+ERROR_POLICIES = ('recover', 'collect', 'bail')
+
+# antlr: the generated parser
+# native: the recursive descent parser in Native.py, falling back to antlr on syntax errors
+ENGINES = ('antlr', 'native')
+
+# antlr: the generated lexer
+# regex: the regular expression lexer in Lexer.py, emitting the same tokens
+LEXERS = ('antlr', 'regex')
+
+# none: every IDENT token has its own text
+# document: IDENT tokens of a parse share one string per identifier
+# process: IDENT tokens of all parses share one string per identifier (sys.intern)
+INTERNING = ('none', 'document', 'process')
+
+# line is 1-based, column and offset (character index into the source) are 0-based
+SyntaxIssue = namedtuple('SyntaxIssue', ['line', 'column', 'offset', 'message'])
+
+
+class ParseError(Exception):
+  """ParseError is raised for syntax errors unless the error policy is recover
+
+  :ivar errors: list, SyntaxIssue for each error, in the order they were found
+  """
+
+  def __init__(self, errors):
+    self.errors = list(errors)
+    first = self.errors[0]
+    super().__init__(f'{len(self.errors)} syntax error(s), first at {first.line}:{first.column}: {first.message}')
+
+  def __reduce__(self):
+    # rebuild from the errors, e.g. when raised in a worker process
+    return self.__class__, (self.errors,)
+
+
+class _ErrorCollector:
+  """_ErrorCollector is an antlr error listener which records syntax errors
+  of the lexer and the parser, raising at the first one if bail is true
+  """
+
+  def __init__(self, bail):
+    self.bail = bail
+    self.errors = []
+
+  def syntaxError(self, recognizer, offendingSymbol, line, column, msg, e):
+    if offendingSymbol is not None:
+      offset = offendingSymbol.start
+    else:
+      # lexer errors have no token, the error is at the start of the failed token
+      offset = recognizer._tokenStartCharIndex
+    self.errors.append(SyntaxIssue(line, column, offset, msg))
+    if self.bail:
+      raise ParseError(self.errors)
+
+  def reportAmbiguity(self, recognizer, dfa, startIndex, stopIndex, exact, ambigAlts, configs):
+    pass
+
+  def reportAttemptingFullContext(self, recognizer, dfa, startIndex, stopIndex, conflictingAlts, configs):
+    pass
+
+  def reportContextSensitivity(self, recognizer, dfa, startIndex, stopIndex, prediction, configs):
+    pass
+
+
+_bail_error_strategy_class = None
+
+
+def _bailErrorStrategyClass():
+  global _bail_error_strategy_class
+  if _bail_error_strategy_class is None:
+    from antlr4 import Token
+    from antlr4.error.ErrorStrategy import BailErrorStrategy
+
+    class FastBailErrorStrategy(BailErrorStrategy):
+      """FastBailErrorStrategy bails like BailErrorStrategy, but reports no viable
+      alternative errors without reading the rest of the input; the default
+      report gets the input with getText, which lexes the whole file first
+      """
+
+      def reportNoViableAlternative(self, recognizer, e):
+        tokens = recognizer.getTokenStream().tokens[e.startToken.tokenIndex:e.offendingToken.tokenIndex + 1]
+        text = ''.join('<EOF>' if token.type == Token.EOF else token.text for token in tokens)
+        recognizer.notifyErrorListeners('no viable alternative at input ' + self.escapeWSAndQuote(text), e.offendingToken, e)
+
+    _bail_error_strategy_class = FastBailErrorStrategy
+  return _bail_error_strategy_class
+
+
+_shaped_parser_class = None
+
+
+def _shapedParserClass(parser_class):
+  global _shaped_parser_class
+  if _shaped_parser_class is None:
+    from modelicaTransformer.Shape import shapedParserClass
+    _shaped_parser_class = shapedParserClass(parser_class)
+  return _shaped_parser_class
+
+
+def configureErrors(lexer, parser, error_policy):
+  """configureErrors sets up the error listeners and strategy of a lexer
+  (optional) and parser for an error policy
+
+  :param lexer: object, lexer feeding the parser, or None
+  :param parser: object, parser
+  :param error_policy: string, one of ERROR_POLICIES
+  """
+  if error_policy not in ERROR_POLICIES:
+    raise Exception(f'Unknown error policy {error_policy}, expected one of {", ".join(ERROR_POLICIES)}')
+
+  parser.error_policy = error_policy
+  parser._error_collector = None
+  if error_policy == 'recover':
+    return
+
+  collector = _ErrorCollector(bail=error_policy == 'bail')
+  for recognizer in (lexer, parser):
+    if recognizer is not None:
+      recognizer.removeErrorListeners()
+      recognizer.addErrorListener(collector)
+  if collector.bail:
+    parser._errHandler = _bailErrorStrategyClass()()
+  parser._error_collector = collector
+
+
+def makeParser(text, flat_expressions=False, prune=None, error_policy='recover', opaque_annotations=False,
+               numeric_literals=False, engine='antlr', lexer='antlr', interning='none'):
+  """makeParser creates a parser for Modelica source text without running it,
+  run it with runParser so the error policy is applied
+
+  :param text: string, Modelica source
+  :param flat_expressions: boolean, see parse
+  :param prune: list, see parse
+  :param error_policy: string, see parse
+  :param opaque_annotations: boolean, see parse
+  :param numeric_literals: boolean, see parse
+  :param engine: string, see parse
+  :param lexer: string, see parse
+  :param interning: string, see parse
+  :return: object, parser
+  """
+  from antlr4 import CommonTokenStream
+
+  from modelicaTransformer.TextStream import TextStream
+
+  if engine not in ENGINES:
+    raise Exception(f'Unknown engine {engine}, expected one of {", ".join(ENGINES)}')
+  if lexer not in LEXERS:
+    raise Exception(f'Unknown lexer {lexer}, expected one of {", ".join(LEXERS)}')
+  if interning not in INTERNING:
+    raise Exception(f'Unknown interning {interning}, expected one of {", ".join(INTERNING)}')
+
+  modelicaLexer, modelicaParser = load()
+  prune_rules = frozenset()
+  if prune:
+    unknown = [rule for rule in prune if rule not in modelicaParser.ruleNames]
+    if unknown:
+      raise Exception(f'Unknown rules to prune: {", ".join(unknown)}')
+    prune_rules = frozenset(modelicaParser.ruleNames.index(rule) for rule in prune)
+
+  intern = makeInterner(interning)
+  if lexer == 'regex':
+    from modelicaTransformer.Lexer import RegexLexer
+
+    token_source = RegexLexer(TextStream(text), intern)
+  else:
+    token_source = modelicaLexer(TextStream(text))
+  stream = CommonTokenStream(token_source)
+  if not flat_expressions and not prune_rules:
+    parser = modelicaParser(stream)
+  else:
+    parser = _shapedParserClass(modelicaParser)(stream)
+    parser.flat_expressions = flat_expressions
+    parser.prune_rules = prune_rules
+
+  configureErrors(token_source, parser, error_policy)
+  parser.engine = engine
+
+  parser.intern = intern
+  if intern is not None and lexer != 'regex':
+    # the generated lexer's tokens read their text from the input when asked
+    stream.fill()
+    internTokens(stream.tokens, modelicaLexer.IDENT, intern)
+
+  parser.opaque_annotations = None
+  if opaque_annotations:
+    from modelicaTransformer.Opaque import hideAnnotationBodies
+
+    stream.fill()
+    parser.opaque_annotations = hideAnnotationBodies(stream.tokens)
+
+  parser.numeric_literals = None
+  if numeric_literals:
+    from modelicaTransformer.Numeric import hideNumericLiterals
+
+    stream.fill()
+    parser.numeric_literals = hideNumericLiterals(stream.tokens)
+
+  return parser
+
+
+def runParser(parser, rule='stored_definition'):
+  """runParser runs a rule with a parser from makeParser, applying its error policy
+
+  :param parser: object, parser
+  :param rule: string, name of the rule to parse
+  :return: object, root of the AST
+  """
+  from antlr4.error.Errors import ParseCancellationException
+
+  collector = parser._error_collector
+  if getattr(parser, 'engine', 'antlr') == 'native' and parser.buildParseTrees and not parser._parseListeners:
+    from modelicaTransformer.Native import parseNative
+
+    tree = parseNative(parser, rule)
+    if tree is not None and (collector is None or not collector.errors):
+      return tree
+    # not valid input, or the lexer reported errors, parse with the generated
+    # parser so errors are handled as usual
+
+  try:
+    tree = getattr(parser, rule)()
+  except ParseCancellationException as e:
+    # errors from matching a single token aren't reported by the rules
+    # before bailing, report it so the collector raises with it
+    parser._errHandler.reportError(parser, e.args[0])
+    raise ParseError(collector.errors)
+
+  if collector is not None and collector.errors:
+    raise ParseError(collector.errors)
+  return tree
+
+
+def parse(text, flat_expressions=False, prune=None, error_policy='recover', opaque_annotations=False,
+          numeric_literals=False, engine='antlr', lexer='antlr', interning='none'):
+  """parse builds the AST for Modelica source text
+
+  :param text: string, Modelica source
+  :param flat_expressions: boolean, if true single-child expression contexts
+    between expression and primary are left out of the tree (see Flat.py)
+  :param prune: list, (optional) rule names whose nodes are kept without
+    children, e.g. ['annotation', 'equation_section']; their spans are unchanged
+  :param error_policy: string, what to do on syntax errors, one of ERROR_POLICIES;
+    with collect or bail, ParseError is raised instead of returning a recovered tree
+  :param opaque_annotations: boolean, if true annotation bodies aren't parsed
+    until a selection is rooted at their annotation node (see Opaque.py)
+  :param numeric_literals: boolean, if true large pure numeric array and matrix
+    literals are parsed as a single node each (see Numeric.py)
+  :param engine: string, parsing engine, one of ENGINES; both build the same tree
+  :param lexer: string, lexer, one of LEXERS; both emit the same tokens
+  :param interning: string, how IDENT token texts are shared, one of INTERNING (see Intern.py)
+  :return: tree, parser; root of the AST (stored_definition) and the parser that built it
+  """
+  parser = makeParser(text, flat_expressions, prune, error_policy, opaque_annotations, numeric_literals, engine, lexer,
+                      interning)
+  tree = runParser(parser)
+  return tree, parser
+
+
+def readSource(path):
+  """readSource reads a Modelica file
+
+  :param path: string, path to file
+  :return: string, file contents
+  """
+  with open(path, 'r') as f:
+    return f.read()
+
+
+def writeSource(path, text):
+  """writeSource writes a Modelica file
+
+  :param path: string, path to file
+  :param text: string, contents to write
+  """
+  with open(path, 'w') as f:
+    f.write(text)
@@ -0,0 +1,107 @@
+# Rule reachability
+#
+# Which rules can appear below which is fixed by the grammar: a declaration
+# can't be inside an expression, a connect_clause can't be inside an
+# annotation. ruleReachability reads it from the generated parser's ATN,
+# where every rule invocation is a RuleTransition, once per parser class
+# (ruleInvocations has the direct invocations).
+# Walks looking for a rule's nodes (see Index.py) use it to skip subtrees
+# which can't contain any. Tree shaping options (flat_expressions, prune,
+# numeric_literals) only leave nodes out, so the table holds for shaped
+# trees too.
+
+_invocations = {}
+_tables = {}
+
+
+def ruleInvocations(parser):
+  """ruleInvocations returns which rules each rule invokes directly, i.e. can
+  have as children
+
+  :param parser: object, parser (or generated parser class)
+  :return: list, for each rule index the frozenset of rule indexes it invokes
+  """
+  key = parser if isinstance(parser, type) else parser.__class__
+  invoked = _invocations.get(key)
+  if invoked is not None:
+    return invoked
+
+  from antlr4.atn.Transition import RuleTransition
+
+  atn = parser.atn
+  invoked = []
+  for rule, start in enumerate(atn.ruleToStartState):
+    callees = set()
+    seen = {start.stateNumber}
+    stack = [start]
+    while stack:
+      state = stack.pop()
+      if state is atn.ruleToStopState[rule]:
+        # its transitions lead back to the rules invoking this one
+        continue
+      for transition in state.transitions:
+        if isinstance(transition, RuleTransition):
+          callees.add(transition.ruleIndex)
+          target = transition.followState
+        else:
+          target = transition.target
+        if target.stateNumber not in seen:
+          seen.add(target.stateNumber)
+          stack.append(target)
+    invoked.append(frozenset(callees))
+
+  _invocations[key] = invoked
+  return invoked
+
+
+def ruleReachability(parser):
+  """ruleReachability returns which rules can appear below each rule
+
+  :param parser: object, parser (or generated parser class)
+  :return: list, for each rule index the frozenset of rule indexes which can
+    appear below its nodes, at any depth
+  """
+  key = parser if isinstance(parser, type) else parser.__class__
+  table = _tables.get(key)
+  if table is not None:
+    return table
+
+  invoked = ruleInvocations(parser)
+  table = []
+  for rule in range(len(invoked)):
+    reachable = set(invoked[rule])
+    stack = list(reachable)
+    while stack:
+      for callee in invoked[stack.pop()]:
+        if callee not in reachable:
+          reachable.add(callee)
+          stack.append(callee)
+    table.append(frozenset(reachable))
+
+  _tables[key] = table
+  return table
+
+
+def walkRule(root, rule, reachable):
+  """walkRule lists root and its descendants of a rule, in preorder, without
+  entering subtrees which can't contain the rule
+
+  :param root: object, context
+  :param rule: int, rule index
+  :param reachable: list, from ruleReachability
+  :return: list, nodes
+  """
+  from antlr4 import ParserRuleContext
+
+  nodes = []
+  stack = [root]
+  while stack:
+    node = stack.pop()
+    index = node.getRuleIndex()
+    if index == rule:
+      nodes.append(node)
+    if node.children and rule in reachable[index]:
+      stack.extend(
+        child for child in reversed(node.children) if isinstance(child, ParserRuleContext)
+      )
+  return nodes
@@ -1,12 +1,20 @@
 
-from antlr4 import *
-from antlr4.xpath import XPath
+from modelicaTransformer.Document import Document
+from modelicaTransformer.Text import nodeText
 
-from modelicaTransformer.modelicaAntlr.modelicaLexer import modelicaLexer
-from modelicaTransformer.modelicaAntlr.modelicaParser import modelicaParser
 
+# Axes of a path step, relative to each node selected by the previous step:
+# descendant: the node and its descendants (the default)
+# child: the node's children
+# parent: the node's parent
+# ancestor: the node's ancestors
+# A step's max_depth limits how many levels below (descendant) or above
+# (ancestor) the node are searched, e.g. a descendant step with max_depth 1
+# selects the node and its children
+AXES = ('descendant', 'child', 'parent', 'ancestor')
 
-def select(root, parser, rule, child=None, child_value=None):
+
+def select(root, parser, rule, child=None, child_value=None, axis='descendant', max_depth=None):
   """select selects the rule in AST that has a child with child_value
   If child is None, then it just returns the matched rule nodes
   e.g. select a component declaration whose identifier is thermalZoneTwoElements
@@ -16,44 +24,66 @@ def select(root, parser, rule, child=None, child_value=None):
   :param rule: string, name of node to search for
   :param child: string, (optional) name of direct descendant used to filter nodes by inspecting it's text
   :param child_value: (optional) string, value to match text to
+  :param axis: string, (optional) where to search relative to root, one of AXES
+  :param max_depth: int, (optional) number of levels to search below (descendant) or above (ancestor) root
+  :return: list, selected nodes in document order
   """
-  matches = XPath.XPath.findAll(root, f'//{rule}', parser)
-  if len(matches) == 0:
-    return []
-  
-  # check if we need to do filtering
-  if child == None:
-    return matches
+  from modelicaTransformer.Index import matchingChildren, treeIndex
 
-  def child_missing():
-    return []
+  if axis not in AXES:
+    raise Exception(f'Unknown axis {axis}, expected one of {", ".join(AXES)}')
 
-  results = []
-  for match in matches:
-    # this works b/c nodes of AST are ParserRuleContext, and calling child node
-    # as a method returns that context
-    children = getattr(match, child, child_missing)()
+  if getattr(parser, 'opaque_annotations', None) and getattr(root, 'getRuleIndex', None):
+    # selecting inside annotations, their bodies are parsed now (see Opaque.py)
+    from modelicaTransformer.Opaque import expandAnnotation, expandAnnotationsFor
+    if root.getRuleIndex() == parser.RULE_annotation:
+      expandAnnotation(root, parser)
+    elif axis == 'descendant':
+      expandAnnotationsFor(root, parser, rule)
+
+  intern = getattr(parser, 'intern', None)
+  if intern is not None and child_value is not None:
+    # the same string as the tree's identifiers, they're matched by identity (see Intern.py)
+    child_value = intern(child_value)
+
+  if axis == 'descendant':
+    # nodes are found with the tree's index (see Index.py); a child's text is
+    # compared without whitespace and comments, like getText()
+    index = treeIndex(root, parser)
+    if child == None:
+      return index.find(root, rule, max_depth)
+    return index.findByChild(root, rule, child, child_value, max_depth)
+
+  # the other axes only look at a few nodes, they're compared directly
+  if axis == 'child':
+    candidates = [node for node in root.children or [] if hasattr(node, 'getRuleIndex')]
+  else:
+    candidates = []
+    node = root.parentCtx
+    limit = 1 if axis == 'parent' else max_depth
+    while node is not None and (limit is None or len(candidates) < limit):
+      candidates.append(node)
+      node = node.parentCtx
+    candidates.reverse()
+
+  if rule not in parser.ruleNames:
+    raise Exception(f'{rule} is not a valid rule name')
+  rule_index = parser.ruleNames.index(rule)
+  if child == None:
+    return [node for node in candidates if node.getRuleIndex() == rule_index]
+  return [
+    node for node in candidates if node.getRuleIndex() == rule_index
+    for _ in range(matchingChildren(node, child, child_value))
+  ]
 
-    # possible for match to have multiple children of the same type
-    # e.g. connect_clause has two component_reference, so treat result as a list
-    if not isinstance(children, list):
-      children = [children]
-    
-    # filter this match based on child condition
-    for _child in children:
-      val = _child.getText()
-      if val == child_value:
-        results.append(match)
-  
-  return results
-  
 
 def selectPath(root, parser, path):
   """selectPath selects nodes based on a series of node selectors
 
   :param root: object, tree root to search
   :param parser: object, parser that made the tree
-  :param path: list, sparse path to a node
+  :param path: list, sparse path to a node, dicts with keys rule, child (optional),
+    child_value (optional), axis (optional, see AXES) and max_depth (optional)
   """
   # TODO: refactor path to be a string which we parse into selectors
   # e.g.: "declaration[IDENT=thermalZoneTwoElements].element_modification[name=VAir].expression"
@@ -73,19 +103,93 @@ def selectPath(root, parser, path):
                      node,
                      parser,
                      selector['rule'],
-                     selector['child'],
-                     selector['child_value'])
+                     selector.get('child'),
+                     selector.get('child_value'),
+                     selector.get('axis', 'descendant'),
+                     selector.get('max_depth'))
 
+    if selector.get('axis') in ('parent', 'ancestor'):
+      # nodes selected by the previous step can share ancestors
+      seen = set()
+      new_roots = [node for node in new_roots if not (id(node) in seen or seen.add(id(node)))]
     selected_nodes = new_roots
   
   return selected_nodes
 
 
+def _freeze(value):
+  """_freeze converts a value into a hashable equivalent for fingerprinting
+
+  :param value: object, value to freeze
+  :return: object, hashable value; raises TypeError if value can't be frozen
+  """
+  if isinstance(value, Selector):
+    fingerprint = value.fingerprint()
+    if fingerprint is None:
+      raise TypeError('selector has no fingerprint')
+    return fingerprint
+  if isinstance(value, (list, tuple)):
+    return tuple(_freeze(item) for item in value)
+  if isinstance(value, dict):
+    return tuple(sorted((key, _freeze(item)) for key, item in value.items()))
+  if isinstance(value, (set, frozenset)):
+    return frozenset(_freeze(item) for item in value)
+  hash(value)
+  return value
+
+
+def memoTable(tree):
+  """memoTable returns the selector memo table for a tree, creating it if needed
+  The table is stored on the tree root so it lives exactly as long as the tree
+
+  :param tree: object, root of the tree
+  :return: dict, memo table mapping (fingerprint, node id) to selected nodes
+  """
+  table = getattr(tree, '_selector_memo', None)
+  if table is None:
+    table = {}
+    tree._selector_memo = table
+  return table
+
+
 # Base class for Selectors
 class Selector:
   """Selector is the base class for all selectors"""
   _chained_selector = None
 
+  def _fingerprintArgs(self):
+    """_fingerprintArgs returns the hashable constructor arguments of the selector
+    By default this is every instance attribute except the chained selector,
+    override it if a selector holds state that doesn't affect what it selects
+
+    :return: tuple, sorted (name, value) pairs
+    """
+    return _freeze({
+      key: value for key, value in vars(self).items()
+      if key != '_chained_selector'
+    })
+
+  def fingerprint(self, chained=True):
+    """fingerprint returns a structural fingerprint of the selector
+    Selectors with equal fingerprints select the same nodes from the same tree
+
+    :param chained: boolean, if false the chained selectors are left out
+    :return: tuple, fingerprint or None if the selector's arguments aren't hashable
+    """
+    try:
+      args = self._fingerprintArgs()
+    except TypeError:
+      return None
+
+    chained_fingerprint = None
+    if chained and self._chained_selector is not None:
+      chained_fingerprint = self._chained_selector.fingerprint()
+      if chained_fingerprint is None:
+        return None
+
+    cls = self.__class__
+    return (f'{cls.__module__}.{cls.__qualname__}', args, chained_fingerprint)
+
   def _select(self, root, parser):
     """_select should be overridden when implementing a Selector
 
@@ -95,23 +199,80 @@ class Selector:
     """
     raise Exception('Unimplemented _select method')
 
-  def apply(self, root, parser):
+  def _path(self):
+    """_path can be overridden to describe the selector as a selectPath path,
+    which lets it be evaluated without building a tree (see Streaming.py)
+
+    :return: list, path for selectPath or None if the selector can't be described by one
+    """
+    return None
+
+  def path(self):
+    """path returns the path equivalent to this selector and its chained selectors
+
+    :return: list, path for selectPath or None if any selector in the chain has no path
+    """
+    path = self._path()
+    if path is None:
+      return None
+    if self._chained_selector is None:
+      return list(path)
+
+    chained_path = self._chained_selector.path()
+    if chained_path is None:
+      return None
+    return list(path) + chained_path
+
+  def apply(self, root, parser=None, memo=None):
     """apply runs selector as well as any chained selectors
+    Results are memoized per tree by fingerprint, so equal selectors (and
+    equal prefixes of chained selectors) are only evaluated once per tree
 
-    :param root: object, root of tree to search
-    :param parser: object, parser that built the tree
+    :param root: object, root of tree to search, or a Document to search its tree
+    :param parser: object, parser that built the tree, not needed for a Document
+    :param memo: dict, (optional) memo table, defaults to the table of root
     :return: list, list of nodes that were selected
     """
-    # pylint: disable=assignment-from-no-return
-    selected_nodes = self._select(root, parser)
+    if isinstance(root, Document):
+      root, parser = root.tree, root.parser
+    if memo is None:
+      memo = memoTable(root)
+
+    fingerprint = self.fingerprint()
+    if fingerprint is not None and (fingerprint, id(root)) in memo:
+      return list(memo[(fingerprint, id(root))])
+
+    selected_nodes = self._memoSelect(root, parser, memo)
     if not self._chained_selector:
-      return selected_nodes
+      return list(selected_nodes)
     
     selected_and_chained_nodes = []
     for node in selected_nodes:
-      selected_and_chained_nodes += self._chained_selector.apply(node, parser)
+      selected_and_chained_nodes += self._chained_selector.apply(node, parser, memo)
     
-    return selected_and_chained_nodes
+    if fingerprint is not None:
+      memo[(fingerprint, id(root))] = selected_and_chained_nodes
+    return list(selected_and_chained_nodes)
+
+  def _memoSelect(self, root, parser, memo):
+    """_memoSelect runs _select, reusing the result of an equal selector if
+    one already ran on root
+
+    :param root: object, root of tree to search
+    :param parser: object, parser that built the tree
+    :param memo: dict, memo table
+    :return: list, list of nodes that were selected
+    """
+    fingerprint = self.fingerprint(chained=False)
+    if fingerprint is None:
+      # pylint: disable=assignment-from-no-return
+      return self._select(root, parser)
+
+    key = (fingerprint, id(root))
+    if key not in memo:
+      # pylint: disable=assignment-from-no-return
+      memo[key] = self._select(root, parser)
+    return memo[key]
   
   def chain(self, selector):
     """chain chains a selector after this one
@@ -129,13 +290,10 @@ class Selector:
   def debug(self, source):
     """debug applies the selector to the source file and prints selected nodes
     
-    :param source: string, path to file
+    :param source: string or Document, path to file or an already loaded document
     """
-    fs = FileStream(source)
-    lexer = modelicaLexer(fs)
-    stream = CommonTokenStream(lexer)
-    parser = modelicaParser(stream)
-    tree = parser.stored_definition()
+    document = source if isinstance(source, Document) else Document(path=source)
+    tree, parser = document.tree, document.parser
 
     # pylint: disable=assignment-from-no-return
     matched = self._select(tree, parser)
@@ -158,8 +316,9 @@ class Selector:
       # gather the node's children names and their contents
       child_node_names = []
       child_node_contents = []
-      for child in node.children:
-        child_content = child.getText()
+      # pruned nodes have no children
+      for child in node.children or []:
+        child_content = nodeText(child, normalized=True)
         child_content = (child_content[:35] + '..') if len(child_content) > 35 else child_content
 
         child_name = format_node_name(child.__class__.__name__)
@@ -176,6 +335,25 @@ class Selector:
       print(f'    {" | ".join(child_node_contents)}')
 
 
+class PathSelector(Selector):
+  """PathSelector is a Selector which returns the nodes matched by a path
+  of node selectors, as accepted by selectPath
+  """
+
+  def __init__(self, path):
+    """__init__ initializes the selector
+
+    :param path: list, dicts with keys rule, child (optional) and child_value (optional)
+    """
+    self._path_steps = path
+
+  def _path(self):
+    return self._path_steps
+
+  def _select(self, root, parser):
+    return selectPath(root, parser, self._path_steps)
+
+
 class ComponentArgSelector(Selector):
   """ComponentArgSelector is a Selector which returns the argument assignment
   node on the specified component
@@ -190,29 +368,32 @@ class ComponentArgSelector(Selector):
     self._component_identifier = component_identifier
     self._argument_name = argument_name
   
+  def _path(self):
+    return [{
+      # get component
+      'rule': 'declaration',
+      'child': 'IDENT',
+      'child_value': self._component_identifier
+    },
+    {
+      # get argument, only the component's own arguments and not those of
+      # nested modifications: declaration > modification > class_modification
+      # > argument_list > argument > element_modification_or_replaceable > element_modification
+      'rule': 'element_modification',
+      'child': 'name',
+      'child_value': self._argument_name,
+      'max_depth': 6
+    },
+    {
+      # get argument value: element_modification > modification > expression
+      'rule': 'expression',
+      'child': None,
+      'child_value': None,
+      'max_depth': 2
+    }]
+
   def _select(self, root, parser):
-    return selectPath(
-      root,
-      parser,
-      [{
-        # get component
-        'rule': 'declaration',
-        'child': 'IDENT',
-        'child_value': self._component_identifier
-      },
-      {
-        # get argument
-        'rule': 'element_modification',
-        'child': 'name',
-        'child_value': self._argument_name
-      },
-      {
-        # get argument value
-        'rule': 'expression',
-        'child': None,
-        'child_value': None
-      }]
-    )
+    return selectPath(root, parser, self._path())
 
 class ConnectSelector(Selector):
   """ConnectSelector is a Selector which returns connect clauses connecting
@@ -222,13 +403,52 @@ class ConnectSelector(Selector):
     self._a = component_a
     self._b = component_b
   
+  def _path(self):
+    return [{
+      'rule': 'connect_clause',
+      'child': 'component_reference',
+      'child_value': self._a
+    }]
+
+  def _select(self, root, parser):
+    return selectPath(root, parser, self._path())
+
+
+class NumericLiteralSelector(Selector):
+  """NumericLiteralSelector is a Selector which returns the pure numeric array
+  or matrix literals in the modification of the specified component, e.g. the
+  table of table=[0, 1; 1, 2]. Use it with the numeric_literals parse option
+  and Edit.makeReplaceArray for large tables
+  """
+
+  def __init__(self, component_identifier):
+    """__init__ initializes the selector
+
+    :param component_identifier: string, identifier (ie name) of the component to select
+    """
+    self._component_identifier = component_identifier
+
   def _select(self, root, parser):
-    return selectPath(
-      root,
-      parser,
-      [{
-        'rule': 'connect_clause',
-        'child': 'component_reference',
-        'child_value': self._a
-      }]
-    )
+    from modelicaTransformer.Numeric import NumericLiteralError, isNumericLiteral, literalValues
+
+    modifications = selectPath(root, parser, [
+      {'rule': 'declaration', 'child': 'IDENT', 'child_value': self._component_identifier},
+      {'rule': 'modification'}
+    ])
+
+    literals = []
+    for modification in modifications:
+      for node in select(modification, parser, 'primary'):
+        if node.start.text not in ('[', '{'):
+          continue
+        # keep the outermost literal only, not nested rows or its first entry
+        if literals and literals[-1].start.tokenIndex <= node.start.tokenIndex <= literals[-1].stop.tokenIndex:
+          continue
+        if not isNumericLiteral(node, parser):
+          try:
+            literalValues(node, parser)
+          except NumericLiteralError:
+            continue
+        literals.append(node)
+
+    return literals
@@ -0,0 +1,38 @@
+# Parser subclass which shapes the tree while it's built: collapsing
+# expression chains (see Flat.py) and pruning the contents of rules which no
+# selector needs. Shaping happens as each rule exits, so dropped contexts are
+# never retained.
+
+from modelicaTransformer.Flat import chainRuleIndexes, collapse
+
+
+def shapedParserClass(parser_class):
+  """shapedParserClass returns a subclass of the generated parser which shapes
+  the tree according to its flat_expressions and prune_rules attributes
+
+  :param parser_class: class, generated modelicaParser
+  :return: class, parser subclass
+  """
+  chain_rules = chainRuleIndexes(parser_class)
+  expression_rule = parser_class.RULE_expression
+
+  class ShapedModelicaParser(parser_class):
+    # if true, expressions are collapsed as in Flat.py
+    flat_expressions = False
+    # rule indexes whose contexts are kept without children
+    prune_rules = frozenset()
+
+    def exitRule(self):
+      ctx = self._ctx
+      super().exitRule()
+      if not self.buildParseTrees:
+        return
+
+      rule = ctx.getRuleIndex()
+      if rule in self.prune_rules:
+        # keep the node and its span, drop its subtree
+        ctx.children = None
+      elif self.flat_expressions and rule == expression_rule:
+        collapse(ctx, chain_rules)
+
+  return ShapedModelicaParser
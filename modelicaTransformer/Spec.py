@@ -0,0 +1,131 @@
+from inspect import signature
+import json
+import os
+
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import ComponentArgSelector, ConnectSelector, PathSelector
+from modelicaTransformer.Transformation import Transformation, ReplaceComponentArgumentValue
+from modelicaTransformer.Transformer import Transformer
+
+# A spec is a declarative description of transformations, e.g.
+# {
+#   "transformations": [
+#     {"type": "replace_component_argument", "component": "EM", "argument": "k", "value": "8"},
+#     {"type": "insert", "data": " \"a comment\"", "insert_after": true,
+#      "selector": {"type": "path", "path": [{"rule": "declaration", "child": "IDENT", "child_value": "load"}]}},
+#     {"type": "delete", "selector": {"type": "connect", "a": "DC.p"}}
+#   ],
+#   "parse_options": {"flat_expressions": true}
+# }
+
+
+# keys accepted in "parse_options": the options of Parse.parse, and streaming (see Transformer)
+PARSE_OPTIONS = frozenset(list(signature(parse).parameters)[1:] + ['streaming'])
+
+
+class SpecError(Exception):
+  """SpecError is raised when a spec is malformed"""
+
+
+def _require(entry, key):
+  if key not in entry:
+    raise SpecError(f'Missing "{key}" in {json.dumps(entry)}')
+  return entry[key]
+
+
+def selectorFromSpec(entry):
+  """selectorFromSpec builds a Selector from its spec
+
+  :param entry: dict, selector spec
+  :return: Selector
+  """
+  kind = _require(entry, 'type')
+  if kind == 'path':
+    path = _require(entry, 'path')
+    for step in path:
+      _require(step, 'rule')
+    return PathSelector(path)
+  if kind == 'component_argument':
+    return ComponentArgSelector(_require(entry, 'component'), _require(entry, 'argument'))
+  if kind == 'connect':
+    # ConnectSelector matches the clauses connecting "a", whichever the other port
+    if 'b' in entry:
+      raise SpecError(f'Connect selectors match one port "a", "b" isn\'t supported in {json.dumps(entry)}')
+    return ConnectSelector(_require(entry, 'a'), None)
+
+  raise SpecError(f'Unknown selector type "{kind}"')
+
+
+def transformationFromSpec(entry):
+  """transformationFromSpec builds a Transformation from its spec
+
+  :param entry: dict, transformation spec
+  :return: Transformation
+  """
+  kind = _require(entry, 'type')
+  if kind == 'replace_component_argument':
+    return ReplaceComponentArgumentValue(
+      _require(entry, 'component'),
+      _require(entry, 'argument'),
+      _require(entry, 'value'))
+
+  if kind not in ('replace', 'insert', 'delete'):
+    raise SpecError(f'Unknown transformation type "{kind}"')
+
+  selector = selectorFromSpec(_require(entry, 'selector'))
+  if kind == 'replace':
+    return Transformation(selector, Edit.makeReplace(_require(entry, 'data')))
+  if kind == 'insert':
+    return Transformation(selector, Edit.makeInsert(_require(entry, 'data'), entry.get('insert_after', True)))
+  return Transformation(selector, Edit.makeDelete())
+
+
+def transformerFromSpec(spec):
+  """transformerFromSpec builds a Transformer with the transformations of a spec
+
+  :param spec: dict, spec with a "transformations" list and optional "parse_options"
+  :return: Transformer
+  """
+  if not isinstance(spec, dict):
+    raise SpecError('Spec must be an object')
+
+  parse_options = spec.get('parse_options', {})
+  if not isinstance(parse_options, dict):
+    raise SpecError('"parse_options" must be an object')
+  for key in parse_options:
+    if key not in PARSE_OPTIONS:
+      raise SpecError(f'Unknown parse option "{key}", expected one of {", ".join(sorted(PARSE_OPTIONS))}')
+
+  transformer = Transformer(**parse_options)
+  for entry in _require(spec, 'transformations'):
+    transformer.add(transformationFromSpec(entry))
+  return transformer
+
+
+def loadSpec(path):
+  """loadSpec reads a spec from a JSON or TOML file, chosen by file extension
+
+  :param path: string, path to spec file
+  :return: dict, spec
+  """
+  if os.path.splitext(path)[1].lower() == '.toml':
+    try:
+      import tomllib
+    except ImportError:
+      try:
+        import tomli as tomllib
+      except ImportError:
+        raise SpecError('Reading TOML specs requires Python 3.11+ or the tomli package')
+
+    with open(path, 'rb') as f:
+      try:
+        return tomllib.load(f)
+      except tomllib.TOMLDecodeError as e:
+        raise SpecError(f'Invalid TOML in {path}: {e}')
+
+  with open(path, 'r') as f:
+    try:
+      return json.load(f)
+    except ValueError as e:
+      raise SpecError(f'Invalid JSON in {path}: {e}')
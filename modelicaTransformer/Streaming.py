@@ -0,0 +1,309 @@
+# Tree-less selection
+#
+# For workloads which only need the spans of selected nodes (replace, insert,
+# delete), building and keeping the full tree is wasted work and memory.
+# collectMatches runs the parser with buildParseTrees disabled and evaluates
+# selectPath paths with a parse listener while parsing. Only the open rule
+# contexts (one per nesting level) and the matched contexts are kept alive.
+#
+# Matched contexts keep their start and stop tokens, so Edit spans are the
+# same as with a full parse, but they have no rule children; edits that
+# inspect a node's children need a tree.
+#
+# The token stream still buffers every token, the antlr runtime has no
+# unbuffered token stream.
+#
+# Levels and matches are those of the full parse: the parser runs without
+# building a tree, so the tree shaping options (flat_expressions, prune)
+# can't apply. A path which could select other nodes on the shaped tree
+# raises instead of silently selecting differently: steps on the expression
+# chain rules or inside pruned rules, and child axes or max_depth limits
+# which a flattened expression chain could bring into reach (found on the
+# grammar's rule invocations, see _shapingConflict).
+
+from heapq import heappop, heappush
+import inspect
+
+from antlr4.tree.Tree import ParseTreeListener
+
+from modelicaTransformer.Parse import makeParser, runParser
+from modelicaTransformer.Text import nodeText
+
+
+class _Frame:
+  """_Frame is the state kept for an open rule context"""
+  __slots__ = ('ctx', 'rule', 'child_texts', 'pending')
+
+  def __init__(self, ctx, rule):
+    self.ctx = ctx
+    self.rule = rule
+    # child name -> texts of the children with that name, only for names a path filters on
+    self.child_texts = None
+    # path index -> list of (step index, matched node) waiting for this frame
+    # to decide if it matches the step before
+    self.pending = None
+
+
+class SpanCollector(ParseTreeListener):
+  """SpanCollector evaluates selectPath paths on a parse as it happens
+  Semantics match selectPath: each step selects descendants-or-self (or
+  children) of the nodes selected by the previous step, up to the step's
+  max_depth, filtered by the text of a direct child. Steps on the parent and
+  ancestor axes aren't supported. Each matched node is reported once, in
+  document order
+  """
+
+  def __init__(self, parser, paths):
+    """__init__ initializes the collector, add it with parser.addParseListener
+
+    :param parser: object, parser that will run
+    :param paths: list, paths as accepted by selectPath
+    """
+    self._parser = parser
+    self._paths = [list(path) for path in paths]
+    for path in self._paths:
+      for step in path:
+        if step.get('axis', 'descendant') not in ('descendant', 'child'):
+          raise Exception(f'The {step["axis"]} axis needs a tree, it can\'t be used in streaming mode')
+    self._bounded = [
+      any(step.get('axis') == 'child' or step.get('max_depth') is not None for step in path) for path in self._paths
+    ]
+    self._stack = []
+    self._matches = [{} for _ in paths]
+    self._single_accessors = {}
+
+    # rule -> names of its children that some step filters on
+    self._filtered_children = {}
+    for path in self._paths:
+      for step in path:
+        if step.get('child') is not None:
+          self._filtered_children.setdefault(step['rule'], set()).add(step['child'])
+
+  def matches(self):
+    """matches returns the matched nodes of each path
+
+    :return: list, list of nodes for each path
+    """
+    return [
+      sorted(matched.values(), key=lambda node: node.start.tokenIndex)
+      for matched in self._matches
+    ]
+
+  def _text(self, ctx):
+    # same as ctx.getText() on a full tree, i.e. on-channel token texts joined
+    return nodeText(ctx, normalized=True)
+
+  def _isSingleAccessor(self, ctx, child):
+    # generated accessors return only the first child when the rule can
+    # have at most one child of that name, select compares just that one
+    key = (ctx.__class__, child)
+    if key not in self._single_accessors:
+      accessor = getattr(ctx.__class__, child, None)
+      self._single_accessors[key] = accessor is not None and 'i' not in inspect.signature(accessor).parameters
+    return self._single_accessors[key]
+
+  def _record(self, frame, child, text):
+    if frame.child_texts is None:
+      frame.child_texts = {}
+    frame.child_texts.setdefault(child, []).append(text)
+
+  def _passes(self, frame, step):
+    child = step.get('child')
+    if child is None:
+      return True
+
+    texts = (frame.child_texts or {}).get(child, [])
+    if texts and self._isSingleAccessor(frame.ctx, child):
+      texts = texts[:1]
+    return step.get('child_value') in texts
+
+  def _reaches(self, step, distance):
+    """_reaches checks if a node distance levels below a node matching the
+    previous step is on the step's axis
+
+    :param step: dict, path step
+    :param distance: int, number of levels between the nodes
+    :return: boolean
+    """
+    if step.get('axis') == 'child':
+      return distance == 1
+    max_depth = step.get('max_depth')
+    return max_depth is None or distance <= max_depth
+
+  def _place(self, path_index, step_index, node, depth, frame_index):
+    """_place moves a candidate up the stack until all steps are matched or it can't match
+
+    :param path_index: int, index of the path
+    :param step_index: int, the node matched steps step_index and after
+    :param node: object, matched node
+    :param depth: int, index in the stack of the frame which matched step_index
+    :param frame_index: int, index of the exiting frame, at or above depth
+    """
+    path = self._paths[path_index]
+    if step_index == 0:
+      # the first step is relative to the root, the bottom frame
+      if self._reaches(path[0], depth):
+        self._matches[path_index][id(node)] = node
+      return
+
+    step = path[step_index]
+    previous = path[step_index - 1]
+    frame = self._stack[frame_index]
+    # without child axes and depth limits the nearest ancestor matching a
+    # step is the only one worth trying, otherwise every one in reach is
+    bounded = self._bounded[path_index]
+
+    # the frame can match several consecutive steps (descendant-or-self)
+    if previous['rule'] == frame.rule and self._reaches(step, depth - frame_index) and self._passes(frame, previous):
+      self._place(path_index, step_index - 1, node, frame_index, frame_index)
+      if not bounded:
+        return
+    if bounded and frame_index < depth:
+      # the ancestors in reach were all tried when the node was placed
+      return
+
+    # wait for the ancestors which could match the previous step
+    for ancestor_index in range(frame_index - 1, -1, -1):
+      # ancestors further up are out of reach too
+      if not self._reaches(step, depth - ancestor_index):
+        return
+      ancestor = self._stack[ancestor_index]
+      if ancestor.rule == previous['rule']:
+        if ancestor.pending is None:
+          ancestor.pending = {}
+        ancestor.pending.setdefault(path_index, []).append((step_index, node, depth))
+        if not bounded:
+          return
+
+  def enterEveryRule(self, ctx):
+    self._stack.append(_Frame(ctx, self._parser.ruleNames[ctx.getRuleIndex()]))
+
+  def visitTerminal(self, node):
+    frame = self._stack[-1]
+    children = self._filtered_children.get(frame.rule)
+    if not children:
+      return
+
+    token_type = node.symbol.type
+    if 0 < token_type < len(self._parser.symbolicNames):
+      name = self._parser.symbolicNames[token_type]
+      if name in children:
+        self._record(frame, name, node.symbol.text)
+
+  def exitEveryRule(self, ctx):
+    frame_index = len(self._stack) - 1
+    frame = self._stack[frame_index]
+
+    for path_index, path in enumerate(self._paths):
+      last = len(path) - 1
+      if path[last]['rule'] == frame.rule and self._passes(frame, path[last]):
+        self._place(path_index, last, ctx, frame_index, frame_index)
+
+    if frame.pending is not None:
+      for path_index, candidates in frame.pending.items():
+        for step_index, node, depth in candidates:
+          self._place(path_index, step_index, node, depth, frame_index)
+
+    self._stack.pop()
+    if self._stack:
+      parent = self._stack[-1]
+      children = self._filtered_children.get(parent.rule)
+      if children and frame.rule in children:
+        self._record(parent, frame.rule, self._text(ctx))
+
+
+def _flatDistance(invoked, chain_rules, expression_rule, source, target):
+  """_flatDistance finds the fewest levels between a node of source and one
+  of target below it on a flat tree, over the ways through a collapsed chain
+
+  :param invoked: list, from Reach.ruleInvocations
+  :param chain_rules: frozenset, rule indexes of the expression chain rules
+  :param expression_rule: int, rule index of expression
+  :param source: int, rule index of the upper node
+  :param target: int, rule index of the lower node
+  :return: int, number of levels, or None if no way goes through a collapsed chain
+  """
+  # (levels, rule, below an expression with only chain rules between, went through a collapsed chain)
+  queue = [(0, source, source == expression_rule, False)]
+  seen = set()
+  while queue:
+    levels, rule, in_chain, collapsed = heappop(queue)
+    if rule == target and collapsed:
+      return levels
+    if (rule, in_chain, collapsed) in seen:
+      continue
+    seen.add((rule, in_chain, collapsed))
+    for callee in invoked[rule]:
+      if callee in chain_rules:
+        # chains below an expression are collapsed (see Shape.py), others are kept
+        heappush(queue, (levels if in_chain else levels + 1, callee, in_chain, collapsed or in_chain))
+      else:
+        heappush(queue, (levels + 1, callee, callee == expression_rule, collapsed))
+  return None
+
+
+def _shapingConflict(paths, parse_options):
+  """_shapingConflict finds a path step which could select other nodes on the
+  tree shaped by the parse options than while streaming (see above)
+
+  :param paths: list, paths as accepted by selectPath
+  :param parse_options: dict, options accepted by Parse.parse
+  :return: string, why the step selects differently, or None
+  """
+  from modelicaTransformer.Flat import CHAIN_RULES
+  from modelicaTransformer.Parse import load
+  from modelicaTransformer.Reach import ruleInvocations, ruleReachability
+
+  flat = parse_options.get('flat_expressions')
+  prune = parse_options.get('prune') or []
+  if not flat and not prune:
+    return None
+
+  _, modelicaParser = load()
+  rule_names = list(modelicaParser.ruleNames)
+  reachable = ruleReachability(modelicaParser)
+  invoked = ruleInvocations(modelicaParser)
+  chain_rules = frozenset(rule_names.index(rule) for rule in CHAIN_RULES)
+  pruned = [rule_names.index(rule) for rule in prune if rule in rule_names]
+
+  for path in paths:
+    previous = modelicaParser.RULE_stored_definition
+    for step in path:
+      if step['rule'] not in rule_names:
+        continue
+      rule = rule_names.index(step['rule'])
+      if any(rule == pruned_rule or rule in reachable[pruned_rule] for pruned_rule in pruned):
+        return f'{step["rule"]} can be inside a pruned rule'
+      if flat and rule in chain_rules:
+        return f'flat_expressions leaves {step["rule"]} nodes out'
+      if flat and step.get('child') in CHAIN_RULES:
+        return f'flat_expressions leaves the {step["child"]} children of {step["rule"]} out'
+      limit = 1 if step.get('axis') == 'child' else step.get('max_depth')
+      if flat and limit is not None:
+        levels = _flatDistance(invoked, chain_rules, modelicaParser.RULE_expression, previous, rule)
+        if levels is not None and levels <= limit:
+          return f'flat_expressions can bring {step["rule"]} nodes into the reach of a {step.get("axis", "descendant")} step'
+      previous = rule
+  return None
+
+
+def collectMatches(text, paths, **parse_options):
+  """collectMatches parses text without building a tree and returns the nodes
+  each path selects
+
+  :param text: string, Modelica source
+  :param paths: list, paths as accepted by selectPath
+  :param parse_options: options accepted by Parse.parse; paths which could
+    select other nodes on a tree shaped by flat_expressions or prune raise
+  :return: list, list of matched nodes (without rule children) for each path
+  """
+  conflict = _shapingConflict(paths, parse_options)
+  if conflict is not None:
+    raise Exception(f'{conflict}, the path can select other nodes than on the tree and needs a tree')
+
+  parser = makeParser(text, **parse_options)
+  parser.buildParseTrees = False
+  collector = SpanCollector(parser, paths)
+  parser.addParseListener(collector)
+  runParser(parser)
+  return collector.matches()
@@ -0,0 +1,63 @@
+# Node text
+#
+# getText() on a context walks its subtree and joins the texts of its tokens,
+# again for every call, which is slow for large nodes (e.g. an expression).
+# nodeText slices the source between the node's first and last characters
+# instead. The normalized text leaves out whitespace and comments, like
+# getText(); it's joined from the token stream, or sliced from the source
+# when the node spans no hidden tokens, and memoized on the node.
+
+# antlr4's Token.DEFAULT_CHANNEL, not imported so importing the package doesn't load the runtime
+DEFAULT_CHANNEL = 0
+
+
+def _hiddenCounts(stream):
+  """_hiddenCounts returns the number of off-channel tokens before each token
+  of a stream, computed once per stream
+
+  :param stream: object, filled token stream
+  :return: list, count for each token index, plus the total
+  """
+  tokens = stream.tokens
+  counts = getattr(stream, '_hidden_counts', None)
+  if counts is None or len(counts) != len(tokens) + 1:
+    counts = [0]
+    for token in tokens:
+      counts.append(counts[-1] + (token.channel != DEFAULT_CHANNEL))
+    stream._hidden_counts = counts
+  return counts
+
+
+def nodeText(node, normalized=False):
+  """nodeText returns the source text of a node
+
+  :param node: object, node of the AST, a context or a terminal
+  :param normalized: boolean, if true tokens off the parser's channel (whitespace,
+    comments and bodies hidden by parse options) are left out, as in getText()
+  :return: string, text of the node
+  """
+  symbol = getattr(node, 'symbol', None)
+  if symbol is not None:
+    return symbol.text
+
+  start, stop = node.start, node.stop
+  if start is None or stop is None or stop.tokenIndex < start.tokenIndex:
+    return ''
+  if start is stop:
+    # the token's own text, shared with the token when identifiers are interned
+    return start.text
+  if not normalized:
+    return start.getInputStream().getText(start.start, stop.stop)
+
+  text = node.__dict__.get('_normalized_text')
+  if text is None:
+    stream = node.parser.getTokenStream()
+    counts = _hiddenCounts(stream)
+    if counts[stop.tokenIndex + 1] == counts[start.tokenIndex]:
+      text = start.getInputStream().getText(start.start, stop.stop)
+    else:
+      text = ''.join(
+        token.text for token in stream.tokens[start.tokenIndex:stop.tokenIndex + 1]
+        if token.channel == DEFAULT_CHANNEL)
+    node._normalized_text = text
+  return text
@@ -0,0 +1,41 @@
+# Compact char stream
+#
+# The runtime's InputStream keeps the input twice: the string, and a list of
+# its code points which the lexer reads through LA. The list costs a pointer
+# per character, about eight times the string itself for ASCII sources.
+# Python strings are indexed by code point already, so TextStream reads the
+# code points from the string on demand, and only keeps the string.
+
+from antlr4 import InputStream, Token
+
+
+class TextStream(InputStream):
+  """TextStream is an InputStream without the list of code points, a drop-in
+  char stream for modelicaLexer and RegexLexer
+  """
+
+  def __init__(self, data):
+    """__init__ initializes the stream
+
+    :param data: string, input
+    """
+    self.name = '<empty>'
+    self.strdata = data
+    self._index = 0
+    self._size = len(data)
+
+  def _loadString(self):
+    self._index = 0
+    self._size = len(self.strdata)
+
+  def LA(self, offset):
+    if offset == 0:
+      # undefined
+      return 0
+    if offset < 0:
+      # LA(-1) is the previous character
+      offset += 1
+    pos = self._index + offset - 1
+    if pos < 0 or pos >= self._size:
+      return Token.EOF
+    return ord(self.strdata[pos])
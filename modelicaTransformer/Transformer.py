@@ -1,17 +1,33 @@
-from collections import namedtuple
+import logging
 import time
 
-from antlr4 import *
-
+from modelicaTransformer.Document import Document
 from modelicaTransformer.Edit import Edit
-from modelicaTransformer.modelicaAntlr.modelicaLexer import modelicaLexer
-from modelicaTransformer.modelicaAntlr.modelicaParser import modelicaParser
+from modelicaTransformer.Parse import ParseError, parse, readSource, writeSource
+
+logger = logging.getLogger(__name__)
 
 # Collects transformations and applies them to files
 class Transformer:
-  """Transformer collects transformations and applies them to files"""
-  _transformations = []
-  _edits = []
+  """Transformer collects transformations and applies them to files
+  Edits are built in call-local state, so one configured transformer can
+  execute concurrently from multiple threads
+  """
+
+  def __init__(self, streaming=False, **parse_options):
+    """__init__ initializes the transformer
+
+    :param streaming: boolean, if true selectors are evaluated while parsing
+      without building a tree (see Streaming.py); all selectors must have a path
+    :param parse_options: options passed to Parse.parse, e.g. flat_expressions
+      or prune; rules the selectors' paths select, and rules which can contain
+      them, are never pruned, and nothing is pruned if a selector has no path.
+      With error_policy collect or bail, files with syntax errors raise
+      ParseError and aren't transformed. They override a Document's options
+    """
+    self._transformations = []
+    self._streaming = streaming
+    self._parse_options = parse_options
   
   def add(self, transformation):
     """add adds a transformation to be applied
@@ -20,41 +36,272 @@ class Transformer:
     """
     self._transformations.append(transformation)
   
-  def _buildEdits(self, tree, parser):
-    """_buildEdits generates edits on nodes by applying selectors
+  def _buildEdits(self, transformations, selections):
+    """_buildEdits generates edits on the nodes selected for each transformation
+
+    :param transformations: list, transformations
+    :param selections: list, selected nodes of each transformation's selector
+    :return: list, edits for the selected nodes
+    """
+    edits = []
+    for trans, selected_nodes in zip(transformations, selections):
+      for node in selected_nodes:
+        edits.append(trans.edit(node))
+
+    return edits
 
-    :param tree: object, a node from Antlr AST
-    :param parser: object, modelica parser
+  def _parseOptions(self, defaults=None):
+    """_parseOptions returns the options to parse with, keeping the rules
+    selected by the transformations' selectors, and the rules which can
+    contain them, out of the pruned rules
+
+    :param defaults: dict, (optional) parse options of a Document, the
+      transformer's own options override them
+    :return: dict, options for Parse.parse
     """
-    self._edits = []
+    options = dict(defaults or {})
+    options.update(self._parse_options)
+    if options.get('prune'):
+      from modelicaTransformer.Parse import load
+      from modelicaTransformer.Reach import ruleReachability
+
+      paths = [trans.selector.path() for trans in list(self._transformations)]
+      if any(path is None for path in paths):
+        # what a selector without a path selects is unknown, any pruned rule could hide it
+        logger.debug('not pruning, a selector has no path')
+        options['prune'] = []
+        return options
+
+      _, modelicaParser = load()
+      reachable = ruleReachability(modelicaParser)
+      rule_names = list(modelicaParser.ruleNames)
+      selected = {rule_names.index(step['rule']) for path in paths for step in path if step['rule'] in rule_names}
+      options['prune'] = [
+        rule for rule in options['prune']
+        if rule not in rule_names or (
+          rule_names.index(rule) not in selected and not selected & reachable[rule_names.index(rule)])
+      ]
+
+    return options
+
+  def _streamEdits(self, text, defaults=None):
+    """_streamEdits generates edits by selecting nodes while parsing, without a tree
 
-    for trans in self._transformations:
-      selected_nodes = trans.selector.apply(tree, parser)
+    :param text: string, source to parse
+    :param defaults: dict, (optional) see _parseOptions
+    :return: list, edits for the selected nodes
+    """
+    from modelicaTransformer.Streaming import collectMatches
+
+    transformations = list(self._transformations)
+    paths = []
+    for trans in transformations:
+      path = trans.selector.path()
+      if path is None:
+        raise Exception(f'{trans.selector.__class__.__name__} has no path and needs a tree, it can\'t be used in streaming mode')
+      paths.append(path)
+
+    options = self._parseOptions(defaults)
+    if options.get('opaque_annotations'):
+      from modelicaTransformer.Parse import load
+      from modelicaTransformer.Reach import ruleReachability
+
+      _, modelicaParser = load()
+      rule_names = list(modelicaParser.ruleNames)
+      in_annotations = ruleReachability(modelicaParser)[modelicaParser.RULE_annotation]
+      if any(step['rule'] in rule_names and rule_names.index(step['rule']) in in_annotations
+             for path in paths for step in path):
+        # bodies can't be parsed on demand without a tree
+        options['opaque_annotations'] = False
+
+    edits = []
+    for trans, selected_nodes in zip(transformations, collectMatches(text, paths, **options)):
       for node in selected_nodes:
-        self._edits.append(trans.edit(node))
+        edits.append(trans.edit(node))
+
+    return edits
+
+  def _editsFor(self, text, cache=None, document=None, defaults=None):
+    """_editsFor parses text and generates the edits of all transformations
+
+    :param text: string, source to transform
+    :param cache: ParseCache or StructureCache, (optional) cache to reuse
+      parsed trees or selections from, not used in streaming mode
+    :param document: Document, (optional) document of text, its trees are used
+      instead of parsing or the cache, and its parse options are the defaults
+    :param defaults: dict, (optional) parse options the transformer's own
+      options override, e.g. those of a chunked Document
+    :return: list, edits for the selected nodes
+    """
+    if document is not None:
+      defaults = document.parseOptions
+
+    if self._streaming:
+      # there's no tree to reuse, the document's text is parsed again
+      start = time.time()
+      edits = self._streamEdits(text, defaults)
+      logger.debug('stream edits: %s', time.time() - start)
+      return edits
+
+    # copy so transformations added while executing don't affect this run
+    transformations = list(self._transformations)
+    selectors = [trans.selector for trans in transformations]
+    options = self._parseOptions(defaults)
+    if document is not None:
+      start = time.time()
+      tree, parser = document.parse(options)
+      logger.debug('document parse: %s', time.time() - start)
+      start = time.time()
+      selections = [selector.apply(tree, parser) for selector in selectors]
+      logger.debug('select: %s', time.time() - start)
+    elif cache is not None:
+      start = time.time()
+      selections = cache.select(text, selectors, **options)
+      logger.debug('select from cache: %s', time.time() - start)
+    else:
+      start = time.time()
+      tree, parser = parse(text, **options)
+      logger.debug('build parser: %s', time.time() - start)
+      start = time.time()
+      selections = [selector.apply(tree, parser) for selector in selectors]
+      logger.debug('select: %s', time.time() - start)
+
+    return self._buildEdits(transformations, selections)
+
+  def _chunkedEdits(self, text, executor, document=None):
+    """_chunkedEdits splits text into class chunks (see Chunk.py), generates
+    their edits in executor and maps them back onto text
+
+    :param text: string, source to transform
+    :param executor: object, concurrent.futures executor
+    :param document: Document, (optional) document of text; chunks are parsed
+      on their own with its parse options, its trees are only used when the
+      file isn't split
+    :return: list, edits for the selected nodes
+    """
+    from modelicaTransformer.Chunk import OffsetMap, chunkText, inChunks, splitChunks
+
+    if not inChunks([trans.selector for trans in list(self._transformations)]):
+      # a path could select differently in the chunks, e.g. a package's nested classes
+      logger.debug('not chunking, a selector path isn\'t satisfiable within one class')
+      return self._editsFor(text, document=document)
+
+    chunks = splitChunks(text)
+    if len(chunks) <= 2:
+      # at most one class, nothing to parallelize
+      return self._editsFor(text, document=document)
+
+    defaults = document.parseOptions if document is not None else None
+    futures = [
+      executor.submit(self._editsFor, chunkText(text, chunk), None, None, defaults) for chunk in chunks
+    ]
+    edits = []
+    errors = []
+    for chunk, future in zip(chunks, futures):
+      offset_map = OffsetMap(chunk)
+      try:
+        edits += [offset_map.mapEdit(edit) for edit in future.result()]
+      except ParseError as e:
+        # report the errors at their position in the file, not the chunk
+        errors += [offset_map.mapIssue(error, text) for error in e.errors]
+
+    if errors:
+      raise ParseError(sorted(errors, key=lambda error: error.offset))
+    return edits
+
+  def transform(self, text, cache=None, executor=None):
+    """transform applies transformations to Modelica source text
+
+    :param text: string or Document, source to transform; a Document's trees
+      are shared with other transformers and selectors (see Document.py). Its
+      parse options are defaults, the transformer's own options override them.
+      Streaming and chunked modes parse a Document's text again, without its trees
+    :param cache: ParseCache or StructureCache, (optional) cache to reuse parsed
+      trees or selections from, not used in streaming or chunked mode or for a Document
+    :param executor: object, (optional) concurrent.futures executor; if given, the
+      classes of the file are parsed and selected in parallel chunks (see Chunk.py),
+      unless a selector path isn't satisfiable within one class
+    :return: string, transformed source
+    """
+    document = None
+    if isinstance(text, Document):
+      document, text = text, text.text
+
+    if executor is not None:
+      edits = self._chunkedEdits(text, executor, document)
+    else:
+      edits = self._editsFor(text, cache, document)
+
+    # sort and apply edits in reverse to avoid changing token offsets
+    # in the edited file
+    edits.sort()
+    return Edit.applyEdits(reversed(edits), text)
   
-  def execute(self, source):
+  def execute(self, source, cache=None, executor=None):
     """execute applies transformations to a file and returns the result as a string
 
+    :param source: string or Document, path to file to transform or its document
+    :param cache: ParseCache or StructureCache, (optional) see transform
+    :param executor: object, (optional) executor to parse the file's classes in
+      parallel with, see transform
+    :return: string, transformed source
+    """
+    if isinstance(source, Document):
+      return self.transform(source, cache, executor)
+    return self.transform(readSource(source), cache, executor)
+
+  async def execute_async(self, source, output=None, executor=None):
+    """execute_async applies transformations to a file without blocking the event loop
+    Parsing and selection run in executor, file reads and writes run in the
+    loop's default executor. When using a process executor the transformations
+    must be picklable
+
     :param source: string, path to file to transform
+    :param output: string, (optional) path to write the transformed source to
+    :param executor: object, (optional) concurrent.futures executor used for
+      parsing, defaults to the loop's default executor
     :return: string, transformed source
     """
-    start = time.time()
-    fs = FileStream(source)
-    lexer = modelicaLexer(fs)
-    stream = CommonTokenStream(lexer)
-    parser = modelicaParser(stream)
-    tree = parser.stored_definition()
-    print(f'build parser: {time.time() - start}')
+    import asyncio
 
-    start = time.time()
-    self._buildEdits(tree, parser)
-    print(f'build edits: {time.time() - start}')
+    loop = asyncio.get_running_loop()
+    text = await loop.run_in_executor(None, readSource, source)
+    result = await loop.run_in_executor(executor, self.transform, text)
+    if output is not None:
+      await loop.run_in_executor(None, writeSource, output, result)
 
-    # sort and apply edits in reverse to avoid changing token offsets
-    # in the edited file
-    self._edits.sort()
-    with open(source, 'r') as f:
-      return Edit.applyEdits(
-        reversed(self._edits),
-        f.read())
+    return result
+
+  async def execute_many_async(self, sources, outputs=None, executor=None, concurrency=4):
+    """execute_many_async applies transformations to many files concurrently
+    At most concurrency files are in flight at once. If the call is cancelled,
+    or one file fails, the remaining jobs are cancelled
+
+    :param sources: list, paths to files to transform
+    :param outputs: list, (optional) paths to write results to, one per source
+    :param executor: object, (optional) concurrent.futures executor used for parsing
+    :param concurrency: int, maximum number of files transformed at once
+    :return: list, transformed sources in the same order as sources
+    """
+    import asyncio
+
+    sources = list(sources)
+    if outputs is None:
+      outputs = [None] * len(sources)
+    if len(outputs) != len(sources):
+      raise Exception('Expected one output per source')
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(source, output):
+      async with semaphore:
+        return await self.execute_async(source, output, executor)
+
+    tasks = [asyncio.ensure_future(run(source, output)) for source, output in zip(sources, outputs)]
+    try:
+      return await asyncio.gather(*tasks)
+    except BaseException:
+      for task in tasks:
+        task.cancel()
+      await asyncio.gather(*tasks, return_exceptions=True)
+      raise
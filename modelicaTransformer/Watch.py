@@ -0,0 +1,82 @@
+import os
+import time
+
+
+def _signature(path):
+  """_signature returns what a file is compared by to detect changes
+
+  :param path: string, path to file
+  :return: tuple, (mtime in ns, size) or None if the file is gone
+  """
+  try:
+    stat = os.stat(path)
+  except OSError:
+    return None
+  return stat.st_mtime_ns, stat.st_size
+
+
+class Watcher:
+  """Watcher polls files matched by paths or glob patterns and reports which
+  changed, batching bursts of changes together
+  """
+
+  def __init__(self, expand, interval=0.5, debounce=0.25):
+    """__init__ initializes the watcher and records the current state of files
+
+    :param expand: function, returns the list of files to watch, called on every poll
+      so new files are picked up
+    :param interval: float, seconds between polls
+    :param debounce: float, seconds without further changes before a batch is reported
+    """
+    self._expand = expand
+    self._interval = interval
+    self._debounce = debounce
+    self._signatures = {}
+    self.poll()
+
+  def poll(self):
+    """poll checks files once
+
+    :return: set, paths that were added or modified since the last poll
+    """
+    signatures = {path: _signature(path) for path in self._expand()}
+    changed = {
+      path for path, signature in signatures.items()
+      if signature is not None and self._signatures.get(path) != signature
+    }
+    self._signatures = signatures
+    return changed
+
+  def ignore(self, path):
+    """ignore marks the current state of path as seen, e.g. after writing it
+    ourselves so our own output doesn't trigger another run
+
+    :param path: string, path to file
+    """
+    self._signatures[path] = _signature(path)
+
+  def wait(self):
+    """wait blocks until files change and changes have settled for the debounce period
+
+    :return: set, paths changed in this batch
+    """
+    batch = set()
+    settled_at = None
+    while True:
+      changed = self.poll()
+      now = time.monotonic()
+      if changed:
+        batch |= changed
+        settled_at = now + self._debounce
+      if batch and now >= settled_at:
+        return batch
+      time.sleep(min(self._interval, self._debounce) if batch else self._interval)
+
+  def watch(self, callback, stop=None):
+    """watch calls callback with every batch of changed files until stop returns true
+
+    :param callback: function, called with a sorted list of changed paths
+    :param stop: function, (optional) checked after each batch
+    """
+    while stop is None or not stop():
+      callback(sorted(self.wait()))
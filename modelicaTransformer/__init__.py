@@ -2,8 +2,10 @@ from modelicaTransformer.Transformer import Transformer
 from modelicaTransformer.Transformation import Transformation
 from modelicaTransformer.Edit import Edit
 from modelicaTransformer.Selector import Selector
+from modelicaTransformer.Document import Document
 
 __all__ = ['Transformer',
            'Transformation',
            'Edit',
-           'Selector']
+           'Selector',
+           'Document']
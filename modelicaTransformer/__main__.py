@@ -0,0 +1,5 @@
+import sys
+
+from modelicaTransformer.Cli import main
+
+sys.exit(main())
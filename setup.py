@@ -12,5 +12,11 @@ setup(
   author_email = "ted@devetry.com",
   description = ("Allows parsing and modifying Modelica files"),
   install_requires=install_requirements,
-  packages=find_packages()
+  extras_require={
+    'numpy': ['numpy']
+  },
+  packages=find_packages(),
+  entry_points={
+    'console_scripts': ['modelica-transform=modelicaTransformer.Cli:main']
+  }
 )
\ No newline at end of file
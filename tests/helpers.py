@@ -0,0 +1,36 @@
+# Fixtures shared by the test modules
+#
+#   python -m pytest tests
+
+import os
+
+from modelicaTransformer.Transformation import ReplaceComponentArgumentValue
+from modelicaTransformer.Transformer import Transformer
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+EXAMPLE = os.path.join(REPO_ROOT, 'examples', 'DCMotor.mo')
+
+
+def readExample():
+  """readExample returns the source of EXAMPLE
+
+  :return: string, Modelica source
+  """
+  with open(EXAMPLE) as f:
+    return f.read()
+
+
+def makeTransformer(*transformations, **options):
+  """makeTransformer returns a Transformer which sets EM's k to 8 (k=10 in
+  EXAMPLE), then applies transformations
+
+  :param transformations: Transformation, more transformations to add
+  :param options: options for Transformer, e.g. streaming or parse options
+  :return: Transformer
+  """
+  transformer = Transformer(**options)
+  transformer.add(ReplaceComponentArgumentValue('EM', 'k', '8'))
+  for transformation in transformations:
+    transformer.add(transformation)
+  return transformer
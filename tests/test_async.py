@@ -0,0 +1,110 @@
+# The asyncio entry points must give the results of execute, keep at most
+# concurrency files in flight, and cancel what's left when they're cancelled
+# or a file fails
+#
+#   python -m pytest tests
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+from modelicaTransformer.Transformation import ReplaceComponentArgumentValue
+from modelicaTransformer.Transformer import Transformer
+
+from helpers import EXAMPLE
+
+FILES = 8
+
+
+class SlowTransformer(Transformer):
+  """SlowTransformer is a Transformer which records how many transforms run at once"""
+
+  def __init__(self, **parse_options):
+    super().__init__(**parse_options)
+    self.add(ReplaceComponentArgumentValue('EM', 'k', '8'))
+    self.lock = threading.Lock()
+    self.running = 0
+    self.most_running = 0
+    self.started = threading.Event()
+
+  def transform(self, text, cache=None, executor=None):
+    with self.lock:
+      self.running += 1
+      self.most_running = max(self.most_running, self.running)
+    self.started.set()
+    try:
+      time.sleep(0.05)
+      return super().transform(text, cache, executor)
+    finally:
+      with self.lock:
+        self.running -= 1
+
+
+class TestAsync(unittest.TestCase):
+
+  def setUp(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.sources = []
+    for i in range(FILES):
+      source = os.path.join(directory.name, f'DCMotor{i}.mo')
+      shutil.copy(EXAMPLE, source)
+      self.sources.append(source)
+    self.outputs = [os.path.join(directory.name, f'out{i}.mo') for i in range(FILES)]
+    self.executor = ThreadPoolExecutor(FILES)
+    self.addCleanup(self.executor.shutdown)
+
+  def test_execute_async(self):
+    transformer = SlowTransformer()
+    expected = transformer.execute(EXAMPLE)
+    result = asyncio.run(transformer.execute_async(self.sources[0], self.outputs[0], self.executor))
+    self.assertEqual(result, expected)
+    self.assertIn('EM(k=8,', result)
+    with open(self.outputs[0]) as f:
+      self.assertEqual(f.read(), expected)
+
+  def test_concurrency_limit(self):
+    transformer = SlowTransformer()
+    expected = transformer.execute(EXAMPLE)
+    results = asyncio.run(transformer.execute_many_async(self.sources, self.outputs, self.executor, concurrency=3))
+    self.assertEqual(results, [expected] * FILES)
+    self.assertLessEqual(transformer.most_running, 3)
+    self.assertGreater(transformer.most_running, 1)
+    for output in self.outputs:
+      with open(output) as f:
+        self.assertEqual(f.read(), expected)
+
+  def test_outputs_per_source(self):
+    with self.assertRaises(Exception):
+      asyncio.run(SlowTransformer().execute_many_async(self.sources, self.outputs[1:]))
+
+  def test_failure_cancels(self):
+    sources = [self.sources[0] + '.missing'] + self.sources[1:]
+    with self.assertRaises(OSError):
+      asyncio.run(SlowTransformer().execute_many_async(sources, self.outputs, self.executor, concurrency=1))
+    self.assertFalse(any(os.path.exists(output) for output in self.outputs))
+
+  def test_cancel(self):
+    transformer = SlowTransformer()
+
+    async def cancelRun():
+      task = asyncio.ensure_future(transformer.execute_many_async(self.sources, self.outputs, self.executor, concurrency=2))
+      while not transformer.started.is_set():
+        await asyncio.sleep(0.001)
+      task.cancel()
+      with self.assertRaises(asyncio.CancelledError):
+        await task
+
+    asyncio.run(cancelRun())
+    # transforms already in the executor finish, but nothing is written
+    self.executor.shutdown(wait=True)
+    self.assertFalse(any(os.path.exists(output) for output in self.outputs))
+
+
+if __name__ == '__main__':
+  unittest.main()
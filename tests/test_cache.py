@@ -0,0 +1,64 @@
+# Cached selections must give the same edits as parsing every file
+#
+#   python -m pytest tests
+
+import unittest
+
+from modelicaTransformer.Cache import StructureCache
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Selector import PathSelector
+from modelicaTransformer.Transformation import Transformation
+from modelicaTransformer.Transformer import Transformer
+
+import helpers
+
+SOURCE = '''model A
+  B EM(k=10, J=10);
+  C c(v=12) annotation(Placement(visible=true, transformation(extent={{-10,-10},{10,10}})));
+end A;
+'''
+# differs from SOURCE in its numbers only
+VARIANT = SOURCE.replace('J=10', 'J=30').replace('v=12', 'v=45').replace('{10,10}', '{20,20}')
+
+VISIBLE = PathSelector([{'rule': 'element_modification', 'child': 'name', 'child_value': 'visible'}])
+
+
+def makeTransformer(**parse_options):
+  return helpers.makeTransformer(Transformation(VISIBLE, Edit.makeReplace('visible=false')), **parse_options)
+
+
+class TestStructureCache(unittest.TestCase):
+
+  def assertCached(self, transformer, texts, hits, misses):
+    cache = StructureCache()
+    for text in texts:
+      self.assertEqual(transformer.transform(text, cache), transformer.transform(text))
+    self.assertEqual((cache.hits, cache.misses), (hits, misses))
+
+  def test_hit(self):
+    self.assertCached(makeTransformer(), [SOURCE, SOURCE], 1, 1)
+
+  def test_literal_variant(self):
+    transformer = makeTransformer()
+    self.assertCached(transformer, [SOURCE, VARIANT], 1, 1)
+    result = transformer.transform(VARIANT, StructureCache())
+    self.assertIn('EM(k=8, J=30)', result)
+    self.assertIn('visible=false', result)
+
+  def test_child_value_literal(self):
+    # a literal a path matches on is part of the structure
+    transformer = Transformer()
+    transformer.add(Transformation(
+      PathSelector([{'rule': 'element_modification', 'child': 'modification', 'child_value': '=12'}]),
+      Edit.makeReplace('v=99')))
+    self.assertCached(transformer, [SOURCE, VARIANT, SOURCE], 1, 2)
+
+  def test_opaque_annotations(self):
+    # nodes inside annotation bodies hold copies of the file's tokens
+    transformer = makeTransformer(opaque_annotations=True)
+    self.assertCached(transformer, [SOURCE, VARIANT, SOURCE], 2, 1)
+    self.assertIn('visible=false', transformer.transform(VARIANT, StructureCache()))
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,98 @@
+# Chunked transforms and the class cache must select the same nodes as a
+# whole-file parse, paths crossing class boundaries included
+#
+#   python -m pytest tests
+
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+
+from modelicaTransformer.Cache import ClassCache
+from modelicaTransformer.Chunk import inChunks
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Selector import PathSelector
+from modelicaTransformer.Transformation import ReplaceComponentArgumentValue, Transformation
+from modelicaTransformer.Transformer import Transformer
+
+SOURCE = '''within Lib;
+package P
+  parameter Real g = 9.81;
+  model A
+    Real x(k=10);
+    model Inner
+      Real y(k=10);
+    end Inner;
+  end A;
+  model B
+    Real x(k=10);
+  end B;
+  block C
+    Real z(k=10);
+  end C;
+end P;
+'''
+
+TRANSFORMATIONS = [
+  # nested classes of a package are in other chunks
+  Transformation(PathSelector([
+    {'rule': 'class_definition'},
+    {'rule': 'component_clause'},
+  ]), Edit.makeInsert(' /* in a class */')),
+  # a chunk's class isn't an element
+  Transformation(PathSelector([{'rule': 'element'}]), Edit.makeInsert(' /* element */')),
+  # depth below the file's root
+  Transformation(PathSelector([{'rule': 'declaration', 'max_depth': 10}]), Edit.makeInsert(' /* shallow */')),
+  # going up leaves a chunk
+  Transformation(PathSelector([
+    {'rule': 'declaration'},
+    {'rule': 'composition', 'axis': 'ancestor'},
+  ]), Edit.makeInsert(' /* composition */')),
+]
+
+
+class TestChunks(unittest.TestCase):
+
+  def assertSameAsWhole(self, transformation):
+    whole = Transformer()
+    whole.add(transformation)
+    expected = whole.transform(SOURCE)
+    self.assertNotEqual(expected, SOURCE)
+
+    with ThreadPoolExecutor(2) as executor:
+      self.assertEqual(whole.transform(SOURCE, executor=executor), expected)
+    cache = ClassCache()
+    self.assertEqual(whole.transform(SOURCE, cache=cache), expected)
+    self.assertEqual(whole.transform(SOURCE, cache=cache), expected)
+
+  def test_class_boundaries(self):
+    for transformation in TRANSFORMATIONS:
+      with self.subTest(path=transformation.selector.path()):
+        self.assertSameAsWhole(transformation)
+
+  def test_in_chunks(self):
+    self.assertTrue(inChunks([ReplaceComponentArgumentValue('x', 'k', '2').selector]))
+    for transformation in TRANSFORMATIONS:
+      self.assertFalse(inChunks([transformation.selector]))
+
+  def test_chunked_transform(self):
+    transformer = Transformer()
+    transformer.add(ReplaceComponentArgumentValue('x', 'k', '20'))
+    expected = transformer.transform(SOURCE)
+    self.assertEqual(expected.count('x(k=20)'), 2)
+    with ThreadPoolExecutor(2) as executor:
+      self.assertEqual(transformer.transform(SOURCE, executor=executor), expected)
+
+  def test_class_cache(self):
+    transformer = Transformer()
+    transformer.add(ReplaceComponentArgumentValue('x', 'k', '20'))
+    cache = ClassCache()
+    self.assertEqual(transformer.transform(SOURCE, cache=cache), transformer.transform(SOURCE))
+    # the shell and the chunks of A, B and C
+    self.assertEqual((cache.hits, cache.misses), (0, 4))
+
+    # only the chunk of A, which contains Inner, is parsed again
+    changed = SOURCE.replace('Real y(k=10)', 'Real y(k=11)')
+    self.assertEqual(transformer.transform(changed, cache=cache), transformer.transform(changed))
+    self.assertEqual((cache.hits, cache.misses), (3, 5))
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,108 @@
+# Stress tests running one Transformer from many threads, the results must be
+# the same as serial runs
+#
+#   python -m pytest tests
+
+from concurrent.futures import ThreadPoolExecutor
+import sys
+import threading
+import unittest
+
+from modelicaTransformer.Cache import ParseCache
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import ConnectSelector, PathSelector, select
+from modelicaTransformer.Transformation import Transformation
+
+from helpers import EXAMPLE, makeTransformer, readExample
+
+THREADS = 16
+RUNS = 64
+
+
+TRANSFORMATIONS = [
+  Transformation(PathSelector([{'rule': 'declaration', 'child': 'IDENT', 'child_value': 'R'}]), Edit.makeInsert(' "resistor"')),
+  Transformation(ConnectSelector('DC.p', 'R.n'), Edit.makeDelete()),
+]
+
+
+def variants(text):
+  """variants returns versions of text with different argument values, so
+  concurrent runs don't all produce the same output
+  """
+  return [text.replace('k=10', f'k={i}') for i in range(RUNS)]
+
+
+class TestConcurrentTransforms(unittest.TestCase):
+
+  def setUp(self):
+    self.text = readExample()
+
+  def assertConcurrentMatchesSerial(self, transformer, texts, **transform_args):
+    serial = [transformer.transform(text) for text in texts]
+    with ThreadPoolExecutor(THREADS) as pool:
+      concurrent = list(pool.map(lambda text: transformer.transform(text, **transform_args), texts))
+    self.assertEqual(concurrent, serial)
+
+  def test_transform(self):
+    transformer = makeTransformer(*TRANSFORMATIONS)
+    texts = variants(self.text)
+    self.assertConcurrentMatchesSerial(transformer, texts)
+    self.assertNotEqual(transformer.transform(texts[0]), texts[0])
+
+  def test_execute(self):
+    transformer = makeTransformer(*TRANSFORMATIONS)
+    serial = transformer.execute(EXAMPLE)
+    with ThreadPoolExecutor(THREADS) as pool:
+      concurrent = list(pool.map(lambda _: transformer.execute(EXAMPLE), range(RUNS)))
+    self.assertEqual(concurrent, [serial] * RUNS)
+
+  def test_shared_cache(self):
+    # threads select from the same cached trees
+    transformer = makeTransformer(*TRANSFORMATIONS)
+    cache = ParseCache()
+    texts = variants(self.text)[:4] * (RUNS // 4)
+    self.assertConcurrentMatchesSerial(transformer, texts, cache=cache)
+
+  def test_parse_options(self):
+    transformer = makeTransformer(*TRANSFORMATIONS, engine='native', lexer='regex', flat_expressions=True)
+    self.assertConcurrentMatchesSerial(transformer, variants(self.text))
+
+
+class TestConcurrentSelection(unittest.TestCase):
+
+  def setUp(self):
+    self.text = readExample()
+
+  def test_shared_tree(self):
+    # threads index different rules of one tree at the same time, switching
+    # threads as often as possible to expose races
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)
+    self.addCleanup(sys.setswitchinterval, interval)
+    # large enough that indexing a rule takes many switch intervals
+    text = 'package Copies\n' + self.text * 50 + 'end Copies;\n'
+    tree, parser = parse(text)
+    rules = list(parser.ruleNames)
+    expected = {rule: len(select(tree, parser, rule)) for rule in rules}
+
+    for _ in range(5):
+      tree, parser = parse(text)
+      barrier = threading.Barrier(THREADS)
+
+      def selectAll(offset):
+        barrier.wait()
+        return {
+          rule: [node.start.tokenIndex for node in select(tree, parser, rule)]
+          for rule in rules[offset % 3:] + rules[:offset % 3]
+        }
+
+      with ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(selectAll, range(THREADS)))
+      serial = {rule: [node.start.tokenIndex for node in select(tree, parser, rule)] for rule in rules}
+      self.assertEqual(results, [serial] * THREADS)
+      self.assertEqual({rule: len(nodes) for rule, nodes in serial.items()}, expected)
+
+
+if __name__ == '__main__':
+  unittest.main()
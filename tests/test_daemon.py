@@ -0,0 +1,110 @@
+# The daemon must only serve requests a web page can't forge, and only read
+# and write files inside its root
+#
+#   python -m pytest tests
+
+import http.client
+import json
+import os
+import stat
+import tempfile
+import threading
+import unittest
+
+from modelicaTransformer.Daemon import DaemonError, makeServer, transformRemote
+
+SPEC = {'transformations': [
+  {'type': 'replace_component_argument', 'component': 'EM', 'argument': 'k', 'value': '8'}
+]}
+SOURCE = 'model A B EM(k=10); end A;'
+
+
+class TestDaemon(unittest.TestCase):
+
+  def setUp(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.root = os.path.join(directory.name, 'root')
+    os.mkdir(self.root)
+    self.outside = os.path.join(directory.name, 'outside.mo')
+    with open(os.path.join(self.root, 'A.mo'), 'w') as f:
+      f.write(SOURCE)
+
+    self.server = makeServer(port=0, root=self.root, token_path=os.path.join(directory.name, 'daemon.token'))
+    self.port = self.server.server_address[1]
+    thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+    thread.start()
+    self.addCleanup(self.server.server_close)
+    self.addCleanup(self.server.shutdown)
+
+  def post(self, request, headers):
+    connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=30)
+    self.addCleanup(connection.close)
+    # http.client adds Host itself unless it's given
+    connection.putrequest('POST', '/transform', skip_host=True)
+    body = json.dumps(request).encode('utf-8')
+    for name, value in dict({'Content-Length': str(len(body))}, **headers).items():
+      connection.putheader(name, value)
+    connection.endheaders(body)
+    response = connection.getresponse()
+    return response.status, json.loads(response.read())
+
+  def validHeaders(self, **headers):
+    return dict({
+      'Host': f'127.0.0.1:{self.port}',
+      'Content-Type': 'application/json',
+      'Authorization': f'Bearer {self.server.token}',
+    }, **headers)
+
+  def test_token_file(self):
+    self.assertEqual(stat.S_IMODE(os.stat(self.server.token_path).st_mode), 0o600)
+    with open(self.server.token_path) as f:
+      self.assertEqual(f.read(), self.server.token)
+
+  def test_valid_request(self):
+    request = {'spec': SPEC, 'source': 'A.mo', 'output': 'B.mo'}
+    status, response = self.post(request, self.validHeaders(Host=f'localhost:{self.port}'))
+    self.assertEqual(status, 200)
+    self.assertEqual(response['result'], 'model A B EM(k=8); end A;')
+    with open(os.path.join(self.root, 'B.mo')) as f:
+      self.assertEqual(f.read(), response['result'])
+
+    result = transformRemote(SPEC, text=SOURCE, port=self.port, token=self.server.token)
+    self.assertEqual(result, 'model A B EM(k=8); end A;')
+
+  def test_forged_requests(self):
+    request = {'spec': SPEC, 'source': 'A.mo', 'output': self.outside}
+    for headers, status in (
+        # a CORS-simple cross-site POST
+        (self.validHeaders(**{'Content-Type': 'text/plain'}), 415),
+        (self.validHeaders(Origin='http://evil.example'), 403),
+        # DNS rebinding
+        (self.validHeaders(Host='evil.example'), 403),
+        (self.validHeaders(Host=f'evil.example:{self.port}'), 403),
+        (self.validHeaders(Authorization='Bearer wrong'), 401),
+        ({'Host': f'127.0.0.1:{self.port}', 'Content-Type': 'application/json'}, 401)):
+      with self.subTest(headers=headers):
+        self.assertEqual(self.post(request, headers)[0], status)
+    self.assertFalse(os.path.exists(self.outside))
+
+  def test_paths_outside_root(self):
+    with open(self.outside, 'w') as f:
+      f.write(SOURCE)
+    for request in (
+        {'spec': SPEC, 'source': self.outside},
+        {'spec': SPEC, 'source': '../outside.mo'},
+        {'spec': SPEC, 'source': 'A.mo', 'output': self.outside},
+        {'spec': SPEC, 'text': SOURCE, 'output': '../outside.mo'}):
+      with self.subTest(request=request):
+        status, response = self.post(request, self.validHeaders())
+        self.assertEqual(status, 403, response)
+    with open(self.outside) as f:
+      self.assertEqual(f.read(), SOURCE)
+
+  def test_client_errors(self):
+    with self.assertRaises(DaemonError):
+      transformRemote(SPEC, source=self.outside, port=self.port, token=self.server.token)
+
+
+if __name__ == '__main__':
+  unittest.main()
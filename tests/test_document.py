@@ -0,0 +1,69 @@
+# Transforming a Document must parse with its options and the transformer's,
+# the transformer's options winning, in every mode
+#
+#   python -m pytest tests
+
+from concurrent.futures import ThreadPoolExecutor
+import unittest
+
+from modelicaTransformer.Document import Document
+from modelicaTransformer.Parse import ParseError
+from modelicaTransformer.Transformation import ReplaceComponentArgumentValue
+
+import helpers
+
+INVALID = 'model A Real y(k=10); Real x = ; end A;'
+
+
+def makeTransformer(**options):
+  return helpers.makeTransformer(ReplaceComponentArgumentValue('y', 'k', '2'), **options)
+
+
+class TestDocumentOptions(unittest.TestCase):
+
+  def setUp(self):
+    self.text = helpers.readExample()
+
+  def test_document_defaults(self):
+    document = Document(self.text, flat_expressions=True)
+    self.assertIs(document.parse(), document.parse({'flat_expressions': True}))
+    self.assertIsNot(document.parse({}), document.parse())
+
+  def test_error_policy(self):
+    # the document's error policy applies when the transformer sets other options
+    with ThreadPoolExecutor(2) as executor:
+      for options in ({}, {'flat_expressions': False}, {'flat_expressions': True}):
+        for transform_args in ({}, {'executor': executor}):
+          with self.subTest(options=options, transform_args=transform_args):
+            with self.assertRaises(ParseError):
+              makeTransformer(**options).transform(Document(INVALID, error_policy='collect'), **transform_args)
+    with self.assertRaises(ParseError):
+      makeTransformer(streaming=True).transform(Document(INVALID, error_policy='collect'))
+
+  def test_transformer_options_win(self):
+    document = Document(INVALID, error_policy='collect')
+    result = makeTransformer(error_policy='recover').transform(document)
+    self.assertIn('y(k=2)', result)
+
+  def test_prune_protection(self):
+    expected = makeTransformer().transform(self.text)
+    self.assertNotEqual(expected, self.text)
+    for options in ({}, {'flat_expressions': True}):
+      with self.subTest(options=options):
+        document = Document(self.text, prune=['composition', 'element_list'])
+        self.assertEqual(makeTransformer(**options).transform(document), expected)
+
+  def test_modes(self):
+    text = 'package P\n' + self.text + self.text.replace('DCMotor', 'DCMotor2') + 'end P;\n'
+    expected = makeTransformer().transform(text)
+    with ThreadPoolExecutor(2) as executor:
+      for transformer, transform_args in (
+          (makeTransformer(), {}),
+          (makeTransformer(streaming=True), {}),
+          (makeTransformer(), {'executor': executor})):
+        with self.subTest(transform_args=transform_args):
+          self.assertEqual(transformer.transform(Document(text, numeric_literals=True), **transform_args), expected)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,140 @@
+# Differential checks of the native parsing engine against the antlr engine:
+# for every input and error policy both must build the same tree or raise
+# the same errors, and selections on their trees must select the same nodes
+#
+#   python -m pytest tests
+
+import unittest
+
+from modelicaTransformer.Parse import ERROR_POLICIES, ParseError, parse
+from modelicaTransformer.Selector import ComponentArgSelector, ConnectSelector, PathSelector
+
+from helpers import readExample
+
+SOURCES = [
+  'model A Real x = 1; end A;',
+  'model A Real x(start=1, fixed=true) = if b then 1 else f(2, y=3); equation der(x) = -x; end A;',
+  'package P model A parameter Real k[2] = {1, 2}; end A; end P;',
+  # lexer error, the native engine gets a valid token stream without '#'
+  'model A Real x = 1; # end A;',
+  # syntax errors
+  'model A Real x = ; end A;',
+  'model A Real x = 1 end A;',
+]
+
+# valid sources the selections run on, with DCMotor.mo
+CORPUS = [
+  '''within Lib;
+package P "a package"
+  model A
+    parameter Real k[2] = {1, 2} annotation(Evaluate=true);
+    Modelica.Blocks.Sources.Step s(height=2, startTime=k[1] * 0.5) annotation(
+      Placement(visible=true, transformation(extent={{-10,-10},{10,10}})));
+    Real x(start=1, fixed=true);
+  equation
+    connect(s.y, g.u) annotation(Line(points={{0,0},{1,1}}));
+    for i in 1:2 loop
+      der(x) = if x > k[i] then -x else x + f(i, y=3);
+    end for;
+    when x > 2 then
+      reinit(x, 0);
+    end when;
+  end A;
+  function f
+    input Integer i;
+    input Real y = 1;
+    output Real z;
+  algorithm
+    z := i * y ^ 2;
+  end f;
+end P;
+''',
+]
+
+SELECTORS = [
+  ComponentArgSelector('EM', 'k'),
+  ComponentArgSelector('s', 'startTime'),
+  ConnectSelector('s.y', None),
+  PathSelector([{'rule': 'declaration', 'child': 'IDENT', 'child_value': 'x'}, {'rule': 'modification'}]),
+  PathSelector([{'rule': 'element_modification', 'child': 'name', 'child_value': 'visible'}]),
+  PathSelector([{'rule': 'annotation'}, {'rule': 'expression'}]),
+  PathSelector([{'rule': 'class_definition'}, {'rule': 'component_clause', 'max_depth': 6}]),
+  PathSelector([{'rule': 'component_clause'}, {'rule': 'type_specifier', 'axis': 'child'}]),
+  PathSelector([{'rule': 'primary'}, {'rule': 'equation', 'axis': 'ancestor'}]),
+  PathSelector([{'rule': 'function_argument', 'max_depth': 20}]),
+]
+
+
+def treeSignature(tree):
+  """treeSignature lists the nodes of a tree in preorder, with their rule (or
+  token index for terminals) and span
+  """
+  from antlr4 import TerminalNode
+
+  signature = []
+  stack = [tree]
+  while stack:
+    node = stack.pop()
+    if isinstance(node, TerminalNode):
+      signature.append(('token', node.symbol.tokenIndex))
+      continue
+    start = node.start.tokenIndex if node.start is not None else None
+    stop = node.stop.tokenIndex if node.stop is not None else None
+    children = node.children or []
+    signature.append((node.getRuleIndex(), start, stop, len(children)))
+    stack.extend(reversed(children))
+  return signature
+
+
+def selectionSignature(selector, text, engine, **options):
+  """selectionSignature lists the rule and span of the nodes selector selects"""
+  tree, parser = parse(text, engine=engine, **options)
+  return [
+    (node.getRuleIndex(), node.start.tokenIndex, node.stop.tokenIndex)
+    for node in selector.apply(tree, parser)
+  ]
+
+
+def outcome(text, engine, error_policy):
+  try:
+    tree, _ = parse(text, engine=engine, error_policy=error_policy)
+  except ParseError as e:
+    return 'errors', e.errors
+  return 'tree', treeSignature(tree)
+
+
+class TestNativeEngine(unittest.TestCase):
+
+  def setUp(self):
+    self.sources = SOURCES + CORPUS + [readExample()]
+
+  def test_same_outcome(self):
+    for text in self.sources:
+      for error_policy in ERROR_POLICIES:
+        with self.subTest(text=text[:40], error_policy=error_policy):
+          self.assertEqual(outcome(text, 'native', error_policy), outcome(text, 'antlr', error_policy))
+
+  def test_same_selections(self):
+    for text in CORPUS + self.sources[-1:]:
+      for options in ({}, {'flat_expressions': True}, {'opaque_annotations': True}):
+        for selector in SELECTORS:
+          with self.subTest(text=text[:40], options=options, path=selector.path()):
+            self.assertEqual(
+              selectionSignature(selector, text, 'native', **options),
+              selectionSignature(selector, text, 'antlr', **options))
+
+  def test_selections_select(self):
+    # the corpus exercises every selector
+    for selector in SELECTORS:
+      with self.subTest(path=selector.path()):
+        self.assertTrue(any(
+          selectionSignature(selector, text, 'native') for text in CORPUS + self.sources[-1:]))
+
+  def test_lexer_errors_raise(self):
+    with self.assertRaises(ParseError) as raised:
+      parse('model A Real x = 1; # end A;', error_policy='collect', engine='native')
+    self.assertIn('token recognition error', raised.exception.errors[0].message)
+
+
+if __name__ == '__main__':
+  unittest.main()
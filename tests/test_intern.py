@@ -0,0 +1,75 @@
+# Interned identifiers must share one string per identifier, per document or
+# per process, without changing what selectors select
+#
+#   python -m pytest tests
+
+import sys
+import unittest
+
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import ComponentArgSelector, ConnectSelector, PathSelector, select
+from modelicaTransformer.Text import nodeText
+
+from helpers import readExample
+
+SELECTORS = [
+  ComponentArgSelector('EM', 'k'),
+  ConnectSelector('EM.flange', None),
+  PathSelector([{'rule': 'component_reference', 'child': 'IDENT', 'child_value': 'flange'}]),
+]
+
+
+def identTokens(parser, text):
+  return [
+    token for token in parser.getTokenStream().tokens
+    if token.type == parser.IDENT and token.text == text
+  ]
+
+
+class TestInterning(unittest.TestCase):
+
+  def setUp(self):
+    self.text = readExample()
+
+  def test_document(self):
+    for lexer in ('antlr', 'regex'):
+      with self.subTest(lexer=lexer):
+        _, parser = parse(self.text, lexer=lexer, interning='document')
+        first, second = identTokens(parser, 'flange')
+        self.assertIs(first.text, second.text)
+        # other documents have their own strings
+        _, other_parser = parse(self.text, lexer=lexer, interning='document')
+        self.assertIsNot(identTokens(other_parser, 'flange')[0].text, first.text)
+
+  def test_process(self):
+    for lexer in ('antlr', 'regex'):
+      with self.subTest(lexer=lexer):
+        _, parser = parse(self.text, lexer=lexer, interning='process')
+        self.assertTrue(all(token.text is sys.intern('flange') for token in identTokens(parser, 'flange')))
+
+  def test_node_text(self):
+    # single token nodes return the token's shared text
+    tree, parser = parse('model A Flange a; Flange b; end A;', interning='document')
+    first, second = select(tree, parser, 'type_specifier')
+    self.assertEqual(nodeText(first), 'Flange')
+    self.assertIs(nodeText(first), nodeText(second))
+    self.assertIs(nodeText(first, normalized=True), nodeText(second))
+
+  def test_same_selections(self):
+    tree, parser = parse(self.text)
+    expected = [[node.getText() for node in selector.apply(tree, parser)] for selector in SELECTORS]
+    self.assertTrue(all(expected))
+    for interning in ('document', 'process'):
+      for lexer in ('antlr', 'regex'):
+        with self.subTest(interning=interning, lexer=lexer):
+          tree, parser = parse(self.text, lexer=lexer, interning=interning)
+          result = [[node.getText() for node in selector.apply(tree, parser)] for selector in SELECTORS]
+          self.assertEqual(result, expected)
+
+  def test_unknown_mode(self):
+    with self.assertRaises(Exception):
+      parse(self.text, interning='global')
+
+
+if __name__ == '__main__':
+  unittest.main()
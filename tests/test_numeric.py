@@ -0,0 +1,116 @@
+# Large numeric literals parsed as single nodes must keep their spans and
+# values, and be replaced from arrays like any other node
+#
+#   python -m pytest tests
+
+import unittest
+
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Numeric import NumericLiteralError, formatArray, isNumericLiteral, literalArray, literalValues
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import ComponentArgSelector, NumericLiteralSelector, select
+from modelicaTransformer.Transformation import Transformation
+from modelicaTransformer.Transformer import Transformer
+
+try:
+  import numpy
+except ImportError:
+  numpy = None
+
+ROWS = [[i, i * 0.5 - 3] for i in range(10)]
+MATRIX = '[' + '; '.join(f'{a}, {b}' for a, b in ROWS) + ']'
+BRACES = '{' + ', '.join(f'{{{a}, {b}}}' for a, b in ROWS) + '}'
+
+SOURCE = f'''model A
+  Table table(table={MATRIX});
+  Table braces(table={BRACES});
+  Table small(table=[0, 1; 1, 2]);
+  Table symbols(table=[0, k; 1, 2]);
+  Real x = 2 * f(3);
+end A;
+'''
+
+
+class TestNumericLiterals(unittest.TestCase):
+
+  def literals(self, tree, parser, component):
+    return NumericLiteralSelector(component).apply(tree, parser)
+
+  def test_single_node(self):
+    tree, parser = parse(SOURCE, numeric_literals=True)
+    for component, text in (('table', MATRIX), ('braces', BRACES)):
+      with self.subTest(component=component):
+        [literal] = self.literals(tree, parser, component)
+        self.assertTrue(isNumericLiteral(literal, parser))
+        self.assertEqual(literal.start.start, SOURCE.index(text))
+        self.assertEqual(literal.stop.stop, SOURCE.index(text) + len(text) - 1)
+        # only the first entry is parsed
+        self.assertLess(len(select(literal, parser, 'primary')), 5)
+
+  def test_values(self):
+    for options in ({}, {'numeric_literals': True}):
+      tree, parser = parse(SOURCE, **options)
+      with self.subTest(options=options):
+        [matrix] = self.literals(tree, parser, 'table')
+        self.assertEqual(literalValues(matrix, parser), ROWS)
+        [braces] = self.literals(tree, parser, 'braces')
+        self.assertEqual(literalValues(braces, parser), ROWS)
+
+  def test_small_and_symbolic_literals(self):
+    tree, parser = parse(SOURCE, numeric_literals=True)
+    # too small to be hidden, still a numeric literal
+    [small] = self.literals(tree, parser, 'small')
+    self.assertFalse(isNumericLiteral(small, parser))
+    self.assertEqual(literalValues(small, parser), [[0, 1], [1, 2]])
+    self.assertEqual(self.literals(tree, parser, 'symbols'), [])
+    [expression] = ComponentArgSelector('symbols', 'table').apply(tree, parser)
+    with self.assertRaises(NumericLiteralError):
+      literalValues(select(expression, parser, 'primary')[0], parser)
+
+  def test_same_tree_elsewhere(self):
+    def texts(tree, parser):
+      nodes = ComponentArgSelector('small', 'table').apply(tree, parser)
+      nodes += ComponentArgSelector('symbols', 'table').apply(tree, parser)
+      nodes += select(tree, parser, 'function_call_args')
+      return [node.getText() for node in nodes]
+
+    expected = texts(*parse(SOURCE))
+    self.assertEqual(len(expected), 3)
+    self.assertEqual(texts(*parse(SOURCE, numeric_literals=True)), expected)
+
+
+@unittest.skipIf(numpy is None, 'requires numpy')
+class TestNumericArrays(unittest.TestCase):
+
+  def test_literal_array(self):
+    tree, parser = parse(SOURCE, numeric_literals=True)
+    [matrix] = NumericLiteralSelector('table').apply(tree, parser)
+    array = literalArray(matrix, parser)
+    self.assertEqual(array.shape, (10, 2))
+    self.assertEqual(array.tolist(), ROWS)
+
+  def test_replace_array(self):
+    array = numpy.arange(40).reshape(20, 2)
+    for options in ({}, {'numeric_literals': True}):
+      with self.subTest(options=options):
+        transformer = Transformer(**options)
+        transformer.add(Transformation(NumericLiteralSelector('table'), Edit.makeReplaceArray(array)))
+        transformer.add(Transformation(NumericLiteralSelector('braces'), Edit.makeReplaceArray(array.ravel())))
+        result = transformer.transform(SOURCE)
+        self.assertIn('Table table(table=[0, 1; 2, 3; ', result)
+        self.assertIn('Table braces(table={0, 1, 2, ', result)
+        tree, parser = parse(result, numeric_literals=True)
+        [literal] = NumericLiteralSelector('table').apply(tree, parser)
+        self.assertEqual(literalArray(literal, parser).tolist(), array.tolist())
+
+  def test_format_errors(self):
+    for array in (numpy.float64(1.0), numpy.array(['a', 'b']), numpy.array([1.0, numpy.nan])):
+      with self.subTest(array=array):
+        with self.assertRaises(NumericLiteralError):
+          formatArray(array)
+    self.assertEqual(formatArray(numpy.array([[1, 2], [3, 4]])), '[1, 2; 3, 4]')
+    self.assertEqual(formatArray([[[1], [2]]]), '{{{1}, {2}}}')
+
+
+if __name__ == '__main__':
+  unittest.main()
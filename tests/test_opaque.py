@@ -0,0 +1,87 @@
+# Opaque annotations must select the same nodes as fully parsed trees, their
+# bodies are parsed when a selection could find nodes in them
+#
+#   python -m pytest tests
+
+from concurrent.futures import ThreadPoolExecutor
+import threading
+import unittest
+
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Opaque import expandAnnotation
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import PathSelector, select
+from modelicaTransformer.Transformation import Transformation
+from modelicaTransformer.Transformer import Transformer
+
+SOURCE = '''model A
+  Real x annotation(Placement(transformation(extent={{-10,-10},{10,10}})));
+  Real y annotation(Dialog(group="G"));
+equation
+  connect(a.p, b.n) annotation(Line(points={{0,0},{1,1}}));
+  annotation(Documentation(info="<html></html>"));
+end A;
+'''
+
+PLACEMENT = [{'rule': 'element_modification', 'child': 'name', 'child_value': 'Placement'}]
+THREADS = 16
+
+
+class TestOpaqueAnnotations(unittest.TestCase):
+
+  def test_search_from_above(self):
+    tree, parser = parse(SOURCE)
+    expected = [node.getText() for node in PathSelector(PLACEMENT).apply(tree, parser)]
+    self.assertEqual(len(expected), 1)
+
+    tree, parser = parse(SOURCE, opaque_annotations=True)
+    self.assertEqual([node.getText() for node in PathSelector(PLACEMENT).apply(tree, parser)], expected)
+    self.assertEqual(parser.opaque_annotations, {})
+
+  def test_rules_outside_annotations(self):
+    # connect clauses can't be inside annotations, the bodies stay unparsed
+    tree, parser = parse(SOURCE, opaque_annotations=True)
+    self.assertEqual(len(select(tree, parser, 'connect_clause')), 1)
+    self.assertEqual(len(parser.opaque_annotations), 4)
+
+  def test_transform(self):
+    transformation = Transformation(PathSelector(PLACEMENT), Edit.makeDelete())
+    expected = None
+    for options in ({}, {'opaque_annotations': True}, {'opaque_annotations': True, 'streaming': True}):
+      with self.subTest(options=options):
+        transformer = Transformer(**options)
+        transformer.add(transformation)
+        result = transformer.transform(SOURCE)
+        self.assertNotEqual(result, SOURCE)
+        expected = expected or result
+        self.assertEqual(result, expected)
+
+  def test_expand_once(self):
+    tree, parser = parse(SOURCE, opaque_annotations=True)
+    # the connect clause's comment
+    annotation = select(tree, parser, 'connect_clause')[0].parentCtx.comment().annotation()
+    expandAnnotation(annotation, parser)
+    expanded = annotation.class_modification()
+    expandAnnotation(annotation, parser)
+    self.assertIs(annotation.class_modification(), expanded)
+    self.assertEqual(annotation.getText(), 'annotation(Line(points={{0,0},{1,1}}))')
+
+  def test_concurrent_expansion(self):
+    tree, parser = parse(SOURCE)
+    expected = [node.getText() for node in select(tree, parser, 'element_modification')]
+
+    for _ in range(20):
+      tree, parser = parse(SOURCE, opaque_annotations=True)
+      barrier = threading.Barrier(THREADS)
+
+      def selectAll(_):
+        barrier.wait()
+        return [node.getText() for node in select(tree, parser, 'element_modification')]
+
+      with ThreadPoolExecutor(THREADS) as pool:
+        results = list(pool.map(selectAll, range(THREADS)))
+      self.assertEqual(results, [expected] * THREADS)
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,57 @@
+# Pruning must never hide what the transformations select
+#
+#   python -m pytest tests
+
+import contextlib
+import io
+import unittest
+
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import ConnectSelector, NumericLiteralSelector, PathSelector, select
+from modelicaTransformer.Transformation import ReplaceComponentArgumentValue, Transformation
+from modelicaTransformer.Transformer import Transformer
+
+from helpers import readExample
+
+
+class TestPrune(unittest.TestCase):
+
+  def setUp(self):
+    self.text = readExample()
+
+  def assertSameAsUnpruned(self, transformation, prune):
+    unpruned = Transformer()
+    unpruned.add(transformation)
+    pruned = Transformer(prune=prune)
+    pruned.add(transformation)
+    expected = unpruned.transform(self.text)
+    self.assertNotEqual(expected, self.text)
+    self.assertEqual(pruned.transform(self.text), expected)
+
+  def test_ancestors_of_selected_rules(self):
+    for prune in (['composition'], ['element_list'], ['class_specifier']):
+      with self.subTest(prune=prune):
+        self.assertSameAsUnpruned(ReplaceComponentArgumentValue('EM', 'k', '8'), prune)
+        self.assertSameAsUnpruned(Transformation(ConnectSelector('DC.p', 'R.n'), Edit.makeDelete()), prune)
+
+  def test_unrelated_rules_are_pruned(self):
+    transformer = Transformer(prune=['equation_section', 'import_clause'])
+    transformer.add(Transformation(PathSelector([{'rule': 'component_clause'}]), Edit.makeDelete()))
+    # neither can contain a component clause (annotations only redeclare component_clause1)
+    self.assertEqual(transformer._parseOptions()['prune'], ['equation_section', 'import_clause'])
+
+  def test_selectors_without_a_path(self):
+    transformer = Transformer(prune=['composition'])
+    transformer.add(Transformation(NumericLiteralSelector('EM'), Edit.makeDelete()))
+    self.assertEqual(transformer._parseOptions()['prune'], [])
+
+  def test_debug_pruned_nodes(self):
+    tree, parser = parse(self.text, prune=['composition'])
+    with contextlib.redirect_stdout(io.StringIO()) as output:
+      PathSelector([{'rule': 'composition'}])._printDebug(select(tree, parser, 'composition'))
+    self.assertIn('composition', output.getvalue())
+
+
+if __name__ == '__main__':
+  unittest.main()
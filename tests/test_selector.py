@@ -0,0 +1,132 @@
+# Equal selectors, and equal prefixes of chained selectors, must be evaluated
+# once per tree and select what they select on their own. Filtering on a
+# child's text must skip nodes without the child
+#
+#   python -m pytest tests
+
+import unittest
+
+from modelicaTransformer.Edit import Edit
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import ComponentArgSelector, PathSelector, select
+from modelicaTransformer.Text import nodeText
+from modelicaTransformer.Transformation import Transformation
+
+from helpers import makeTransformer, readExample
+
+# paths evaluated by CountingSelector, in order
+evaluated = []
+
+
+class CountingSelector(PathSelector):
+  """CountingSelector is a PathSelector which records its evaluations"""
+
+  def _select(self, root, parser):
+    evaluated.append(self._path_steps[0]['rule'])
+    return super()._select(root, parser)
+
+
+def spans(nodes):
+  return [(node.start.tokenIndex, node.stop.tokenIndex) for node in nodes]
+
+
+class TestSelectorMemo(unittest.TestCase):
+
+  def setUp(self):
+    evaluated.clear()
+    self.tree, self.parser = parse(readExample())
+
+  def test_fingerprint(self):
+    self.assertEqual(ComponentArgSelector('EM', 'k').fingerprint(), ComponentArgSelector('EM', 'k').fingerprint())
+    self.assertNotEqual(ComponentArgSelector('EM', 'k').fingerprint(), ComponentArgSelector('EM', 'J').fingerprint())
+    self.assertNotEqual(
+      PathSelector([{'rule': 'declaration'}]).fingerprint(),
+      CountingSelector([{'rule': 'declaration'}]).fingerprint())
+    chained = PathSelector([{'rule': 'declaration'}]).chain(PathSelector([{'rule': 'expression'}]))
+    self.assertNotEqual(chained.fingerprint(), PathSelector([{'rule': 'declaration'}]).fingerprint())
+    self.assertEqual(chained.fingerprint(chained=False), PathSelector([{'rule': 'declaration'}]).fingerprint())
+
+  def test_equal_selectors(self):
+    first = CountingSelector([{'rule': 'connect_clause'}]).apply(self.tree, self.parser)
+    second = CountingSelector([{'rule': 'connect_clause'}]).apply(self.tree, self.parser)
+    self.assertEqual(evaluated, ['connect_clause'])
+    self.assertEqual(len(first), 6)
+    self.assertEqual(spans(second), spans(first))
+    # callers get their own lists
+    first.clear()
+    self.assertEqual(len(CountingSelector([{'rule': 'connect_clause'}]).apply(self.tree, self.parser)), 6)
+
+  def test_chained_prefix(self):
+    declarations = [{'rule': 'declaration', 'child': 'IDENT', 'child_value': 'EM'}]
+    arguments = CountingSelector(declarations).chain(CountingSelector([{'rule': 'element_modification'}]))
+    names = CountingSelector(declarations).chain(CountingSelector([{'rule': 'name'}]))
+    self.assertEqual(len(arguments.apply(self.tree, self.parser)), 3)
+    self.assertEqual(len(names.apply(self.tree, self.parser)), 3)
+    self.assertEqual(evaluated, ['declaration', 'element_modification', 'name'])
+
+  def test_per_tree(self):
+    selector = CountingSelector([{'rule': 'connect_clause'}])
+    selector.apply(self.tree, self.parser)
+    tree, parser = parse(readExample())
+    self.assertEqual(spans(selector.apply(tree, parser)), spans(selector.apply(self.tree, self.parser)))
+    self.assertEqual(evaluated, ['connect_clause'] * 2)
+
+  def test_unhashable_arguments(self):
+    # selectors with arguments that can't be fingerprinted aren't memoized
+    selector = CountingSelector([{'rule': 'connect_clause'}])
+    selector.note = bytearray(b'unhashable')
+    self.assertIsNone(selector.fingerprint())
+    self.assertEqual(len(selector.apply(self.tree, self.parser)), 6)
+    self.assertEqual(len(selector.apply(self.tree, self.parser)), 6)
+    self.assertEqual(evaluated, ['connect_clause'] * 2)
+
+  def test_transformations_share_selections(self):
+    selector = [{'rule': 'declaration', 'child': 'IDENT', 'child_value': 'R'}]
+    transformer = makeTransformer(
+      Transformation(CountingSelector(selector), Edit.makeInsert(' "a"')),
+      Transformation(CountingSelector(selector), Edit.makeInsert(' "b"')))
+    result = transformer.transform(readExample())
+    self.assertEqual(evaluated, ['declaration'])
+    self.assertIn('R(R=100) "a" "b";', result)
+
+
+CHILDREN = '''model A
+  Real x;
+  Real y /* a comment */ (k = 1);
+  Real z(k=1) = 2;
+equation
+  connect(R.n, R.n);
+  connect(R.n, L.p);
+end A;
+'''
+
+
+class TestSelectChild(unittest.TestCase):
+
+  def setUp(self):
+    self.tree, self.parser = parse(CHILDREN)
+    # the class, so selections don't use the index of the whole tree
+    [self.subtree] = select(self.tree, self.parser, 'class_definition')
+
+  def assertSelects(self, rule, child, child_value, expected):
+    for root in (self.tree, self.subtree):
+      with self.subTest(root=root.getRuleIndex()):
+        nodes = select(root, self.parser, rule, child, child_value)
+        self.assertEqual([nodeText(node) for node in nodes], expected)
+
+  def test_missing_optional_child(self):
+    # x has no modification
+    self.assertSelects('declaration', 'modification', '(k=1)', ['y /* a comment */ (k = 1)'])
+    self.assertSelects('declaration', 'modification', '', [])
+    self.assertSelects('declaration', 'IDENT', 'x', ['x'])
+
+  def test_unknown_child(self):
+    self.assertSelects('declaration', 'equation', 'x', [])
+
+  def test_several_children(self):
+    # a node is listed once per matching child
+    self.assertSelects('connect_clause', 'component_reference', 'R.n', ['connect(R.n, R.n)'] * 2 + ['connect(R.n, L.p)'])
+
+
+if __name__ == '__main__':
+  unittest.main()
@@ -0,0 +1,44 @@
+# Specs are checked when they're loaded, not when they're first used
+#
+#   python -m pytest tests
+
+import unittest
+
+from modelicaTransformer.Spec import SpecError, selectorFromSpec, transformerFromSpec
+
+TRANSFORMATIONS = [{'type': 'replace_component_argument', 'component': 'EM', 'argument': 'k', 'value': '8'}]
+
+
+class TestParseOptions(unittest.TestCase):
+
+  def test_known_options(self):
+    transformer = transformerFromSpec({
+      'transformations': TRANSFORMATIONS,
+      'parse_options': {'flat_expressions': True, 'error_policy': 'collect', 'streaming': False},
+    })
+    self.assertEqual(transformer.transform('model A B EM(k=10); end A;'), 'model A B EM(k=8); end A;')
+
+  def test_unknown_options(self):
+    with self.assertRaises(SpecError) as raised:
+      transformerFromSpec({'transformations': TRANSFORMATIONS, 'parse_options': {'flat': True}})
+    self.assertIn('"flat"', str(raised.exception))
+
+
+class TestSelectors(unittest.TestCase):
+
+  def test_connect(self):
+    transformer = transformerFromSpec({'transformations': [
+      {'type': 'delete', 'selector': {'type': 'connect', 'a': 'R.n'}},
+    ]})
+    source = 'model A equation connect(DC.p, R.n); connect(R.p, L.n); end A;'
+    self.assertEqual(transformer.transform(source), 'model A equation ; connect(R.p, L.n); end A;')
+
+  def test_connect_ports(self):
+    for entry in ({'type': 'connect'}, {'type': 'connect', 'a': 'DC.p', 'b': 'R.n'}):
+      with self.subTest(entry=entry):
+        with self.assertRaises(SpecError):
+          selectorFromSpec(entry)
+
+
+if __name__ == '__main__':
+  unittest.main()
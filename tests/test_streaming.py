@@ -0,0 +1,66 @@
+# Streaming selection must select what selectPath selects on the tree, or
+# refuse paths it can't evaluate the same way
+#
+#   python -m pytest tests
+
+import unittest
+
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Selector import ComponentArgSelector, selectPath
+from modelicaTransformer.Streaming import collectMatches
+
+from helpers import makeTransformer, readExample
+
+PATHS = [
+  ComponentArgSelector('EM', 'k').path(),
+  [{'rule': 'connect_clause'}, {'rule': 'component_reference', 'axis': 'child'}],
+  [{'rule': 'declaration', 'max_depth': 12}],
+  [{'rule': 'element_modification', 'child': 'name', 'child_value': 'k'}, {'rule': 'expression', 'max_depth': 2}],
+]
+
+
+def spans(nodes):
+  return sorted((node.start.tokenIndex, node.stop.tokenIndex, node.getRuleIndex()) for node in nodes)
+
+
+class TestStreaming(unittest.TestCase):
+
+  def setUp(self):
+    self.text = readExample()
+
+  def test_same_as_tree(self):
+    for options in ({}, {'flat_expressions': True}):
+      tree, parser = parse(self.text, **options)
+      for path, streamed in zip(PATHS, collectMatches(self.text, PATHS, **options)):
+        with self.subTest(options=options, path=path):
+          self.assertEqual(spans(streamed), spans(selectPath(tree, parser, path)))
+          self.assertTrue(streamed)
+
+  def test_shaped_levels(self):
+    # primaries are three levels below expressions only in flat trees
+    path = [{'rule': 'expression'}, {'rule': 'primary', 'max_depth': 3}]
+    tree, parser = parse(self.text, flat_expressions=True)
+    self.assertTrue(selectPath(tree, parser, path))
+    for shaped_path in (path, [{'rule': 'term'}], [{'rule': 'expression', 'child': 'simple_expression'}]):
+      with self.subTest(path=shaped_path):
+        with self.assertRaises(Exception):
+          collectMatches(self.text, [shaped_path], flat_expressions=True)
+    # without shaping the levels are the tree's
+    tree, parser = parse(self.text)
+    self.assertEqual(spans(collectMatches(self.text, [path])[0]), spans(selectPath(tree, parser, path)))
+
+  def test_pruned(self):
+    with self.assertRaises(Exception):
+      collectMatches(self.text, [[{'rule': 'connect_clause'}]], prune=['equation_section'])
+
+  def test_transformer(self):
+    expected = None
+    for options in ({}, {'streaming': True}, {'streaming': True, 'flat_expressions': True}):
+      result = makeTransformer(**options).transform(self.text)
+      expected = expected or result
+      self.assertEqual(result, expected)
+    self.assertIn('EM(k=8,', expected)
+
+
+if __name__ == '__main__':
+  unittest.main()
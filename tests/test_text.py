@@ -0,0 +1,49 @@
+# Node texts sliced from the source must be what getText() returns, and
+# importing the package must not load the antlr runtime
+#
+#   python -m pytest tests
+
+import os
+import subprocess
+import sys
+import unittest
+
+from modelicaTransformer.Parse import parse
+from modelicaTransformer.Text import nodeText
+
+from helpers import REPO_ROOT
+
+SOURCE = '''model A "a model"
+  Real x(start = 1 /* comment */, fixed=true) = 2 * y;
+  // comment
+  Real y;
+equation
+  der(x) = - x;
+end A;
+'''
+
+
+class TestNodeText(unittest.TestCase):
+
+  def test_same_as_get_text(self):
+    tree, parser = parse(SOURCE)
+    stack = [tree]
+    while stack:
+      node = stack.pop()
+      with self.subTest(rule=parser.ruleNames[node.getRuleIndex()], text=node.getText()):
+        self.assertEqual(nodeText(node, normalized=True), node.getText())
+      stack.extend(child for child in node.children or [] if hasattr(child, 'getRuleIndex'))
+
+  def test_source_text(self):
+    tree, parser = parse(SOURCE)
+    self.assertEqual(nodeText(tree), SOURCE.strip())
+
+  def test_lazy_import(self):
+    script = 'import sys, modelicaTransformer; print(any(m.startswith("antlr4") for m in sys.modules))'
+    env = dict(os.environ, PYTHONPATH=REPO_ROOT)
+    output = subprocess.run([sys.executable, '-c', script], env=env, check=True, capture_output=True, text=True)
+    self.assertEqual(output.stdout.strip(), 'False')
+
+
+if __name__ == '__main__':
+  unittest.main()
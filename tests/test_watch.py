@@ -0,0 +1,104 @@
+# Watch mode must report each change once, batch bursts of changes, and only
+# transform the files that changed
+#
+#   python -m pytest tests
+
+import contextlib
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from modelicaTransformer.Cli import expandSources, runWatch
+from modelicaTransformer.Watch import Watcher
+
+from helpers import EXAMPLE, makeTransformer
+
+
+class TestWatch(unittest.TestCase):
+
+  def setUp(self):
+    directory = tempfile.TemporaryDirectory()
+    self.addCleanup(directory.cleanup)
+    self.directory = directory.name
+    self.pattern = os.path.join(self.directory, '*.mo')
+    self.sources = [os.path.join(self.directory, name) for name in ('A.mo', 'B.mo', 'C.mo')]
+    for source in self.sources:
+      shutil.copy(EXAMPLE, source)
+
+  def append(self, path, text='\n'):
+    with open(path, 'a') as f:
+      f.write(text)
+
+  def makeWatcher(self):
+    return Watcher(lambda: expandSources([self.pattern]), interval=0.01, debounce=0.05)
+
+  def test_poll(self):
+    watcher = self.makeWatcher()
+    self.assertEqual(watcher.poll(), set())
+    self.append(self.sources[0])
+    added = os.path.join(self.directory, 'D.mo')
+    shutil.copy(EXAMPLE, added)
+    self.assertEqual(watcher.poll(), {self.sources[0], added})
+    self.assertEqual(watcher.poll(), set())
+    # deleted files aren't reported
+    os.remove(self.sources[1])
+    self.assertEqual(watcher.poll(), set())
+
+  def test_ignore(self):
+    watcher = self.makeWatcher()
+    self.append(self.sources[0])
+    watcher.ignore(self.sources[0])
+    self.assertEqual(watcher.poll(), set())
+
+  def test_burst(self):
+    watcher = self.makeWatcher()
+
+    def edit():
+      for source in self.sources:
+        self.append(source)
+        time.sleep(0.02)
+
+    thread = threading.Thread(target=edit)
+    thread.start()
+    self.addCleanup(thread.join)
+    self.assertEqual(watcher.wait(), set(self.sources))
+
+  def test_watch(self):
+    watcher = self.makeWatcher()
+    batches = []
+    self.append(self.sources[1])
+    watcher.watch(batches.append, stop=lambda: batches)
+    self.assertEqual(batches, [[self.sources[1]]])
+
+  def test_run_changed_files(self):
+    edits = [lambda: self.append(self.sources[1], '// edited\n')]
+    wait = Watcher.wait
+
+    def editThenWait(watcher):
+      if not edits:
+        raise KeyboardInterrupt
+      edits.pop(0)()
+      return wait(watcher)
+
+    output = io.StringIO()
+    with mock.patch.object(Watcher, 'wait', autospec=True, side_effect=editThenWait):
+      with contextlib.redirect_stdout(output):
+        # in place, the watcher mustn't see its own writes as changes
+        runWatch(makeTransformer(), [self.pattern], lambda source: source, 0.01, 0.05)
+
+    runs = [json.loads(line) for line in output.getvalue().splitlines()]
+    self.assertEqual([[result['source'] for result in run['files']] for run in runs], [self.sources, self.sources[1:2]])
+    self.assertEqual([result['changed'] for result in runs[0]['files']], [True] * 3)
+    self.assertEqual(runs[1]['files'][0]['status'], 'ok')
+    with open(self.sources[1]) as f:
+      self.assertTrue(f.read().endswith('// edited\n'))
+
+
+if __name__ == '__main__':
+  unittest.main()